@@ -9,19 +9,33 @@
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import os
 import json
 import re
+import math
 import hashlib
+import logging
 import uuid
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import time
 import random
 import asyncio
 from io import BytesIO, StringIO
 from pathlib import Path
 import shutil
+import sqlite3
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from collections import deque, OrderedDict
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Falhas de tarefas sem página para exibir (gravações em disco, threads de fundo) vão para o log
+logger = logging.getLogger("petcare_dba")
 
 # Importações condicionais
 try:
@@ -78,7 +92,10 @@
         # Configurações do Google Gemini
         'gemini_api_key': st.secrets["gemini"]["api_key"],
         'gemini_model': st.secrets["gemini"]["model"],
-        'gemini_base_url': st.secrets["gemini"]["base_url"]
+        'gemini_base_url': st.secrets["gemini"]["base_url"],
+        
+        # Conexão PostgreSQL direta (opcional) para o backend nativo
+        'postgres': dict(st.secrets.get("postgres", {}))
     }
 except KeyError as e:
     st.error(f"❌ Configuração faltando nos secrets: {e}")
@@ -109,6 +126,17 @@
 # Caminho para armazenar configurações
 SETTINGS_FILE = Path("user_settings.json")
 
+# Segredos mantidos apenas na sessão: nunca gravados em user_settings.json nem exportados
+UNPERSISTED_DATABASE_KEYS = ('pg_password',)
+
+def strip_unpersisted_settings(settings: Dict) -> Dict:
+    """Retorna cópia das configurações sem os segredos que não devem ir para disco"""
+    settings = dict(settings or {})
+    if isinstance(settings.get('database'), dict):
+        settings['database'] = {key: value for key, value in settings['database'].items()
+                                if key not in UNPERSISTED_DATABASE_KEYS}
+    return settings
+
 def load_user_settings():
     """Carrega configurações salvas do usuário"""
     try:
@@ -128,6 +156,7 @@ def load_user_settings():
                     'auto_scale': True,
                     'enable_cache': True,
                     'cache_duration': 15,
+                    'query_cache_mb': 64,
                     'auto_refresh_interval': 30,
                     'max_records_display': 50,
                     'query_timeout': 30,
@@ -172,13 +201,17 @@ def load_user_settings():
                   'connection_pool_size': 20,  # ADICIONAR ESTA LINHA
                   'max_connections': 100,      # ADICIONAR ESTA LINHA
                   'connection_timeout': 30,    # ADICIONAR ESTA LINHA
-                  'query_timeout': 60,
+                  'statement_timeout': 60,
                   'log_slow_queries': True,
                   'slow_query_threshold': 5,
                   'log_connections': True,
                   'monitor_locks': True,
                   'auto_reconnect': True,
                   'connection_retry_attempts': 3,
+                  'count_concurrency': 8,
+                  'count_timeout': 10,
+                  'exact_count_threshold': 10000,
+                  'query_workers': 4,
                   'backup_connection': False,
                   'read_replica': False,
                   'load_balancing': False,
@@ -242,9 +275,9 @@ def save_user_settings(settings):
             import shutil
             shutil.copy2(SETTINGS_FILE, backup_file)
         
-        # Salvar novas configurações
+        # Salvar novas configurações (senha PostgreSQL fica só na sessão)
         with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=2, ensure_ascii=False, default=str)
+            json.dump(strip_unpersisted_settings(settings), f, indent=2, ensure_ascii=False, default=str)
         
         return True
     except Exception as e:
@@ -269,8 +302,9 @@ def apply_database_settings(db_settings):
         # Recriar database manager com novas configurações
         old_connected = db_manager.connected if hasattr(db_manager, 'connected') else False
         
-        # Reinicializar conexão
-        db_manager._init_connection()
+        # Reinicializar conexão compartilhada (invalida o catálogo de todas as sessões)
+        db_manager.reconnect()
+        db_manager.configure_pool(db_settings)
         
         # Atualizar project manager se necessário
         if 'project_manager' in st.session_state:
@@ -413,7 +447,7 @@ def export_settings_to_file(settings):
         export_data = {
             'exported_at': datetime.now().isoformat(),
             'app_version': CONFIG['app_version'],
-            'settings': settings
+            'settings': strip_unpersisted_settings(settings)
         }
         
         filename = f"petcare_settings_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -456,6 +490,121 @@ def import_settings_from_data(import_data):
             'error': f'Erro ao processar arquivo: {str(e)}'
         }
 
+# =====================================================================
+# CAMADA HTTP COMPARTILHADA (KEEP-ALIVE, RETRIES E LATÊNCIA)
+# =====================================================================
+
+class HTTPTransport:
+    """Sessão HTTP compartilhada com pools por host, retries e latência por endpoint"""
+    
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    # Repetir estes é seguro; POST/PATCH só com retry=True (ex.: RPCs somente leitura)
+    IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+    
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20,
+                 max_retries: int = 2, backoff_base: float = 0.25, backoff_max: float = 4.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        
+        # Um pool urllib3 por host (pool_connections) com até pool_maxsize conexões keep-alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        self._lock = threading.Lock()
+        self._stats = {}
+    
+    @staticmethod
+    def _endpoint_key(method: str, url: str) -> str:
+        """Identifica o endpoint sem query string (evita vazar chaves de API)"""
+        parsed = urlparse(url)
+        return f"{method.upper()} {parsed.netloc}{parsed.path}"
+    
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Backoff exponencial com jitter completo (respeita Retry-After)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def _record(self, endpoint: str, elapsed: float, ok: bool, retries: int):
+        """Atualiza os contadores de latência do endpoint"""
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'calls': 0, 'errors': 0, 'retries': 0,
+                'total_ms': 0.0, 'max_ms': 0.0, 'recent': deque(maxlen=200)
+            })
+            elapsed_ms = elapsed * 1000
+            stats['calls'] += 1
+            stats['errors'] += 0 if ok else 1
+            stats['retries'] += retries
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['recent'].append(elapsed_ms)
+    
+    def request(self, method: str, url: str, retry: Optional[bool] = None, **kwargs):
+        """Executa a requisição reaproveitando conexões, com retries limitados.
+        Por padrão só métodos idempotentes são repetidos; retry=True/False decide por chamada.
+        Falha ao conectar (a requisição nem saiu) é sempre repetida."""
+        endpoint = self._endpoint_key(method, url)
+        retry = method.upper() in self.IDEMPOTENT_METHODS if retry is None else retry
+        start_time = time.time()
+        attempt = 0
+        
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries or not (retry or isinstance(e, requests.ConnectTimeout)):
+                    self._record(endpoint, time.time() - start_time, False, attempt)
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            
+            if retry and response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response))
+                attempt += 1
+                continue
+            
+            self._record(endpoint, time.time() - start_time, response.status_code < 400, attempt)
+            return response
+    
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url: str, retry: bool = False, **kwargs):
+        return self.request('POST', url, retry=retry, **kwargs)
+    
+    def get_stats(self) -> List[Dict]:
+        """Retorna latência média, p95 e máxima por endpoint"""
+        with self._lock:
+            snapshot = {endpoint: dict(stats, recent=sorted(stats['recent']))
+                        for endpoint, stats in self._stats.items()}
+        
+        rows = []
+        for endpoint, stats in sorted(snapshot.items()):
+            recent = stats['recent']
+            rows.append({
+                'endpoint': endpoint,
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'retries': stats['retries'],
+                'avg_ms': round(stats['total_ms'] / stats['calls'], 2) if stats['calls'] else 0.0,
+                'p95_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2) if recent else 0.0,
+                'max_ms': round(stats['max_ms'], 2)
+            })
+        return rows
+
+@st.cache_resource(show_spinner=False)
+def get_http_transport() -> HTTPTransport:
+    """Retorna a sessão HTTP única do processo (conexões mantidas entre reruns)"""
+    return HTTPTransport()
+
 class GeminiAssistant:
     """Assistente IA integrado com Google Gemini e dados do Supabase"""
     
@@ -471,10 +620,6 @@ def __init__(self, db_manager):
     def call_gemini(self, question, context):
         """Chama a API do Google Gemini"""
         try:
-            import requests
-            import json
-            import time
-            
             start_time = time.time()
             
             # Preparar o prompt
@@ -516,7 +661,7 @@ def call_gemini(self, question, context):
             }
             
             # Fazer chamada para a API
-            response = requests.post(api_url, json=payload, headers=headers, timeout=30)
+            response = get_http_transport().post(api_url, json=payload, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -596,6 +741,9 @@ def get_database_context(self):
                 
                 total_records = 0
                 
+                # Estrutura de todas as tabelas em uma única consulta (em cache)
+                schema = self.db_manager.get_schema_introspection() if hasattr(self.db_manager, 'get_schema_introspection') else {}
+                
                 # Processar TODAS as tabelas para contexto completo
                 for table in all_tables:
                     table_rows = table.get('rows', 0)
@@ -611,8 +759,24 @@ def get_database_context(self):
                         "last_modified": table.get('last_modified', 'N/A')
                     }
                     
+                    table_schema = schema.get(table['name'])
+                    if table_schema:
+                        table_info["columns"] = [
+                            {
+                                "name": col['name'],
+                                "type": col['type'],
+                                "nullable": col['nullable']
+                            } for col in table_schema['columns']
+                        ]
+                        table_info["total_columns"] = len(table_schema['columns'])
+                        table_info["primary_key"] = table_schema['primary_key']
+                        table_info["foreign_keys"] = [
+                            f"{', '.join(fk['columns'] or [])} -> {fk['references_table']}"
+                            for fk in table_schema['foreign_keys']
+                        ]
+                    
                     # Adicionar informações de colunas para tabelas principais (primeiras 20)
-                    if len(context["tables"]) < 20:
+                    elif len(context["tables"]) < 20:
                         try:
                             columns = self.db_manager.get_table_columns(table['name'])
                             table_info["columns"] = [
@@ -1228,167 +1392,3062 @@ def rate_conversation(conversation_id, rating):
         return False
 
 # =====================================================================
-# CLASSE DE CONEXÃO COM BANCO DE DADOS
+# BACKEND POSTGRESQL NATIVO (POOL DE CONEXÕES)
 # =====================================================================
 
-class DatabaseManager:
-    """Gerenciador de conexão e operações com banco de dados Supabase"""
+# Comandos que não alteram dados (não invalidam caches)
+READ_ONLY_COMMANDS = ('SELECT', 'WITH', 'EXPLAIN', 'SHOW', 'VALUES', 'TABLE')
+
+# Manutenção: altera estatísticas e armazenamento, mas não o resultado das consultas
+MAINTENANCE_COMMANDS = ('ANALYZE', 'VACUUM', 'REINDEX', 'CLUSTER', 'CHECKPOINT')
+
+# Comandos que o PostgreSQL não aceita dentro de um bloco de transação (sobre o SQL normalizado).
+# REINDEX TABLE/INDEX e CLUSTER tabela rodam normalmente em transação.
+AUTOCOMMIT_COMMAND_PATTERN = re.compile(
+    r'(?:vacuum\b'
+    r'|reindex\s+(?:\([^)]*\bconcurrently\b[^)]*\)|(?:\([^)]*\)\s*)?(?:database|system)\b'
+    r'|(?:\([^)]*\)\s*)?\w+\s+concurrently\b)'
+    r'|cluster(?:\s+verbose|\s*\([^)]*\))?$'
+    r'|create\s+(?:unique\s+)?index\s+concurrently\b|drop\s+index\s+concurrently\b'
+    r'|(?:create|drop)\s+(?:database|tablespace)\b|alter\s+system\b'
+    r'|alter\s+table\b.*\bdetach\s+partition\b.*\bconcurrently\b)'
+)
+
+# Controle de transação: em um script de transação única, um COMMIT no meio confirmaria parte
+# do script e o relatório de "transação desfeita" deixaria de ser verdadeiro
+TRANSACTION_CONTROL_PATTERN = re.compile(
+    r'(?:begin|start\s+transaction|commit|end|rollback|abort|savepoint|release|prepare\s+transaction)\b'
+)
+
+def requires_autocommit(query: str) -> bool:
+    """O comando precisa rodar fora de um bloco de transação (VACUUM, CREATE INDEX CONCURRENTLY...)"""
+    return AUTOCOMMIT_COMMAND_PATTERN.match(normalize_sql(query)) is not None
+
+# Metadados de todas as tabelas em uma única consulta ao catálogo.
+# Também pode ser publicada como função RPC (get_catalog_snapshot) no Supabase.
+CATALOG_SNAPSHOT_SQL = """
+SELECT c.oid::bigint AS oid,
+       n.nspname AS schema,
+       c.relname AS name,
+       CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint
+            ELSE COALESCE(s.n_live_tup, 0) END AS row_estimate,
+       pg_total_relation_size(c.oid) AS total_bytes,
+       (SELECT count(*) FROM pg_index i WHERE i.indrelid = c.oid) AS index_count,
+       c.relhasindex AS has_indexes,
+       c.relhasrules AS has_rules,
+       c.relhastriggers AS has_triggers,
+       c.relrowsecurity AS rls_enabled,
+       GREATEST(s.last_vacuum, s.last_autovacuum) AS last_vacuum,
+       GREATEST(s.last_analyze, s.last_autoanalyze) AS last_analyze
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind IN ('r', 'p')
+  AND n.nspname = 'public'
+"""
+
+# Impressão digital barata do catálogo: OID da relação + timestamps/contadores de estatísticas
+# (schema_fingerprint muda com ALTER TABLE, pois a linha de pg_class é reescrita)
+CATALOG_FINGERPRINT_SQL = """
+SELECT c.relname AS name,
+       md5(concat_ws('|', c.oid, c.relfilenode, s.n_tup_ins, s.n_tup_upd, s.n_tup_del,
+                     s.last_vacuum, s.last_autovacuum, s.last_analyze, s.last_autoanalyze)) AS fingerprint,
+       md5(concat_ws('|', c.oid, c.xmin, c.relnatts)) AS schema_fingerprint
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind IN ('r', 'p')
+  AND n.nspname = 'public'
+"""
+
+# Estrutura completa (colunas, PK, FKs, índices) de todas as tabelas em uma consulta
+SCHEMA_INTROSPECTION_SQL = """
+SELECT c.relname AS table_name,
+       (SELECT json_agg(json_build_object(
+                   'name', a.attname,
+                   'type', format_type(a.atttypid, a.atttypmod),
+                   'nullable', NOT a.attnotnull,
+                   'default', pg_get_expr(d.adbin, d.adrelid),
+                   'max_length', CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 4
+                                      THEN a.atttypmod - 4 END
+               ) ORDER BY a.attnum)
+          FROM pg_attribute a
+          LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+         WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped) AS columns,
+       (SELECT json_agg(a.attname ORDER BY a.attnum)
+          FROM pg_index i
+          JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+         WHERE i.indrelid = c.oid AND i.indisprimary) AS primary_key,
+       (SELECT json_agg(json_build_object(
+                   'name', con.conname,
+                   'columns', (SELECT json_agg(att.attname) FROM pg_attribute att
+                                WHERE att.attrelid = con.conrelid AND att.attnum = ANY(con.conkey)),
+                   'references_table', con.confrelid::regclass::text,
+                   'references_columns', (SELECT json_agg(att.attname) FROM pg_attribute att
+                                           WHERE att.attrelid = con.confrelid AND att.attnum = ANY(con.confkey)),
+                   'definition', pg_get_constraintdef(con.oid)))
+          FROM pg_constraint con
+         WHERE con.conrelid = c.oid AND con.contype = 'f') AS foreign_keys,
+       (SELECT json_agg(json_build_object(
+                   'name', ic.relname,
+                   'unique', i.indisunique,
+                   'primary', i.indisprimary,
+                   'definition', pg_get_indexdef(i.indexrelid)))
+          FROM pg_index i
+          JOIN pg_class ic ON ic.oid = i.indexrelid
+         WHERE i.indrelid = c.oid) AS indexes
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('r', 'p')
+  AND n.nspname = 'public'
+"""
+
+# Tempo (segundos) que um snapshot do catálogo é reutilizado
+CATALOG_SNAPSHOT_TTL = 60
+
+# Contagem que falhou (erro, lock, timeout) só é tentada de novo depois deste intervalo
+COUNT_RETRY_SECONDS = 60
+
+# Introspecção do schema: nova versão do catálogo (DDL) já invalida; o TTL cobre o OpenAPI,
+# em que alterações de estrutura não são detectadas
+SCHEMA_INTROSPECTION_TTL = 900
+
+# Jobs de query concluídos: tempo de retenção (segundos) e quantidade mantida por sessão
+QUERY_JOB_RETENTION = 3600
+QUERY_JOBS_PER_OWNER = 20
+
+# Amostragem com TABLESAMPLE: linhas desejadas e tamanho a partir do qual SYSTEM (sorteia
+# páginas inteiras, lê poucas) substitui BERNOULLI (sorteia linhas, mas percorre a tabela toda)
+SAMPLE_TARGET_ROWS = 1000
+SAMPLE_SYSTEM_MIN_ROWS = 100000
+
+def format_bytes(num_bytes) -> str:
+    """Formata um tamanho em bytes (KB/MB/GB)"""
+    size = float(num_bytes or 0)
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def run_bounded_concurrently(func, items: List, max_workers: int = 8, item_timeout: float = 10.0,
+                             on_progress=None) -> Tuple[Dict, List]:
+    """Executa func(item) em paralelo com limite de concorrência e timeout por item.
     
-    def __init__(self):
-        self.supabase_client = None
-        self.supabase_admin = None
-        self.connected = False
-        self.connection_info = {}
-        self.real_tables = []
-        self._init_connection()
+    Retorna (resultados por item, itens que falharam ou expiraram); on_progress(feitos, total)
+    é chamado na thread principal, então pode atualizar elementos do Streamlit.
+    """
+    results, failed = {}, []
+    if not items:
+        return results, failed
     
-    def _init_connection(self):
-        """Inicializa conexão com o Supabase"""
+    started = {}
+    
+    def run(item):
+        started[item] = time.time()
+        return func(item)
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(items))))
+    futures = {executor.submit(run, item): item for item in items}
+    pending = set(futures)
+    finished = 0
+    
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception:
+                    failed.append(futures[future])
+            
+            # O timeout conta a partir do início da execução do item, não da fila
+            now = time.time()
+            expired = {f for f in pending
+                       if futures[f] in started and now - started[futures[f]] > item_timeout}
+            for future in expired:
+                future.cancel()
+                failed.append(futures[future])
+            pending -= expired
+            
+            if done or expired:
+                finished += len(done) + len(expired)
+                if on_progress:
+                    on_progress(finished, len(items))
+    finally:
+        # Itens expirados continuam em segundo plano; seus resultados são descartados
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return results, failed
+
+def format_row_count(rows, estimated: bool = False) -> str:
+    """Formata contagem de registros; estimativas do planejador recebem o prefixo ~"""
+    return f"~{int(rows or 0):,}" if estimated else f"{int(rows or 0):,}"
+
+def quote_identifier(name: str) -> str:
+    """Coloca um identificador SQL entre aspas duplas com escape"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def get_pool_statement_timeout(db_settings: Dict) -> int:
+    """statement_timeout padrão das conexões do pool (segundos). Vale para consultas internas
+    (catálogo, contagens, painéis); editor e scripts usam o timeout de query do sistema.
+    Configurações antigas gravavam o mesmo valor como database.query_timeout."""
+    return db_settings.get('statement_timeout', db_settings.get('query_timeout', 60))
+
+def get_postgres_dsn(db_settings: Optional[Dict] = None) -> Optional[str]:
+    """Resolve a string de conexão PostgreSQL direta (secrets, configurações ou PGPASSWORD)"""
+    if not PSYCOPG2_AVAILABLE:
+        return None
+    
+    db_settings = db_settings or {}
+    pg_secrets = CONFIG.get('postgres', {})
+    sslmode = 'require' if db_settings.get('ssl_enabled', True) else 'prefer'
+    
+    # 1. DSN/URL completa em [postgres] nos secrets
+    dsn = pg_secrets.get('dsn') or pg_secrets.get('url')
+    if dsn:
+        return dsn
+    
+    # 2. Parâmetros separados nos secrets
+    if pg_secrets.get('host'):
+        return psycopg2.extensions.make_dsn(
+            host=pg_secrets['host'],
+            port=pg_secrets.get('port', 5432),
+            dbname=pg_secrets.get('database', 'postgres'),
+            user=pg_secrets.get('user', 'postgres'),
+            password=pg_secrets.get('password', ''),
+            sslmode=pg_secrets.get('sslmode', sslmode)
+        )
+    
+    # 3. Configurações PostgreSQL da página de configurações; a senha vem da sessão
+    #    ou da variável de ambiente PGPASSWORD, pois não é gravada em user_settings.json
+    pg_password = db_settings.get('pg_password') or os.environ.get('PGPASSWORD')
+    if db_settings.get('pg_host') and pg_password:
+        return psycopg2.extensions.make_dsn(
+            host=db_settings['pg_host'],
+            port=db_settings.get('pg_port', 5432),
+            dbname=db_settings.get('pg_database', 'postgres'),
+            user=db_settings.get('pg_username', 'postgres'),
+            password=pg_password,
+            sslmode=sslmode
+        )
+    
+    return None
+
+# Executado ao devolver uma conexão ao pool: volta os parâmetros de sessão (inclusive um
+# statement_timeout cujo RESET não chegou a rodar) aos padrões da conexão. Diferente de
+# DISCARD ALL, preserva os prepared statements acompanhados pelo pool.
+SESSION_RESET_SQL = "SET SESSION AUTHORIZATION DEFAULT; RESET ROLE; RESET ALL; DISCARD TEMP"
+
+class PostgresConnectionPool:
+    """Pool de conexões PostgreSQL thread-safe com métricas de espera e utilização"""
+    
+    def __init__(self, dsn: str, pool_size: int = 20, max_connections: int = 100,
+                 connection_timeout: int = 30, query_timeout: int = 60):
+        self.dsn = dsn
+        self.pool_size = max(1, int(pool_size))
+        self.max_connections = max(self.pool_size, int(max_connections))
+        self.connection_timeout = int(connection_timeout)
+        self.query_timeout = int(query_timeout)
+        
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._prepared = {}  # id(conexão) -> nomes dos prepared statements daquela sessão
+        
+        # Métricas
+        self._wait_times = deque(maxlen=500)
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.connections_created = 0
+        self.peak_in_use = 0
+        self.prepared_created = 0
+        self.prepared_reused = 0
+    
+    def _connect(self):
+        """Abre uma nova conexão física com timeouts configurados"""
+        conn = psycopg2.connect(
+            self.dsn,
+            connect_timeout=self.connection_timeout,
+            options=f"-c statement_timeout={self.query_timeout * 1000}",
+            application_name='petcare-dba-admin'
+        )
+        with self._lock:
+            self.connections_created += 1
+            self._prepared.pop(id(conn), None)  # id de uma conexão antiga já fechada
+        return conn
+    
+    def acquire(self):
+        """Obtém uma conexão do pool, aguardando até connection_timeout"""
+        if self._closed:
+            raise psycopg2.InterfaceError("Pool de conexões fechado")
+        
+        wait_start = time.time()
+        if not self._slots.acquire(timeout=self.connection_timeout):
+            with self._lock:
+                self.timeouts += 1
+                self._wait_times.append(time.time() - wait_start)
+            raise TimeoutError(
+                f"Nenhuma conexão disponível após {self.connection_timeout}s "
+                f"({self.max_connections} conexões em uso)"
+            )
+        
+        with self._lock:
+            self._wait_times.append(time.time() - wait_start)
+            self.acquisitions += 1
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+            conn = self._idle.pop() if self._idle else None
+        
         try:
-            if SUPABASE_AVAILABLE and CONFIG['supabase_url']:
-                # Cliente normal (anon key)
-                self.supabase_client = create_client(
-                    CONFIG['supabase_url'],
-                    CONFIG['supabase_anon_key']
-                )
-                
-                # Cliente admin (service role key) para operações administrativas
-                self.supabase_admin = create_client(
-                    CONFIG['supabase_url'],
-                    CONFIG['supabase_service_key']
-                )
-                
-                # Descobrir tabelas reais do banco
-                self._discover_real_tables()
-                
-                self.connected = True
-                self.connection_info = {
-                    'type': 'Supabase',
-                    'url': CONFIG['supabase_url'],
-                    'status': 'Conectado',
-                    'tables_found': len(self.real_tables)
-                }
-                
-                st.success(f"✅ Conectado ao Supabase! {len(self.real_tables)} tabelas encontradas.")
-                
+            if conn is None or conn.closed:
+                conn = self._connect()
+            return conn
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+            raise
+    
+    def release(self, conn, discard: bool = False):
+        """Devolve a conexão ao pool (ou fecha se estiver quebrada ou sobrando).
+        A conexão é compartilhada entre sessões: SET, SET ROLE e tabelas temporárias do
+        editor ou de scripts são desfeitos; os prepared statements da sessão são mantidos."""
+        keep = False
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(SESSION_RESET_SQL)
+                conn.autocommit = False
+                keep = True
+            except Exception:
+                keep = False
+        
+        with self._lock:
+            self._in_use -= 1
+            if keep and not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                conn = None
             else:
-                self._init_demo_mode()
+                self._prepared.pop(id(conn), None)
         
-        except Exception as e:
-            st.error(f"❌ Erro ao conectar com Supabase: {e}")
-            self._init_demo_mode()
+        if conn is not None and not conn.closed:
+            conn.close()
+        self._slots.release()
     
-    def _init_demo_mode(self):
-        """Inicializa modo demonstração"""
-        self.connected = False
-        self.connection_info = {
-            'type': 'Demo',
-            'url': 'localhost',
-            'status': 'Modo Demonstração'
-        }
-        self.real_tables = []
+    def prepared_statements(self, conn) -> set:
+        """Prepared statements já criados na sessão desta conexão (vivem até ela ser fechada)"""
+        with self._lock:
+            return self._prepared.setdefault(id(conn), set())
     
-    def _discover_real_tables(self):
-        """Descobre as tabelas reais do banco Supabase usando múltiplas estratégias"""
-        self.real_tables = []
+    def record_prepared_use(self, reused: bool):
+        with self._lock:
+            if reused:
+                self.prepared_reused += 1
+            else:
+                self.prepared_created += 1
+    
+    @contextmanager
+    def connection(self, autocommit: bool = False):
+        """Context manager que faz commit ao final ou rollback em caso de erro"""
+        conn = self.acquire()
+        discard = False
+        try:
+            conn.autocommit = autocommit
+            yield conn
+            if not autocommit:
+                conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn, discard=discard)
+    
+    def close_all(self):
+        """Fecha todas as conexões ociosas e impede novas aquisições"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._prepared.clear()
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
+    def get_metrics(self) -> Dict:
+        """Retorna métricas de utilização e tempo de espera do pool"""
+        with self._lock:
+            waits = sorted(self._wait_times)
+            in_use = self._in_use
+            idle = len(self._idle)
+        
+        def percentile(values, pct):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(len(values) * pct))]
         
+        return {
+            'pool_size': self.pool_size,
+            'max_connections': self.max_connections,
+            'in_use': in_use,
+            'idle': idle,
+            'peak_in_use': self.peak_in_use,
+            'utilization': round(in_use / self.max_connections * 100, 1),
+            'acquisitions': self.acquisitions,
+            'timeouts': self.timeouts,
+            'connections_created': self.connections_created,
+            'prepared_created': self.prepared_created,
+            'prepared_reused': self.prepared_reused,
+            'avg_wait_ms': round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            'p95_wait_ms': round(percentile(waits, 0.95) * 1000, 2),
+            'max_wait_ms': round(waits[-1] * 1000, 2) if waits else 0.0
+        }
+
+class QueryStream:
+    """Resultado de SELECT lido sob demanda por um cursor nomeado no servidor (DECLARE/FETCH).
+    Mantém apenas as últimas páginas em memória, independentemente do tamanho do resultado."""
+    
+    def __init__(self, pool: PostgresConnectionPool, query: str, params=None,
+                 page_size: int = 100, max_buffered_pages: int = 10):
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.page_size = max(1, int(page_size))
+        self.pages = deque(maxlen=max(1, int(max_buffered_pages)))
+        self.first_buffered_row = 0
+        self.rows_fetched = 0
+        self.exhausted = False
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._conn = pool.acquire()
         try:
-            st.info("🔍 Descobrindo tabelas do Supabase...")
-            
-            # Método 1: Usar PostgREST para consultar information_schema
-            self._discover_via_information_schema()
-            
-            # Método 2: Se não funcionou, tentar via API REST OpenAPI
-            if not self.real_tables:
-                self._discover_via_openapi()
-            
-            # Método 3: Se ainda não funcionou, testar tabelas comuns
-            if not self.real_tables:
-                self._discover_via_common_tables()
-            
-            # Remover duplicatas
-            seen = set()
-            unique_tables = []
-            for table in self.real_tables:
-                if table['name'] not in seen:
-                    seen.add(table['name'])
-                    unique_tables.append(table)
-            
-            self.real_tables = unique_tables
-            
-            # Atualizar contagens
-            self._update_table_counts()
-            
-            st.success(f"✅ {len(self.real_tables)} tabelas descobertas!")
+            # Cursor nomeado exige transação aberta (sem autocommit)
+            self._conn.autocommit = False
+            self._cursor = self._conn.cursor(
+                name=f"petcare_stream_{self.stream_id}",
+                cursor_factory=RealDictCursor
+            )
+            self._cursor.itersize = self.page_size
+            self._cursor.execute(query.strip().rstrip(';'), params)
+        except Exception:
+            self.close(discard=True)
+            raise
+    
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None
+    
+    def fetch_page(self) -> List[Dict]:
+        """Busca a próxima página no servidor; o cursor é fechado ao fim do resultado"""
+        with self._lock:
+            self.last_used = time.time()
+            if self.exhausted or self._conn is None:
+                return []
             
-        except Exception as e:
-            st.error(f"❌ Erro ao descobrir tabelas: {e}")
-            self.real_tables = []
+            try:
+                rows = [dict(row) for row in self._cursor.fetchmany(self.page_size)]
+            except Exception:
+                self._close_locked(discard=True)
+                self.exhausted = True
+                raise
+            
+            if len(self.pages) == self.pages.maxlen:
+                self.first_buffered_row += len(self.pages[0])
+            self.pages.append(rows)
+            self.rows_fetched += len(rows)
+            
+            if len(rows) < self.page_size:
+                self.exhausted = True
+                self._close_locked()
+            return rows
+    
+    def buffered_rows(self) -> List[Dict]:
+        """Linhas ainda em memória (as páginas mais antigas são descartadas)"""
+        with self._lock:
+            return [row for page in self.pages for row in page]
+    
+    def close(self, discard: bool = False):
+        with self._lock:
+            self._close_locked(discard)
+    
+    def _close_locked(self, discard: bool = False):
+        if self._conn is None:
+            return
+        try:
+            if not discard and getattr(self, '_cursor', None) is not None and not self._cursor.closed:
+                self._cursor.close()
+        except Exception:
+            discard = True
+        conn, self._conn = self._conn, None
+        self._pool.release(conn, discard=discard)
 
-    def get_table_row_count(self, table_name):
-        """Obtém contagem de registros de uma tabela"""
+# =====================================================================
+# CACHE EM MEMÓRIA (TTL + STALE-WHILE-REVALIDATE)
+# =====================================================================
+
+class TTLCache:
+    """Cache LRU com TTL; entradas expiradas são servidas e recarregadas em segundo plano"""
+    
+    def __init__(self, ttl_seconds: float = 900, enabled: bool = True, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.max_entries = max_entries
+        
+        self._entries = OrderedDict()  # chave -> (valor, armazenado_em)
+        self._refreshing = set()
+        self._pending = {}  # chave -> Future de pré-carregamento
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+        
+        # Contadores
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+        self.prefetch_hits = 0
+    
+    @classmethod
+    def from_settings(cls, system_settings: Dict) -> 'TTLCache':
+        """Cria o cache a partir das configurações enable_cache/cache_duration (minutos)"""
+        return cls(
+            ttl_seconds=system_settings.get('cache_duration', 15) * 60,
+            enabled=system_settings.get('enable_cache', True)
+        )
+    
+    def configure(self, enabled: bool, ttl_seconds: float):
+        """Aplica novas configurações; desativar o cache descarta as entradas"""
+        with self._lock:
+            self.enabled = enabled
+            self.ttl_seconds = ttl_seconds
+            if not enabled:
+                self.evictions += len(self._entries)
+                self._entries.clear()
+    
+    def _store(self, key, value):
+        """Armazena a entrada e remove as menos usadas além do limite (requer o lock)"""
+        self._entries[key] = (value, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def _refresh(self, key, loader, cacheable):
+        """Recarrega uma entrada expirada em segundo plano (mantém o valor antigo em caso de erro)"""
         try:
-            if not self.connected:
-                # Retornar dados simulados para modo demo
-                demo_counts = {
-                    'users': 1250,
-                    'products': 850, 
-                    'orders': 3200,
-                    'categories': 25,
-                    'reviews': 4500,
-                    'customers': 890,
-                    'inventory': 1200,
-                    'payments': 2800,
-                    'pets': 1840,
-                    'appointments': 2650,
-                    'medical_records': 3420,
-                    'veterinarians': 45,
-                    'clinics': 12,
-                    'treatments': 5680,
-                    'medications': 234,
-                    'invoices': 1890
-                }
+            value = loader()
+            with self._lock:
+                if self.enabled and key in self._entries and cacheable(value):
+                    self._store(key, value)
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+    
+    def get_or_load(self, key, loader, cacheable=lambda value: True):
+        """Retorna o valor em cache ou carrega com loader()"""
+        if not self.enabled:
+            return loader()
+        
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
                 
-                # Se for uma tabela conhecida, retornar valor simulado, senão gerar aleatório
-                if isinstance(table_name, dict):
-                    table_name = table_name.get('name', 'unknown')
+                if age < self.ttl_seconds:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
                 
-                return demo_counts.get(table_name, random.randint(50, 1000))
-            
-            # Buscar contagem real da tabela
-            result = self.supabase_client.table(table_name).select('*', count='exact').limit(1).execute()
+                # Expirada, mas dentro da janela de revalidação: servir e recarregar em segundo plano
+                if age < self.ttl_seconds * 2:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, loader, cacheable)
+                    return value
+                
+                del self._entries[key]
+                self.evictions += 1
             
-            if hasattr(result, 'count') and result.count is not None:
-                return result.count
+            pending = self._pending.get(key)
+            if pending is None:
+                self.misses += 1
+        
+        # Pré-carregamento em andamento: aguardar em vez de repetir a consulta
+        if pending is not None:
+            try:
+                value = pending.result()
+                with self._lock:
+                    self.prefetch_hits += 1
+                return value
+            except Exception:
+                with self._lock:
+                    self.misses += 1
+        
+        value = loader()
+        if cacheable(value):
+            with self._lock:
+                self._store(key, value)
+        return value
+    
+    def prefetch(self, key, loader, cacheable=lambda value: True):
+        """Carrega uma entrada em segundo plano antes de ser pedida (ex.: a próxima página)"""
+        with self._lock:
+            if not self.enabled or key in self._entries or key in self._pending:
+                return
+            self._pending[key] = self._executor.submit(self._prefetch, key, loader, cacheable)
+    
+    def _prefetch(self, key, loader, cacheable):
+        try:
+            value = loader()
+            if cacheable(value):
+                with self._lock:
+                    if self.enabled:
+                        self._store(key, value)
+            return value
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+    
+    def invalidate(self, predicate=None):
+        """Remove entradas (todas, ou as cujas chaves satisfazem predicate)"""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                del self._entries[key]
+            self.evictions += len(keys)
+    
+    def get_stats(self) -> Dict:
+        """Contadores de acerto/erro/remoção do cache"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.prefetch_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl_seconds': self.ttl_seconds,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refresh_errors': self.refresh_errors,
+                'prefetch_hits': self.prefetch_hits,
+                'hit_ratio': round((self.hits + self.stale_hits + self.prefetch_hits) / lookups * 100, 1) if lookups else 0.0
+            }
+
+SQL_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+SQL_WRITE_TARGET_PATTERN = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|COPY)'
+    r'\s+(?:ONLY\s+)?([\w."]+(?:\s*,\s*(?:ONLY\s+)?[\w."]+)*)',  # TRUNCATE a, b
+    re.IGNORECASE
+)
+# Tokens do SQL normalizado usados para percorrer as listas FROM
+SQL_READ_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[a-z_][\w$]*|\d+(?:\.\d+)?|::|\S")
+SQL_CTE_NAME_PATTERN = re.compile(
+    r'(?:\bwith(?:\s+recursive)?|,)\s*("(?:[^"]|"")*"|[a-z_][\w$]*)\s*(?:\([^()]*\)\s*)?'
+    r'as\s*(?:not\s+)?(?:materialized\s*)?\('
+)
+# Palavras que encerram uma lista FROM no nível de parênteses atual
+SQL_FROM_LIST_END = frozenset((
+    'where', 'group', 'having', 'window', 'order', 'limit', 'offset', 'fetch', 'for',
+    'union', 'intersect', 'except', 'returning', 'select', 'values'
+))
+# Funções cujo FROM interno não é uma lista de tabelas: extract(year FROM x), substring(x FROM 2)
+SQL_FROM_FUNCTIONS = frozenset(('extract', 'substring', 'trim', 'overlay', 'position'))
+SQL_VOLATILE_PATTERN = re.compile(
+    r'\bcurrent_(?:timestamp|time|date)\b|\blocaltime(?:stamp)?\b|\bpg_stat|\bpg_locks\b|\bpg_settings\b',
+    re.IGNORECASE
+)
+SQL_CALL_PATTERN = re.compile(r'("?[\w.$]+"?)\s*\(')
+
+# Palavras-chave seguidas de '(' que não são chamadas de função
+SQL_PAREN_KEYWORDS = frozenset((
+    'select', 'from', 'join', 'in', 'exists', 'as', 'on', 'using', 'where', 'and', 'or', 'not',
+    'over', 'filter', 'within', 'values', 'any', 'all', 'some', 'when', 'then', 'else', 'case',
+    'between', 'is', 'distinct', 'union', 'intersect', 'except', 'with', 'recursive', 'materialized',
+    'by', 'having', 'lateral', 'row', 'array', 'cast', 'extract', 'position', 'substring', 'trim', 'overlay'
+))
+
+# Funções puras permitidas em consultas cacheáveis (qualquer outra, inclusive do usuário, desativa o cache)
+SQL_CACHEABLE_FUNCTIONS = frozenset((
+    'count', 'sum', 'avg', 'min', 'max', 'stddev', 'stddev_pop', 'stddev_samp', 'variance', 'var_pop',
+    'var_samp', 'bool_and', 'bool_or', 'every', 'percentile_cont', 'percentile_disc', 'mode',
+    'array_agg', 'string_agg', 'json_agg', 'jsonb_agg', 'json_object_agg', 'jsonb_object_agg',
+    'row_number', 'rank', 'dense_rank', 'percent_rank', 'cume_dist', 'ntile', 'lag', 'lead',
+    'first_value', 'last_value', 'nth_value',
+    'coalesce', 'nullif', 'greatest', 'least',
+    'lower', 'upper', 'initcap', 'length', 'char_length', 'character_length', 'octet_length', 'substr',
+    'btrim', 'ltrim', 'rtrim', 'replace', 'concat', 'concat_ws', 'left', 'right', 'lpad', 'rpad',
+    'split_part', 'strpos', 'reverse', 'repeat', 'md5', 'regexp_replace', 'regexp_match', 'regexp_matches',
+    'abs', 'round', 'trunc', 'ceil', 'ceiling', 'floor', 'mod', 'power', 'sqrt', 'sign', 'div',
+    'date_part', 'date_trunc', 'age', 'make_date', 'to_char', 'to_date', 'to_number',
+    'array_length', 'cardinality', 'unnest', 'generate_series',
+    'to_json', 'to_jsonb', 'json_build_object', 'jsonb_build_object', 'json_build_array',
+    'jsonb_build_array', 'jsonb_array_length', 'json_array_length', 'jsonb_typeof', 'jsonb_extract_path_text',
+    # Tipos com modificador em casts (::numeric(10,2), varchar(20)...)
+    'numeric', 'decimal', 'varchar', 'char', 'character', 'bit', 'timestamp', 'time', 'interval', 'float'
+))
+
+def normalize_sql(query: str) -> str:
+    """Forma canônica da query: sem comentários, espaços colapsados e caixa baixa fora de literais"""
+    parts = SQL_LITERAL_PATTERN.split(query.strip().rstrip(';').strip())
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            normalized.append(part)  # literal ou identificador entre aspas: preservado
+        else:
+            part = re.sub(r'--[^\n]*|/\*.*?\*/', ' ', part, flags=re.DOTALL)
+            normalized.append(re.sub(r'\s+', ' ', part).lower())
+    return ''.join(normalized).strip()
+
+def query_fingerprint(query: str) -> str:
+    """Impressão digital da query: SQL normalizado com constantes trocadas por '?'"""
+    normalized = normalize_sql(query)
+    normalized = re.sub(r"'(?:[^']|'')*'", '?', normalized)
+    normalized = re.sub(r'\b\d+(?:\.\d+)?\b', '?', normalized)
+    normalized = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', normalized)
+    return hashlib.md5(normalized.encode()).hexdigest()[:16]
+
+def _table_names(pattern, query: str) -> set:
+    names = [name for match in pattern.findall(query) for name in match.split(',')]
+    return {re.sub(r'(?i)^\s*only\s+', '', name).split('.')[-1].strip().strip('"').lower() for name in names}
+
+def extract_written_tables(query: str) -> set:
+    """Tabelas alteradas por um comando de escrita (conjunto vazio = não identificadas)"""
+    return _table_names(SQL_WRITE_TARGET_PATTERN, query)
+
+def extract_read_tables(query: str) -> Optional[set]:
+    """Tabelas lidas por uma consulta: todas as relações das listas FROM/JOIN, inclusive em
+    CTEs e subconsultas (nomes de CTE não contam). None quando a lista não pode ser determinada."""
+    normalized = normalize_sql(query)
+    tokens = SQL_READ_TOKEN_PATTERN.findall(normalized)
+    ctes = {name.strip('"').lower() for name in SQL_CTE_NAME_PATTERN.findall(normalized)}
+    tables = set()
+    
+    def identifier(token: str) -> bool:
+        return token[0] == '"' or re.fullmatch(r'[a-z_][\w$]*', token) is not None
+    
+    # Por nível de parênteses: [dentro de uma lista FROM, função que abriu o parêntese]
+    frames = [[tokens[:1] == ['table'], None]]
+    expect_relation = frames[0][0]
+    previous = None
+    i = 1 if expect_relation else 0  # TABLE nome
+    while i < len(tokens):
+        token = tokens[i]
+        if expect_relation:
+            expect_relation = False
+            while token in ('only', 'lateral') and i + 1 < len(tokens):
+                i += 1
+                token = tokens[i]
+            if token == '(':
+                # Subconsulta, ou join entre parênteses cuja primeira relação vem a seguir
+                nested_from = i + 1 < len(tokens) and tokens[i + 1] not in ('select', 'with', 'values', 'table')
+                frames.append([nested_from, None])
+                expect_relation = nested_from
+            elif identifier(token):
+                name = token
+                if tokens[i + 1:i + 2] == ['.'] and i + 2 < len(tokens):
+                    i += 2
+                    name = tokens[i]
+                if tokens[i + 1:i + 2] != ['(']:  # função em FROM (generate_series, unnest) não é tabela
+                    tables.add(name.strip('"').lower())
             else:
-                return 0
-                
-        except Exception as e:
-            # Em caso de erro, retornar valor simulado
-            return random.randint(10, 500)
+                return None
+        elif token == '(':
+            frames.append([False, previous])
+        elif token == ')':
+            if len(frames) == 1:
+                return None
+            frames.pop()
+        elif token in ('from', 'join') and frames[-1][1] not in SQL_FROM_FUNCTIONS:
+            frames[-1][0] = expect_relation = True
+        elif token == ',' and frames[-1][0]:
+            expect_relation = True
+        elif token in SQL_FROM_LIST_END:
+            frames[-1][0] = False
+        previous = token
+        i += 1
+    
+    if expect_relation or len(frames) != 1:
+        return None
+    return tables - ctes
 
-    def get_table_size_mb(self, table_name):
-        """Estima o tamanho de uma tabela em MB"""
+# Literais, comentários e corpos $tag$...$tag$ não podem ser cortados no ';'
+SQL_STATEMENT_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|(\$\w*\$).*?\1|;",
+    re.DOTALL
+)
+
+def split_sql_statements(sql: str) -> List[str]:
+    """Divide um script em comandos individuais (ignora trechos só com comentários)"""
+    if SQLPARSE_AVAILABLE:
+        chunks = sqlparse.split(sql)
+    else:
+        chunks, start = [], 0
+        for match in SQL_STATEMENT_TOKEN_PATTERN.finditer(sql):
+            if match.group(0) == ';':
+                chunks.append(sql[start:match.end()])
+                start = match.end()
+        chunks.append(sql[start:])
+
+    return [chunk.strip() for chunk in chunks if normalize_sql(chunk).strip('; ')]
+
+# Parâmetros de script: ":nome" no SQL. Não são parâmetros o "::" de cast nem limites de
+# fatia de array (a[:n], a[1:n]); ARRAY[:nome] continua sendo parâmetro
+SCRIPT_PARAMETER_PATTERN = re.compile(r'(?<![:\w])(?:(?<!\[)|(?<=[Aa][Rr][Rr][Aa][Yy]\[)):([A-Za-z_]\w*)')
+
+# Tipo declarado no script -> tipo PostgreSQL usado no PREPARE
+SCRIPT_PARAMETER_TYPES = {
+    'text': 'text',
+    'integer': 'bigint',
+    'numeric': 'numeric',
+    'boolean': 'boolean',
+    'date': 'date',
+    'timestamp': 'timestamptz'
+}
+
+# Comandos aceitos pelo PREPARE do PostgreSQL
+PREPARABLE_COMMANDS = ('SELECT', 'WITH', 'VALUES', 'INSERT', 'UPDATE', 'DELETE')
+
+# Acima disso a sessão faz DEALLOCATE ALL antes de preparar outro comando
+PREPARED_STATEMENTS_PER_CONNECTION = 100
+
+# SQLSTATE do "cached plan must not change result type" (prepared statement desatualizado por DDL)
+STALE_PREPARED_PGCODE = '0A000'
+
+# SQLSTATE de query_canceled (pg_cancel_backend ou statement_timeout)
+QUERY_CANCELED_PGCODE = '57014'
+
+def _rewrite_script_parameters(sql: str, replace) -> str:
+    """Aplica replace a cada ":nome" fora de literais, comentários e corpos $$"""
+    parts, last = [], 0
+    for match in SQL_STATEMENT_TOKEN_PATTERN.finditer(sql):
+        parts.append(SCRIPT_PARAMETER_PATTERN.sub(replace, sql[last:match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(SCRIPT_PARAMETER_PATTERN.sub(replace, sql[last:]))
+    return ''.join(parts)
+
+def find_script_parameters(sql: str) -> List[str]:
+    """Nomes dos parâmetros usados no SQL, na ordem da primeira ocorrência"""
+    names = []
+    def collect(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return match.group(0)
+    _rewrite_script_parameters(sql, collect)
+    return names
+
+def _infer_parameter_type(value) -> str:
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'numeric'
+    if isinstance(value, str) and re.fullmatch(r'\d{4}-\d{2}-\d{2}', value):
+        return 'date'
+    if isinstance(value, str) and re.fullmatch(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2})?.*', value):
+        return 'timestamp'
+    return 'text'
+
+def normalize_script_parameters(declared) -> Dict[str, Dict]:
+    """Declaração de parâmetros do script no formato {nome: {'type', 'default'}}.
+    Aceita {"nome": valor_padrao} (tipo inferido) ou {"nome": {"type": "date", "default": ...}}."""
+    normalized = {}
+    for name, spec in (declared or {}).items():
+        if isinstance(spec, dict):
+            param_type = spec.get('type', 'text')
+            if param_type not in SCRIPT_PARAMETER_TYPES:
+                raise ValueError(f"Parâmetro '{name}': tipo '{param_type}' inválido "
+                                 f"(use {', '.join(SCRIPT_PARAMETER_TYPES)})")
+            normalized[name] = {'type': param_type, 'default': spec.get('default')}
+        else:
+            normalized[name] = {'type': _infer_parameter_type(spec), 'default': spec}
+    return normalized
+
+def coerce_script_parameter(value, param_type: str):
+    """Converte o valor informado para o tipo declarado (ValueError se incompatível)"""
+    if value is None or value == '':
+        return None
+    if param_type in ('integer', 'numeric'):
         try:
-            row_count = self.get_table_row_count(table_name)
-            
-            # Estimar tamanho baseado no número de registros
-            # Assumindo média de 0.5KB por registro
-            estimated_size_kb = row_count * 0.5
-            estimated_size_mb = estimated_size_kb / 1024
-            
-            return max(0.1, estimated_size_mb)  # Mínimo de 0.1MB
-            
-        except Exception:
-            return random.uniform(0.5, 50.0)
+            # Decimal a partir do texto: sem passar por float, nenhum dígito é perdido
+            number = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        except ArithmeticError:
+            raise ValueError(f"'{value}' não é numérico")
+        if number.is_snan():
+            raise ValueError(f"'{value}' não é numérico")
+        if param_type == 'numeric':
+            return number
+        if not number.is_finite() or number != number.to_integral_value():
+            raise ValueError(f"'{value}' não é um número inteiro")
+        return int(number)
+    if param_type == 'boolean':
+        if isinstance(value, str):
+            if value.strip().lower() not in ('true', 'false', 't', 'f', '1', '0', 'sim', 'não', 'nao'):
+                raise ValueError(f"'{value}' não é booleano")
+            return value.strip().lower() in ('true', 't', '1', 'sim')
+        return bool(value)
+    if param_type == 'date':
+        return value if isinstance(value, (date, datetime)) else date.fromisoformat(str(value))
+    if param_type == 'timestamp':
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    return str(value)
 
-    def get_table_last_modified(self, table_name):
-        """Obtém data da última modificação de uma tabela"""
+def bind_script_parameters(sql: str, declared, values: Optional[Dict] = None) -> Dict[str, Tuple[str, Any]]:
+    """Valida e converte os valores dos parâmetros usados no SQL: {nome: (tipo, valor)}"""
+    spec = normalize_script_parameters(declared)
+    values = values or {}
+    bound = {}
+    for name in find_script_parameters(sql):
+        if name not in spec:
+            raise ValueError(f"Parâmetro :{name} usado no SQL mas não declarado no script")
+        value = values.get(name, spec[name]['default'])
         try:
-            if not self.connected:
-                # Retornar data simulada
-                return datetime.now() - timedelta(days=random.randint(1, 30))
-            
+            bound[name] = (spec[name]['type'], coerce_script_parameter(value, spec[name]['type']))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Parâmetro :{name} ({spec[name]['type']}): {e}")
+    return bound
+
+def sql_literal(value) -> str:
+    """Literal SQL para backends sem bind de parâmetros (strings com aspas duplicadas)"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    # NaN/Infinity não são tokens SQL válidos: vão como literal com cast
+    if isinstance(value, Decimal) and not value.is_finite():
+        return f"'{'NaN' if value.is_nan() else ('-Infinity' if value.is_signed() else 'Infinity')}'::numeric"
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"'{'NaN' if math.isnan(value) else ('-Infinity' if value < 0 else 'Infinity')}'::float8"
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (date, datetime)):
+        return f"'{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+# Linhas lidas do cursor por lote ao montar resultados colunares
+COLUMNAR_BATCH_ROWS = 10000
+
+# NUMERIC com até 15 dígitos cabe em float64 sem arredondar; acima disso fica como Decimal
+NUMERIC_TYPE_OID = 1700
+FLOAT64_EXACT_DIGITS = 15
+
+def fetch_columnar(cursor, batch_rows: int = COLUMNAR_BATCH_ROWS) -> pd.DataFrame:
+    """Lê o resultado do cursor lote a lote direto para colunas (arrays NumPy de um DataFrame),
+    sem criar um dict por linha nem manter a lista inteira de tuplas em memória.
+    NUMERIC vira float64 só quando a precisão declarada cabe; os demais mantêm Decimal (object)."""
+    columns = [desc[0] for desc in cursor.description]
+    float_columns = [
+        desc[0] for desc in cursor.description
+        if desc.type_code == NUMERIC_TYPE_OID and desc.precision is not None
+        and 0 < desc.precision <= FLOAT64_EXACT_DIGITS
+    ]
+    frames = []
+    while True:
+        batch = cursor.fetchmany(batch_rows)
+        if not batch:
+            break
+        frame = pd.DataFrame.from_records(batch, columns=columns, coerce_float=False)
+        if float_columns:
+            frame = frame.astype({column: 'float64' for column in float_columns})
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True, copy=False)
+
+def result_frame(result: Dict) -> pd.DataFrame:
+    """DataFrame do resultado: o 'frame' colunar do backend nativo ou as linhas de 'data'"""
+    frame = result.get('frame')
+    if frame is not None:
+        return frame
+    return pd.DataFrame(result.get('data') or [])
+
+def result_has_rows(result: Dict) -> bool:
+    frame = result.get('frame')
+    return len(frame) > 0 if frame is not None else bool(result.get('data'))
+
+def result_payload_size(result: Dict) -> int:
+    """Bytes ocupados pelos dados do resultado (memória das colunas ou JSON das linhas)"""
+    frame = result.get('frame')
+    if frame is not None:
+        return int(frame.memory_usage(index=False, deep=True).sum())
+    return len(json.dumps(result.get('data') or [], default=str))
+
+def frame_to_json_records(frame: pd.DataFrame, **kwargs) -> str:
+    """JSON em lista de objetos gerado a partir das colunas; Decimal sai como string
+    (o serializador do pandas converteria para float e perderia dígitos)"""
+    decimal_columns = [
+        column for column in frame.columns
+        if frame[column].dtype == object and frame[column].first_valid_index() is not None
+        and isinstance(frame[column].loc[frame[column].first_valid_index()], Decimal)
+    ]
+    if decimal_columns:
+        frame = frame.assign(**{
+            column: frame[column].where(frame[column].isna(), frame[column].astype(str))
+            for column in decimal_columns
+        })
+    return frame.to_json(orient='records', default_handler=str, **kwargs)
+
+class QueryResultCache:
+    """Cache LRU de resultados de consultas de leitura, chaveado pelo SQL normalizado e pela
+    versão do catálogo, limitado por um orçamento de memória"""
+    
+    def __init__(self, budget_mb: float = 64, ttl_seconds: float = 900, enabled: bool = True):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        
+        self._entries = OrderedDict()  # (sql normalizado, versão, colunar) -> entrada
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @classmethod
+    def from_settings(cls, system_settings: Dict) -> 'QueryResultCache':
+        return cls(
+            budget_mb=system_settings.get('query_cache_mb', 64),
+            ttl_seconds=system_settings.get('cache_duration', 15) * 60,
+            enabled=system_settings.get('enable_cache', True)
+        )
+    
+    def configure(self, enabled: bool, ttl_seconds: float, budget_mb: float):
+        with self._lock:
+            self.enabled = enabled
+            self.ttl_seconds = ttl_seconds
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+            self._evict_over_budget(0)
+            if not enabled:
+                self._drop(list(self._entries))
+    
+    @staticmethod
+    def is_cacheable(query: str) -> bool:
+        """Somente leituras determinísticas: cada função chamada precisa estar em
+        SQL_CACHEABLE_FUNCTIONS (funções do usuário, pg_*, now(), setval()... nunca são cacheadas)"""
+        # Literais viram '' para que nada dentro de strings conte como chamada ou palavra-chave
+        normalized = re.sub(r"'(?:[^']|'')*'", "''", normalize_sql(query))
+        if not normalized.startswith(('select', 'with', 'values', 'table')):
+            return False
+        if extract_written_tables(normalized) or re.search(r'\binto\b|\bfor (?:update|share|no key update|key share)\b', normalized):
+            return False
+        if SQL_VOLATILE_PATTERN.search(normalized):
+            return False
+        for name in SQL_CALL_PATTERN.findall(normalized):
+            name = name.strip('"')
+            if name.startswith('pg_catalog.'):
+                name = name[len('pg_catalog.'):]
+            if name not in SQL_PAREN_KEYWORDS and name not in SQL_CACHEABLE_FUNCTIONS:
+                return False
+        return True
+    
+    def _drop(self, keys):
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.used_bytes -= entry['size']
+    
+    def _evict_over_budget(self, incoming: int):
+        while self._entries and self.used_bytes + incoming > self.budget_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self.used_bytes -= entry['size']
+            self.evictions += 1
+    
+    def get(self, query: str, catalog_version: int, columnar: bool = False) -> Optional[Dict]:
+        """Resultado em cache com metadados (None em caso de miss)"""
+        if not self.enabled:
+            return None
+        key = (normalize_sql(query), catalog_version, columnar)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry['stored_at'] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                entry['hits'] += 1
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._drop([key])
+                self.evictions += 1
+            self.misses += 1
+            return None
+    
+    def put(self, query: str, catalog_version: int, result: Dict, columnar: bool = False,
+            known_tables: Optional[set] = None):
+        """Armazena um resultado bem-sucedido; resultados maiores que o orçamento não entram.
+        Se a consulta lê relações fora de known_tables (views, outros schemas) ou o conjunto
+        lido não é determinável, a entrada é invalidada por qualquer escrita."""
+        if not self.enabled:
+            return
+        size = result_payload_size(result) + len(query)
+        if size > self.budget_bytes:
+            return
+        
+        tables = extract_read_tables(query) or set()
+        if known_tables is not None and not tables <= known_tables:
+            tables = set()
+        
+        key = (normalize_sql(query), catalog_version, columnar)
+        with self._lock:
+            self._drop([key])
+            self._evict_over_budget(size)
+            self._entries[key] = {
+                'result': result,
+                'tables': tables,
+                'size': size,
+                'stored_at': time.time(),
+                'hits': 0
+            }
+            self.used_bytes += size
+    
+    def invalidate_tables(self, tables: Optional[set] = None):
+        """Remove as entradas que leem as tabelas informadas (None = todas)"""
+        tables = {name.lower() for name in tables} if tables is not None else None
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if tables is None or not entry['tables'] or entry['tables'] & tables]
+            self._drop(keys)
+            self.invalidations += len(keys)
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'used_mb': round(self.used_bytes / 1024 / 1024, 2),
+                'budget_mb': round(self.budget_bytes / 1024 / 1024, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+# =====================================================================
+# PLANOS DE EXECUÇÃO (EXPLAIN) E HISTÓRICO POR IMPRESSÃO DIGITAL
+# =====================================================================
+
+PLAN_HISTORY_FILE = Path("query_plans.json")
+PLANS_PER_FINGERPRINT = 20
+PLAN_HISTORY_MAX_FINGERPRINTS = 200
+
+# Razão real/estimado a partir da qual o planejador errou feio a cardinalidade
+PLAN_MISESTIMATE_FACTOR = 10
+
+def flatten_query_plan(plan: Dict, depth: int = 0) -> List[Dict]:
+    """Achata a árvore de EXPLAIN (FORMAT JSON) em linhas com custo, tempo, linhas e alertas"""
+    loops = plan.get('Actual Loops', 1) or 1
+    estimated = plan.get('Plan Rows', 0)
+    actual = plan.get('Actual Rows')
+    actual_total = actual * loops if actual is not None else None
+    
+    misestimate = None
+    if actual_total is not None:
+        ratio = max(actual_total, 1) / max(estimated * loops, 1)
+        if ratio >= PLAN_MISESTIMATE_FACTOR or ratio <= 1 / PLAN_MISESTIMATE_FACTOR:
+            misestimate = round(ratio, 2)
+    
+    node = plan.get('Node Type', '?')
+    target = plan.get('Relation Name') or plan.get('Index Name') or plan.get('CTE Name') or ''
+    rows = [{
+        'depth': depth,
+        'node': node,
+        'target': target,
+        'startup_cost': plan.get('Startup Cost'),
+        'total_cost': plan.get('Total Cost'),
+        'plan_rows': estimated,
+        'actual_rows': actual_total,
+        'loops': loops if actual is not None else None,
+        'time_ms': round(plan['Actual Total Time'] * loops, 3) if 'Actual Total Time' in plan else None,
+        'shared_hit': plan.get('Shared Hit Blocks'),
+        'shared_read': plan.get('Shared Read Blocks'),
+        'filter': plan.get('Filter') or plan.get('Index Cond') or plan.get('Hash Cond') or '',
+        'seq_scan': node == 'Seq Scan',
+        'misestimate': misestimate
+    }]
+    for child in plan.get('Plans', []):
+        rows.extend(flatten_query_plan(child, depth + 1))
+    return rows
+
+def plan_signature(nodes: List[Dict]) -> str:
+    """Forma do plano (tipos de nó e relações), para detectar mudanças de plano no histórico"""
+    shape = '|'.join(f"{n['depth']}:{n['node']}:{n['target']}" for n in nodes)
+    return hashlib.md5(shape.encode()).hexdigest()[:8]
+
+class PlanHistoryStore:
+    """Planos capturados por impressão digital da query, persistidos em JSON"""
+    
+    def __init__(self, path: Path = PLAN_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._plans = self._load()
+    
+    def _load(self) -> Dict[str, List[Dict]]:
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning("Histórico de planos %s ilegível, iniciando vazio: %s", self.path, e)
+        return {}
+    
+    def _save(self):
+        """Grava num arquivo temporário e renomeia: uma falha no meio não corrompe o histórico"""
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._plans, f, ensure_ascii=False, default=str)
+        os.replace(temp_path, self.path)
+    
+    def add(self, fingerprint: str, entry: Dict):
+        """Registra um plano e descarta os mais antigos além dos limites"""
+        with self._lock:
+            history = self._plans.setdefault(fingerprint, [])
+            history.append(entry)
+            del history[:-PLANS_PER_FINGERPRINT]
+            
+            if len(self._plans) > PLAN_HISTORY_MAX_FINGERPRINTS:
+                oldest = sorted(self._plans, key=lambda fp: self._plans[fp][-1]['captured_at'])
+                for fp in oldest[:len(self._plans) - PLAN_HISTORY_MAX_FINGERPRINTS]:
+                    del self._plans[fp]
+            try:
+                self._save()
+            except Exception as e:
+                # O plano continua em memória; a próxima gravação tenta de novo
+                logger.warning("Falha ao gravar o histórico de planos em %s: %s", self.path, e)
+    
+    def get(self, fingerprint: str) -> List[Dict]:
+        with self._lock:
+            return list(self._plans.get(fingerprint, []))
+
+@st.cache_resource(show_spinner=False)
+def get_plan_history_store() -> PlanHistoryStore:
+    """Histórico de planos compartilhado pelo processo"""
+    return PlanHistoryStore()
+
+# =====================================================================
+# HISTÓRICO PERSISTENTE DE QUERIES (SQLITE, POR IMPRESSÃO DIGITAL)
+# =====================================================================
+
+QUERY_HISTORY_DB = Path("query_history.db")
+
+# Latências guardadas por impressão digital para p50/p95 (as mais antigas são descartadas)
+QUERY_HISTORY_SAMPLES = 200
+QUERY_HISTORY_MAX_FINGERPRINTS = 5000
+
+QUERY_HISTORY_ORDER = {
+    'total': 'total_ms DESC',
+    'max': 'max_ms DESC',
+    'avg': 'total_ms / executions DESC',
+    'executions': 'executions DESC',
+    'recent': 'last_seen DESC'
+}
+
+def latency_percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+class QueryHistoryStore:
+    """Execuções de queries agregadas por impressão digital em SQLite: contagem, latências
+    (p50/p95/máx), linhas e último erro, preservadas entre sessões e reinícios"""
+    
+    def __init__(self, path: Path = QUERY_HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=5, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS query_fingerprints (
+                    fingerprint TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    executions INTEGER NOT NULL DEFAULT 0,
+                    errors INTEGER NOT NULL DEFAULT 0,
+                    total_ms REAL NOT NULL DEFAULT 0,
+                    max_ms REAL NOT NULL DEFAULT 0,
+                    total_rows INTEGER NOT NULL DEFAULT 0,
+                    last_rows INTEGER,
+                    last_error TEXT,
+                    last_error_at REAL,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS query_latencies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fingerprint TEXT NOT NULL,
+                    elapsed_ms REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_query_latencies_fingerprint ON query_latencies (fingerprint, id);
+            """)
+    
+    def record(self, query: str, elapsed_ms: float, rows: Optional[int] = None, error: Optional[str] = None):
+        """Soma uma execução às estatísticas da impressão digital da query"""
+        fingerprint = query_fingerprint(query)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO query_fingerprints (fingerprint, query, first_seen, last_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (fingerprint) DO NOTHING
+            """, (fingerprint, query, now, now))
+            
+            if error is None:
+                self._conn.execute("""
+                    UPDATE query_fingerprints
+                    SET query = ?, executions = executions + 1, total_ms = total_ms + ?,
+                        max_ms = MAX(max_ms, ?), total_rows = total_rows + ?, last_rows = ?, last_seen = ?
+                    WHERE fingerprint = ?
+                """, (query, elapsed_ms, elapsed_ms, rows or 0, rows, now, fingerprint))
+                self._conn.execute("INSERT INTO query_latencies (fingerprint, elapsed_ms) VALUES (?, ?)",
+                                   (fingerprint, elapsed_ms))
+                self._conn.execute("""
+                    DELETE FROM query_latencies
+                    WHERE fingerprint = ? AND id <= (
+                        SELECT id FROM query_latencies WHERE fingerprint = ?
+                        ORDER BY id DESC LIMIT 1 OFFSET ?
+                    )
+                """, (fingerprint, fingerprint, QUERY_HISTORY_SAMPLES))
+            else:
+                # Erros não entram nas latências: um erro de sintaxe em 2ms distorceria o p50
+                self._conn.execute("""
+                    UPDATE query_fingerprints
+                    SET query = ?, errors = errors + 1, last_error = ?, last_error_at = ?, last_seen = ?
+                    WHERE fingerprint = ?
+                """, (query, error[:1000], now, now, fingerprint))
+            
+            self._trim()
+    
+    def record_result(self, query: str, result: Dict, elapsed_ms: float):
+        """Registra o resultado de uma execução; hits de cache e cancelamentos não são latência do banco"""
+        if result.get('from_cache') or result.get('cancelled'):
+            return
+        if result.get('success'):
+            self.record(query, elapsed_ms, rows=result.get('rows_affected'))
+        else:
+            self.record(query, elapsed_ms, error=str(result.get('error') or 'Erro desconhecido'))
+    
+    def _trim(self):
+        overflow = self._conn.execute("SELECT COUNT(*) FROM query_fingerprints").fetchone()[0] - QUERY_HISTORY_MAX_FINGERPRINTS
+        if overflow > 0:
+            self._conn.execute("""
+                DELETE FROM query_fingerprints WHERE fingerprint IN (
+                    SELECT fingerprint FROM query_fingerprints ORDER BY last_seen LIMIT ?
+                )
+            """, (overflow,))
+            self._conn.execute("""
+                DELETE FROM query_latencies
+                WHERE fingerprint NOT IN (SELECT fingerprint FROM query_fingerprints)
+            """)
+    
+    def search(self, text: str = '', order: str = 'total', limit: int = 50) -> List[Dict]:
+        """Impressões digitais cujo SQL contém o texto, com latências p50/p95/máx"""
+        order_sql = QUERY_HISTORY_ORDER.get(order, QUERY_HISTORY_ORDER['total'])
+        pattern = '%' + text.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(f"""
+                SELECT * FROM query_fingerprints
+                WHERE query LIKE ? ESCAPE '\\' OR fingerprint = ?
+                ORDER BY {order_sql}
+                LIMIT ?
+            """, (pattern, text.strip(), limit))]
+            
+            for row in rows:
+                latencies = [r[0] for r in self._conn.execute(
+                    "SELECT elapsed_ms FROM query_latencies WHERE fingerprint = ?", (row['fingerprint'],)
+                )]
+                row.update(
+                    p50_ms=latency_percentile(latencies, 0.50),
+                    p95_ms=latency_percentile(latencies, 0.95),
+                    avg_ms=round(row['total_ms'] / row['executions'], 2) if row['executions'] else None,
+                    avg_rows=round(row['total_rows'] / row['executions'], 1) if row['executions'] else None
+                )
+        return rows
+    
+    def delete(self, fingerprint: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM query_fingerprints WHERE fingerprint = ?", (fingerprint,))
+            self._conn.execute("DELETE FROM query_latencies WHERE fingerprint = ?", (fingerprint,))
+    
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM query_fingerprints")
+            self._conn.execute("DELETE FROM query_latencies")
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(executions), 0), COALESCE(SUM(errors), 0) FROM query_fingerprints"
+            ).fetchone()
+        return {'fingerprints': row[0], 'executions': row[1], 'errors': row[2]}
+
+@st.cache_resource(show_spinner=False)
+def get_query_history_store() -> QueryHistoryStore:
+    """Histórico persistente de queries compartilhado pelo processo"""
+    return QueryHistoryStore()
+
+# =====================================================================
+# LOG DE QUERIES LENTAS (SQLITE, COM PLANO CAPTURADO)
+# =====================================================================
+
+SLOW_QUERY_LOG_DB = Path("slow_queries.db")
+SLOW_QUERY_LOG_MAX_ENTRIES = 1000
+SLOW_QUERY_TEXT_LIMIT = 20000
+SLOW_QUERY_EXPLAIN_TIMEOUT = 10
+
+# EXPLAIN sem ANALYZE só planeja: seguro também para escritas
+EXPLAINABLE_COMMANDS = ('SELECT', 'WITH', 'VALUES', 'TABLE', 'INSERT', 'UPDATE', 'DELETE')
+
+SLOW_QUERY_SOURCES = {
+    'editor': '🔍 Editor SQL',
+    'script': '📜 Script de projeto',
+    'query': '⚙️ Operação do sistema'
+}
+
+class SlowQueryLog:
+    """Execuções acima do limite configurado com texto, parâmetros, usuário, duração, linhas
+    e plano (EXPLAIN capturado depois), limitado às SLOW_QUERY_LOG_MAX_ENTRIES mais recentes"""
+
+    def __init__(self, path: Path = SLOW_QUERY_LOG_DB, enabled: bool = True, threshold_seconds: float = 5):
+        self.path = path
+        self.enabled = enabled
+        self.threshold_seconds = threshold_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=5, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS slow_queries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    logged_at REAL NOT NULL,
+                    source TEXT NOT NULL,
+                    username TEXT,
+                    fingerprint TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    parameters TEXT,
+                    duration_ms REAL NOT NULL,
+                    rows INTEGER,
+                    success INTEGER NOT NULL,
+                    error TEXT,
+                    backend TEXT,
+                    plan TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_slow_queries_duration ON slow_queries (duration_ms);
+            """)
+
+    @classmethod
+    def from_settings(cls, db_settings: Dict) -> 'SlowQueryLog':
+        return cls(enabled=db_settings.get('log_slow_queries', True),
+                   threshold_seconds=db_settings.get('slow_query_threshold', 5))
+
+    def configure(self, db_settings: Dict):
+        self.enabled = db_settings.get('log_slow_queries', self.enabled)
+        self.threshold_seconds = db_settings.get('slow_query_threshold', self.threshold_seconds)
+
+    def is_slow(self, duration_ms: float) -> bool:
+        return self.enabled and duration_ms >= self.threshold_seconds * 1000
+
+    def log(self, query: str, duration_ms: float, result: Dict, source: str = 'query',
+            user: Optional[str] = None, parameters: Optional[Dict] = None) -> int:
+        """Registra a execução e devolve o ID da entrada (para anexar o plano depois)"""
+        error = None if result.get('success') else str(result.get('error') or 'Erro desconhecido')[:1000]
+        with self._lock, self._conn:
+            cursor = self._conn.execute("""
+                INSERT INTO slow_queries (logged_at, source, username, fingerprint, query, parameters,
+                                          duration_ms, rows, success, error, backend)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                time.time(), source, user, query_fingerprint(query), query[:SLOW_QUERY_TEXT_LIMIT],
+                json.dumps(parameters, default=str) if parameters else None,
+                round(duration_ms, 2), result.get('rows_affected'), int(bool(result.get('success'))),
+                error, result.get('backend')
+            ))
+            self._conn.execute("""
+                DELETE FROM slow_queries WHERE id <= (
+                    SELECT id FROM slow_queries ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            """, (SLOW_QUERY_LOG_MAX_ENTRIES,))
+            return cursor.lastrowid
+
+    def attach_plan(self, entry_id: int, plan: Dict):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE slow_queries SET plan = ? WHERE id = ?",
+                               (json.dumps(plan, default=str), entry_id))
+
+    def search(self, text: str = '', min_duration_ms: float = 0, source: Optional[str] = None,
+               user: Optional[str] = None, errors_only: bool = False, limit: int = 200) -> List[Dict]:
+        """Entradas mais recentes primeiro, filtradas por SQL, duração, origem, usuário e erro"""
+        clauses = ["(query LIKE ? ESCAPE '\\' OR fingerprint = ?)", "duration_ms >= ?"]
+        pattern = '%' + text.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        values = [pattern, text.strip(), min_duration_ms]
+        if source:
+            clauses.append("source = ?")
+            values.append(source)
+        if user:
+            clauses.append("username = ?")
+            values.append(user)
+        if errors_only:
+            clauses.append("success = 0")
+
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(f"""
+                SELECT * FROM slow_queries WHERE {' AND '.join(clauses)}
+                ORDER BY id DESC LIMIT ?
+            """, (*values, limit))]
+
+        for row in rows:
+            row['parameters'] = json.loads(row['parameters']) if row['parameters'] else {}
+            row['plan'] = json.loads(row['plan']) if row['plan'] else None
+            row['success'] = bool(row['success'])
+        return rows
+
+    def get_users(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT username FROM slow_queries WHERE username IS NOT NULL ORDER BY username"
+            )]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM slow_queries")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT COUNT(*), COALESCE(MAX(duration_ms), 0), COUNT(DISTINCT fingerprint),
+                       COALESCE(SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END), 0)
+                FROM slow_queries
+            """).fetchone()
+        return {'entries': row[0], 'max_ms': row[1], 'fingerprints': row[2], 'errors': row[3]}
+
+# =====================================================================
+# HEARTBEAT DE CONEXÃO (LATÊNCIA + CIRCUIT BREAKER)
+# =====================================================================
+
+class ConnectionHeartbeat:
+    """Ping periódico em segundo plano com histograma de latência, circuit breaker e
+    reconexão com backoff exponencial"""
+    
+    LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+    
+    def __init__(self, db_manager, interval: float = 15.0, failure_threshold: int = 3,
+                 base_backoff: float = 2.0, max_backoff: float = 120.0):
+        self.db_manager = db_manager
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._samples = deque(maxlen=240)  # (timestamp, latência ms ou None em falha)
+        
+        # Estado do circuit breaker: closed (normal), open (pausado), half_open (sondando)
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.open_count = 0
+        self.open_until = 0.0
+        self.last_error = None
+        self.reconnect_attempts = 0
+        self._reconnect_failures = 0
+        self._next_reconnect_at = 0.0
+    
+    def start(self):
+        """Inicia a thread de heartbeat (idempotente)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='db-heartbeat', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                wait_for = max(0.0, self.open_until - time.time()) if self.state == 'open' else 0.0
+            
+            if wait_for > 0:
+                # Circuito aberto: não sobrecarregar o backend indisponível
+                self._stop.wait(min(wait_for, self.interval))
+                continue
+            
+            with self._lock:
+                if self.state == 'open':
+                    self.state = 'half_open'
+            
+            self.beat()
+            self.db_manager.close_idle_streams()
+            self._stop.wait(self.interval)
+    
+    def beat(self):
+        """Executa um ping e atualiza o histograma e o circuit breaker"""
+        start_time = time.time()
+        try:
+            self.db_manager.ping()
+        except Exception as e:
+            self._record_failure(start_time, e)
+            return
+        
+        latency_ms = (time.time() - start_time) * 1000
+        with self._lock:
+            recovered = self.state != 'closed' or self.consecutive_failures > 0
+            self._samples.append((start_time, latency_ms))
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.open_count = 0
+            self.last_error = None
+        
+        # Backend voltou, mas o gerenciador está desconectado: reconectar
+        if recovered or not self.db_manager.connected:
+            self._try_reconnect()
+    
+    def _record_failure(self, start_time: float, error: Exception):
+        with self._lock:
+            self._samples.append((start_time, None))
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                # Backoff exponencial com jitter entre as sondagens
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** self.open_count))
+                self.open_until = time.time() + random.uniform(backoff / 2, backoff)
+                self.open_count += 1
+                self.state = 'open'
+    
+    def _try_reconnect(self):
+        """Reconecta o gerenciador compartilhado (fora do ciclo de renderização)"""
+        if self.db_manager.connected:
+            return
+        if not load_user_settings().get('database', {}).get('auto_reconnect', True):
+            return
+        if time.time() < self._next_reconnect_at:
+            return
+        
+        with self._lock:
+            self.reconnect_attempts += 1
+        try:
+            # Thread do heartbeat não tem ScriptRunContext: nada de st.* durante a reconexão
+            self.db_manager.reconnect(quiet=True)
+        except Exception as e:
+            with self._lock:
+                self.last_error = f"Reconexão falhou: {e}"
+        
+        # Reconexões malsucedidas se espaçam exponencialmente
+        if self.db_manager.connected:
+            self._reconnect_failures = 0
+            self._next_reconnect_at = 0.0
+        else:
+            backoff = min(self.max_backoff, self.base_backoff * (2 ** self._reconnect_failures))
+            self._reconnect_failures += 1
+            self._next_reconnect_at = time.time() + random.uniform(backoff / 2, backoff)
+    
+    def allows_requests(self) -> bool:
+        """False enquanto o circuito estiver aberto"""
+        with self._lock:
+            return self.state != 'open'
+    
+    def get_stats(self) -> Dict:
+        """Percentis, histograma e estado do circuit breaker"""
+        with self._lock:
+            samples = list(self._samples)
+            state = self.state
+            open_until = self.open_until
+        
+        latencies = sorted(ms for _, ms in samples if ms is not None)
+        
+        def percentile(pct):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * pct))], 1)
+        
+        histogram = {}
+        lower = 0
+        for upper in self.LATENCY_BUCKETS_MS:
+            histogram[f"{lower}-{upper}ms"] = len([ms for ms in latencies if lower <= ms < upper])
+            lower = upper
+        histogram[f">={lower}ms"] = len([ms for ms in latencies if ms >= lower])
+        
+        return {
+            'state': state,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(latencies[-1], 1) if latencies else None,
+            'samples': len(samples),
+            'failures': len([1 for _, ms in samples if ms is None]),
+            'consecutive_failures': self.consecutive_failures,
+            'retry_in_s': max(0, round(open_until - time.time())) if state == 'open' else 0,
+            'reconnect_attempts': self.reconnect_attempts,
+            'last_error': self.last_error,
+            'histogram': histogram,
+            'timeline': [(datetime.fromtimestamp(ts), ms) for ts, ms in samples]
+        }
+
+# =====================================================================
+# TRADUÇÃO SELECT → POSTGREST (PUSH-DOWN DE FILTROS, ORDEM E PROJEÇÃO)
+# =====================================================================
+
+# Limite aplicado quando a query não tem LIMIT (o PostgREST também impõe max-rows)
+POSTGREST_DEFAULT_LIMIT = 1000
+
+class SQLTranslationError(Exception):
+    """A query não pode ser expressa como requisição PostgREST"""
+
+class PostgrestQueryTranslator:
+    """Traduz SELECTs simples (uma tabela, predicados em AND, agregações com GROUP BY, ORDER BY,
+    LIMIT/OFFSET) usando o lexer do sqlparse; qualquer construção fora desse subconjunto gera
+    SQLTranslationError"""
+    
+    AGGREGATE_FUNCTIONS = ('COUNT', 'SUM', 'AVG', 'MIN', 'MAX')
+    
+    COMPARISON_OPERATORS = {
+        '=': 'eq', '!=': 'neq', '<>': 'neq', '<': 'lt', '<=': 'lte',
+        '>': 'gt', '>=': 'gte', 'LIKE': 'like', 'ILIKE': 'ilike'
+    }
+    CLAUSE_KEYWORDS = {'FROM', 'WHERE', 'ORDER', 'GROUP', 'HAVING', 'LIMIT', 'OFFSET', 'UNION',
+                       'INTERSECT', 'EXCEPT', 'JOIN', 'FETCH', 'FOR', 'WINDOW', 'AND', 'OR', 'NOT',
+                       'AS', 'ON', 'IS', 'IN', 'BETWEEN', 'LIKE', 'ILIKE', 'NULL', 'TRUE', 'FALSE',
+                       'ASC', 'DESC', 'NULLS', 'DISTINCT', 'BY', 'SELECT', 'ALL'}
+    
+    def __init__(self, query: str):
+        if not SQLPARSE_AVAILABLE:
+            raise SQLTranslationError("sqlparse não instalado")
+        self.tokens = self._tokenize(query)
+        self.pos = 0
+        self.table_aliases = set()
+    
+    # -- Léxico ----------------------------------------------------------
+    
+    @staticmethod
+    def _tokenize(query: str) -> List[Tuple[str, Any]]:
+        """Tokens do sqlparse reduzidos a (tipo, valor): kw, ident, str, num, op, punct, star"""
+        from sqlparse import tokens as T
+        
+        statements = [s for s in sqlparse.parse(query) if s.value.strip().strip(';')]
+        if len(statements) != 1:
+            raise SQLTranslationError("múltiplos comandos")
+        
+        tokens = []
+        for token in statements[0].flatten():
+            ttype, value = token.ttype, token.value
+            if token.is_whitespace or ttype in T.Comment:
+                continue
+            if ttype in T.Keyword:
+                tokens.extend(('kw', word.upper()) for word in value.split())
+            elif ttype in T.Name:
+                tokens.append(('ident', value.lower()))
+            elif ttype in T.String.Symbol:
+                tokens.append(('ident', value[1:-1].replace('""', '"')))
+            elif ttype in T.String:
+                tokens.append(('str', value[1:-1].replace("''", "'")))
+            elif ttype in T.Number:
+                number = float(value) if any(c in value for c in '.eE') else int(value)
+                if tokens and tokens[-1] == ('op', '-') and (len(tokens) == 1 or tokens[-2][0] in ('op', 'kw', 'punct')):
+                    tokens[-1] = ('num', -number)
+                else:
+                    tokens.append(('num', number))
+            elif ttype in T.Comparison:
+                # "NOT ILIKE" chega como um único operador
+                *modifiers, operator = value.upper().split()
+                tokens.extend(('kw', word) for word in modifiers)
+                tokens.append(('op', operator))
+            elif ttype in T.Wildcard:
+                tokens.append(('star', '*'))
+            elif ttype in T.Punctuation:
+                tokens.append(('punct', value))
+            elif ttype in T.Operator and value == '-':
+                tokens.append(('op', '-'))
+            else:
+                raise SQLTranslationError(f"construção não suportada: {value}")
+        
+        while tokens and tokens[-1] == ('punct', ';'):
+            tokens.pop()
+        return tokens
+    
+    def _peek(self, offset: int = 0) -> Tuple[str, Any]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ('end', None)
+    
+    def _next(self) -> Tuple[str, Any]:
+        token = self._peek()
+        self.pos += 1
+        return token
+    
+    def _accept(self, kind: str, value=None) -> bool:
+        token = self._peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.pos += 1
+            return True
+        return False
+    
+    def _expect(self, kind: str, value=None):
+        if not self._accept(kind, value):
+            raise SQLTranslationError(f"esperado {value or kind}, encontrado {self._peek()[1]}")
+    
+    def _identifier(self) -> str:
+        kind, value = self._next()
+        # Nomes como status, type e date chegam como palavras-chave do lexer
+        if kind == 'ident' or (kind == 'kw' and value not in self.CLAUSE_KEYWORDS):
+            return value if kind == 'ident' else value.lower()
+        raise SQLTranslationError(f"identificador esperado, encontrado {value}")
+    
+    def _column(self) -> str:
+        """Coluna simples, opcionalmente qualificada pela tabela/alias"""
+        name = self._identifier()
+        if self._accept('punct', '.'):
+            qualifier, name = name, self._identifier()
+            if qualifier not in self.table_aliases:
+                raise SQLTranslationError(f"qualificador desconhecido: {qualifier}")
+        if self._peek() == ('punct', '('):
+            raise SQLTranslationError(f"função ou expressão: {name}(...)")
+        return name
+    
+    def _literal(self):
+        kind, value = self._next()
+        if kind in ('str', 'num'):
+            return value
+        if kind == 'kw' and value in ('TRUE', 'FALSE'):
+            return value == 'TRUE'
+        raise SQLTranslationError(f"valor literal esperado, encontrado {value}")
+    
+    # -- Sintaxe ---------------------------------------------------------
+    
+    def translate(self) -> Dict:
+        """Plano PostgREST: tabela, projeção, filtros, ordenação, limite e deslocamento"""
+        self._expect('kw', 'SELECT')
+        if self._peek() == ('kw', 'DISTINCT'):
+            raise SQLTranslationError("DISTINCT")
+        
+        # A lista de colunas é lida depois do FROM, quando os aliases de tabela são conhecidos
+        select_start = self.pos
+        depth = 0
+        while not (depth == 0 and self._peek() == ('kw', 'FROM')):
+            kind, value = self._next()
+            if kind == 'end':
+                raise SQLTranslationError("SELECT sem FROM")
+            depth += {'(': 1, ')': -1}.get(value, 0) if kind == 'punct' else 0
+        select_end = self.pos
+        
+        self._expect('kw', 'FROM')
+        plan = self._table()
+        
+        self.pos, after_from = select_start, self.pos
+        plan['select'] = self._select_list(select_end)
+        self.pos = after_from
+        
+        plan.update(filters=[], group_by=[], order=[], limit=None, offset=None)
+        if self._accept('kw', 'WHERE'):
+            plan['filters'] = self._conditions()
+        if self._accept('kw', 'GROUP'):
+            self._expect('kw', 'BY')
+            plan['group_by'] = [self._column()]
+            while self._accept('punct', ','):
+                plan['group_by'].append(self._column())
+        plan['aggregates'] = self._check_grouping(plan['select'], plan['group_by'])
+        if self._accept('kw', 'ORDER'):
+            self._expect('kw', 'BY')
+            plan['order'] = self._order_by(plan['select'])
+        seen_clauses = set()
+        while self._peek()[0] == 'kw' and self._peek()[1] in ('LIMIT', 'OFFSET'):
+            clause = self._next()[1]
+            if clause in seen_clauses:
+                raise SQLTranslationError(f"{clause} duplicado")
+            seen_clauses.add(clause)
+            if clause == 'LIMIT' and self._accept('kw', 'ALL'):
+                continue
+            kind, value = self._next()
+            if kind != 'num' or not isinstance(value, int) or value < 0:
+                raise SQLTranslationError(f"{clause} inválido")
+            plan[clause.lower()] = value
+            self._accept('kw', 'ROW') or self._accept('kw', 'ROWS')
+        
+        if self._peek()[0] != 'end':
+            raise SQLTranslationError(f"cláusula não suportada: {self._peek()[1]}")
+        return plan
+    
+    def _table(self) -> Dict:
+        table = self._identifier()
+        if self._accept('punct', '.'):
+            if table != 'public':
+                raise SQLTranslationError(f"schema {table} não exposto pelo PostgREST")
+            table = self._identifier()
+        
+        self.table_aliases = {table}
+        if self._accept('kw', 'AS') or self._peek()[0] == 'ident':
+            self.table_aliases.add(self._identifier())
+        if self._peek() in (('punct', ','), ('punct', '(')) or self._peek() == ('kw', 'JOIN'):
+            raise SQLTranslationError("JOIN ou múltiplas tabelas")
+        return {'table': table}
+    
+    def _select_list(self, end: int) -> List[Dict]:
+        items = []
+        while self.pos < end:
+            if self._accept('star'):
+                items.append({'column': '*', 'alias': None, 'aggregate': None})
+            else:
+                item = self._select_item()
+                if self._accept('kw', 'AS') or (self.pos < end and self._peek()[0] == 'ident'):
+                    item['alias'] = self._identifier()
+                items.append(item)
+            if self.pos < end:
+                self._expect('punct', ',')
+        return items
+    
+    def _select_item(self) -> Dict:
+        kind, value = self._peek()
+        if self._peek(1) == ('punct', '(') and str(value).upper() in self.AGGREGATE_FUNCTIONS:
+            function = str(self._next()[1]).lower()
+            self._expect('punct', '(')
+            if self._peek() in (('kw', 'DISTINCT'), ('kw', 'ALL')):
+                raise SQLTranslationError(f"{function.upper()}({self._peek()[1]} ...)")
+            column = '*' if self._accept('star') else self._column()
+            self._expect('punct', ')')
+            if column == '*' and function != 'count':
+                raise SQLTranslationError(f"{function.upper()}(*)")
+            return {'column': column, 'alias': None, 'aggregate': function}
+        return {'column': self._column(), 'alias': None, 'aggregate': None}
+    
+    @staticmethod
+    def _check_grouping(select: List[Dict], group_by: List[str]) -> bool:
+        """O PostgREST agrupa pelas colunas não agregadas do select: GROUP BY deve coincidir"""
+        aggregates = [item for item in select if item['aggregate']]
+        if not aggregates:
+            if group_by:
+                raise SQLTranslationError("GROUP BY sem agregação")
+            return False
+        
+        plain = [item['column'] for item in select if not item['aggregate']]
+        if '*' in plain:
+            raise SQLTranslationError("* com agregação")
+        if set(plain) != set(group_by):
+            raise SQLTranslationError("GROUP BY diferente das colunas selecionadas")
+        return True
+    
+    def _conditions(self) -> List[Tuple]:
+        """Predicados ligados por AND; OR e parênteses exigem SQL real"""
+        filters = self._condition()
+        while self._accept('kw', 'AND'):
+            filters.extend(self._condition())
+        if self._peek() == ('kw', 'OR'):
+            raise SQLTranslationError("OR")
+        return filters
+    
+    def _condition(self) -> List[Tuple]:
+        if self._peek() == ('punct', '('):
+            raise SQLTranslationError("predicados entre parênteses")
+        negate = self._accept('kw', 'NOT')
+        column = self._column()
+        if self._accept('kw', 'NOT'):
+            negate = not negate
+        
+        kind, value = self._next()
+        if kind == 'op' and value in self.COMPARISON_OPERATORS:
+            operand = self._literal()
+            return [(negate, self.COMPARISON_OPERATORS[value], column, operand)]
+        if kind == 'kw' and value in ('LIKE', 'ILIKE'):
+            return [(negate, value.lower(), column, self._literal())]
+        if kind == 'kw' and value == 'IN':
+            self._expect('punct', '(')
+            values = [self._literal()]
+            while self._accept('punct', ','):
+                values.append(self._literal())
+            self._expect('punct', ')')
+            return [(negate, 'in_', column, values)]
+        if kind == 'kw' and value == 'BETWEEN' and not negate:
+            low = self._literal()
+            self._expect('kw', 'AND')
+            return [(False, 'gte', column, low), (False, 'lte', column, self._literal())]
+        if kind == 'kw' and value == 'IS':
+            if self._accept('kw', 'NOT'):
+                negate = not negate
+            kind, operand = self._next()
+            if kind == 'kw' and operand in ('NULL', 'TRUE', 'FALSE'):
+                return [(negate, 'is_', column, operand.lower())]
+        raise SQLTranslationError(f"predicado não suportado em {column}")
+    
+    def _order_by(self, select: List[Dict]) -> List[Dict]:
+        order = []
+        while True:
+            if self._peek()[0] == 'num':
+                # ORDER BY 2: posição na lista de colunas
+                position = self._next()[1]
+                explicit = [item for item in select if item['column'] != '*']
+                if len(explicit) != len(select) or not 1 <= position <= len(explicit) \
+                        or explicit[position - 1]['aggregate']:
+                    raise SQLTranslationError(f"ORDER BY {position}")
+                column = explicit[position - 1]['column']
+            else:
+                column = self._column()
+                if any(item['aggregate'] and item['alias'] == column for item in select):
+                    raise SQLTranslationError(f"ORDER BY pela agregação {column}")
+            
+            desc = self._accept('kw', 'DESC')
+            if not desc:
+                self._accept('kw', 'ASC')
+            nullsfirst = desc  # padrão do PostgreSQL
+            if self._accept('kw', 'NULLS'):
+                nullsfirst = self._next()[1] == 'FIRST'
+            # O cliente só consegue pedir NULLS FIRST explicitamente
+            if nullsfirst != desc and not nullsfirst:
+                raise SQLTranslationError("DESC NULLS LAST")
+            order.append({'column': column, 'desc': desc, 'nullsfirst': nullsfirst and not desc})
+            
+            if not self._accept('punct', ','):
+                return order
+
+def translate_select_to_postgrest(query: str) -> Dict:
+    """Plano de requisição PostgREST para um SELECT (SQLTranslationError se não traduzível)"""
+    return PostgrestQueryTranslator(query).translate()
+
+def build_postgrest_select(items: List[Dict]) -> str:
+    """Parâmetro select= do PostgREST a partir da lista de colunas"""
+    parts = []
+    for item in items:
+        column = item['column']
+        if item['aggregate']:
+            # Agregações do PostgREST 12: count() e coluna.sum()/avg()/min()/max()
+            column = 'count()' if column == '*' else f"{column}.{item['aggregate']}()"
+        parts.append(f"{item['alias']}:{column}" if item['alias'] else column)
+    return ','.join(parts)
+
+def apply_plan_window(rows: List[Dict], plan: Dict) -> List[Dict]:
+    """Aplica LIMIT/OFFSET do plano a linhas calculadas fora do Range do PostgREST"""
+    offset = plan.get('offset') or 0
+    limit = plan.get('limit')
+    return rows[offset:] if limit is None else rows[offset:offset + limit]
+
+# =====================================================================
+# IMPORTAÇÃO EM MASSA (COPY FROM STDIN)
+# =====================================================================
+
+# Linhas por lote de COPY: limita a memória do arquivo lido e a duração de cada comando
+IMPORT_CHUNK_ROWS = 50000
+
+# Sem conexão direta: inserts em lote pelo PostgREST
+IMPORT_REST_BATCH_ROWS = 1000
+
+# Linhas usadas para inferir os tipos das colunas
+IMPORT_SAMPLE_ROWS = 1000
+
+# Espera máxima por locks da tabela (TRUNCATE, DROP INDEX, COPY) antes de desistir
+IMPORT_LOCK_TIMEOUT_SECONDS = 10
+
+IMPORT_FORMATS = {'CSV': 'csv', 'NDJSON': 'ndjson', 'Excel': 'excel'}
+
+def infer_import_column_types(sample: pd.DataFrame) -> Dict[str, str]:
+    """Tipo PostgreSQL de cada coluna a partir de uma amostra lida como texto"""
+    types = {}
+    for column in sample.columns:
+        values = sample[column].dropna().astype(str).str.strip()
+        values = values[values != '']
+        if values.empty:
+            types[column] = 'text'
+        elif values.str.lower().isin(['true', 'false', 't', 'f']).all():
+            types[column] = 'boolean'
+        elif values.str.fullmatch(r'0\d+').any():
+            types[column] = 'text'  # zeros à esquerda (CEP, códigos) não são números
+        elif values.str.fullmatch(r'[-+]?\d{1,18}').all():
+            types[column] = 'bigint'
+        elif pd.to_numeric(values, errors='coerce').notna().all():
+            types[column] = 'numeric'
+        elif values.str.fullmatch(r'\d{4}-\d{2}-\d{2}').all():
+            types[column] = 'date'
+        elif values.str.match(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}').all() and \
+                pd.to_datetime(values, errors='coerce', format='ISO8601').notna().all():
+            types[column] = 'timestamptz'
+        elif values.str.match(r'[\[{]').all():
+            types[column] = 'jsonb'
+        else:
+            types[column] = 'text'
+    return types
+
+def _prepare_import_chunk(chunk: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Alinha o lote às colunas de destino e serializa objetos aninhados (NDJSON) como JSON"""
+    chunk = chunk.reindex(columns=columns)
+    for column in columns:
+        if chunk[column].dtype == object:
+            chunk[column] = chunk[column].map(
+                lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+            )
+    return chunk
+
+def iter_import_chunks(uploaded_file, file_format: str, chunk_rows: int = IMPORT_CHUNK_ROWS,
+                       separator: str = ','):
+    """Lê o arquivo em lotes de DataFrame (valores como texto) sem carregar CSV/NDJSON inteiros.
+    Gera (lote, fração do arquivo já lida)."""
+    total_bytes = max(getattr(uploaded_file, 'size', 0) or 0, 1)
+    uploaded_file.seek(0)
+
+    if file_format == 'csv':
+        reader = pd.read_csv(uploaded_file, sep=separator, dtype=str, keep_default_na=False,
+                             na_values=[''], chunksize=chunk_rows)
+        for chunk in reader:
+            yield chunk, min(uploaded_file.tell() / total_bytes, 1.0)
+
+    elif file_format == 'ndjson':
+        # dtype=object preserva inteiros com valores ausentes (o pandas os converteria para float)
+        records = []
+        for line in uploaded_file:
+            if line.strip():
+                records.append(json.loads(line))
+            if len(records) >= chunk_rows:
+                yield pd.DataFrame(records, dtype=object), min(uploaded_file.tell() / total_bytes, 1.0)
+                records = []
+        if records:
+            yield pd.DataFrame(records, dtype=object), 1.0
+
+    elif file_format == 'excel':
+        # Planilhas não são lidas em streaming: o arquivo inteiro já está limitado pelo upload
+        frame = pd.read_excel(uploaded_file, dtype=object)
+        total = max(len(frame), 1)
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows], min((start + chunk_rows) / total, 1.0)
+
+    else:
+        raise ValueError(f"Formato de importação não suportado: {file_format}")
+
+def read_import_sample(uploaded_file, file_format: str, separator: str = ',') -> pd.DataFrame:
+    """Primeiras linhas do arquivo para prévia e inferência de tipos"""
+    if file_format == 'excel':
+        # Só as primeiras linhas da planilha, sem montar o DataFrame do arquivo inteiro
+        uploaded_file.seek(0)
+        sample = pd.read_excel(uploaded_file, dtype=object, nrows=IMPORT_SAMPLE_ROWS)
+        uploaded_file.seek(0)
+        return sample
+    try:
+        sample, _ = next(iter_import_chunks(uploaded_file, file_format, IMPORT_SAMPLE_ROWS, separator))
+    except StopIteration:
+        sample = pd.DataFrame()
+    uploaded_file.seek(0)
+    return sample
+
+# =====================================================================
+# CLASSE DE CONEXÃO COM BANCO DE DADOS
+# =====================================================================
+
+class _SilentStatus:
+    """Substitui st.info/st.progress... onde não há página para exibir (threads de fundo)"""
+    
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+class DatabaseManager:
+    """Gerenciador de conexão e operações com banco de dados Supabase"""
+    
+    def __init__(self):
+        self.supabase_client = None
+        self.supabase_admin = None
+        self.connected = False
+        self.connection_info = {}
+        self.real_tables = []
+        self.catalog_version = 0
+        self._counted_tables = set()
+        self._lock = threading.RLock()
+        self._pg_pool = None
+        self._pg_pool_checked = False
+        self._pool_settings = {}
+        self._catalog_snapshot = {}
+        self._catalog_snapshot_at = 0.0
+        self._catalog_snapshot_version = -1
+        self._exact_counts = {}
+        self._exact_count_failures = {}  # tabela -> momento da última contagem exata que falhou
+        self._schema_memo = None  # (versão do catálogo, carregada em, estrutura)
+        self._fingerprints = {}
+        self._streams = {}
+        self._query_jobs = {}
+        self._query_executor = None
+        self._quiet = threading.local()
+        self.cache = TTLCache.from_settings(load_user_settings().get('system', {}))
+        self.result_cache = QueryResultCache.from_settings(load_user_settings().get('system', {}))
+        self.slow_query_log = SlowQueryLog.from_settings(load_user_settings().get('database', {}))
+        self.heartbeat = ConnectionHeartbeat(self)
+        self._init_connection()
+        self._update_table_counts()
+    
+    def reconnect(self, quiet: bool = False):
+        """Recria os clientes e o catálogo compartilhados por todas as sessões.
+        quiet não emite mensagens de status (chamadas fora da thread do script, como o heartbeat)."""
+        with self._lock, self.quiet_status(quiet):
+            self._close_pg_pool()
+            self._init_connection()
+            self.invalidate_catalog()
+        with self.quiet_status(quiet):
+            self._update_table_counts()
+        if self.has_backend:
+            self.heartbeat.start()
+        return self.connected
+    
+    @contextmanager
+    def quiet_status(self, quiet: bool = True):
+        """Suprime as mensagens de status nesta thread (trabalho fora da thread do script)"""
+        previous = getattr(self._quiet, 'active', False)
+        self._quiet.active = quiet or previous
+        try:
+            yield
+        finally:
+            self._quiet.active = previous
+    
+    def _status_ui(self):
+        """st para mensagens de conexão/descoberta, ou um substituto mudo numa reconexão silenciosa"""
+        return _SilentStatus() if getattr(self._quiet, 'active', False) else st
+    
+    @property
+    def has_backend(self) -> bool:
+        """Indica se há algum backend real configurado (Supabase ou PostgreSQL)"""
+        return bool(CONFIG.get('supabase_url')) or self.native_available
+    
+    def ping(self):
+        """Requisição trivial ao backend (SELECT 1 ou HEAD no PostgREST); lança em caso de falha"""
+        pool = self._get_pg_pool()
+        if pool is not None:
+            with pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+            return
+        
+        if not CONFIG.get('supabase_url'):
+            raise ConnectionError("Nenhum backend configurado")
+        
+        response = get_http_transport().request(
+            'HEAD',
+            f"{CONFIG['supabase_url']}/rest/v1/",
+            headers={'apikey': CONFIG['supabase_anon_key']},
+            timeout=5
+        )
+        if response.status_code >= 500:
+            raise ConnectionError(f"HTTP {response.status_code}")
+    
+    # -----------------------------------------------------------------
+    # Backend PostgreSQL nativo
+    # -----------------------------------------------------------------
+    
+    def _get_pg_pool(self) -> Optional[PostgresConnectionPool]:
+        """Retorna o pool PostgreSQL nativo, criando-o sob demanda"""
+        if self._pg_pool is not None or self._pg_pool_checked:
+            return self._pg_pool
+        
+        with self._lock:
+            if not self._pg_pool_checked:
+                self._pg_pool_checked = True
+                db_settings = {**load_user_settings().get('database', {}), **self._pool_settings}
+                dsn = get_postgres_dsn(db_settings)
+                if dsn:
+                    self._pg_pool = PostgresConnectionPool(
+                        dsn,
+                        pool_size=db_settings.get('connection_pool_size', 20),
+                        max_connections=db_settings.get('max_connections', 100),
+                        connection_timeout=db_settings.get('connection_timeout', 30),
+                        query_timeout=get_pool_statement_timeout(db_settings)
+                    )
+        return self._pg_pool
+    
+    def _close_pg_pool(self):
+        """Fecha o pool atual para que seja recriado com novas configurações"""
+        self.close_idle_streams(max_idle=0)
+        with self._lock:
+            if self._pg_pool is not None:
+                self._pg_pool.close_all()
+            self._pg_pool = None
+            self._pg_pool_checked = False
+    
+    def configure_pool(self, db_settings: Dict) -> bool:
+        """Aplica as configurações de pool e recria as conexões nativas"""
+        self._pool_settings = dict(db_settings)
+        self.slow_query_log.configure(db_settings)
+        
+        # Novo pool de workers para os próximos jobs; os em execução terminam no anterior
+        with self._lock:
+            if self._query_executor is not None:
+                self._query_executor.shutdown(wait=False)
+            self._query_executor = None
+        
+        self._close_pg_pool()
+        return self._get_pg_pool() is not None
+    
+    @property
+    def native_available(self) -> bool:
+        """Indica se há conexão PostgreSQL direta configurada"""
+        return self._get_pg_pool() is not None
+    
+    @property
+    def native_password_missing(self) -> bool:
+        """Host PostgreSQL configurado sem senha disponível: a senha não vai para disco, então
+        após reiniciar o backend nativo só volta com secrets, PGPASSWORD ou uma nova aplicação"""
+        db_settings = {**load_user_settings().get('database', {}), **self._pool_settings}
+        return (PSYCOPG2_AVAILABLE and db_settings.get('db_type') == 'PostgreSQL'
+                and bool(db_settings.get('pg_host')) and not self.native_available)
+    
+    def get_pool_metrics(self) -> Optional[Dict]:
+        """Métricas do pool nativo (None se não configurado)"""
+        pool = self._get_pg_pool()
+        return pool.get_metrics() if pool else None
+    
+    def _execute_native_query(self, query: str, params=None, timeout: Optional[float] = None,
+                              run_id: Optional[str] = None, columnar: bool = False) -> Dict:
+        """Executa SQL real no PostgreSQL usando uma conexão do pool.
+        timeout aplica statement_timeout no servidor; run_id registra o PID para cancelamento;
+        columnar devolve as linhas em 'frame' (DataFrame montado por colunas) em vez de 'data'."""
+        start_time = time.time()
+        command = query.strip().split()[0].upper() if query.strip() else ''
+        autocommit = requires_autocommit(query)
+        pool = self._get_pg_pool()
+        
+        try:
+            with pool.connection(autocommit=autocommit) as conn:
+                with conn.cursor(cursor_factory=None if columnar else RealDictCursor) as cursor:
+                    # Cancelado enquanto aguardava conexão do pool: a query não chega a rodar
+                    if run_id is not None and not self._register_backend_pid(run_id, conn.get_backend_pid()):
+                        return self._cancelled_result('Job cancelado antes de iniciar')
+                    try:
+                        if timeout:
+                            # SET LOCAL vale só para a transação; em autocommit, SET + RESET
+                            scope = 'SET' if autocommit else 'SET LOCAL'
+                            cursor.execute(f"{scope} statement_timeout = %s", (int(timeout * 1000),))
+                        
+                        cursor.execute(query, params)
+                        if columnar and cursor.description:
+                            payload = {'frame': fetch_columnar(cursor)}
+                            rows_affected = len(payload['frame'])
+                        else:
+                            payload = {'data': [dict(row) for row in cursor.fetchall()] if cursor.description else []}
+                            rows_affected = len(payload['data']) if cursor.description else max(cursor.rowcount, 0)
+                        
+                        if timeout and autocommit:
+                            cursor.execute("RESET statement_timeout")
+                    finally:
+                        # A conexão volta ao pool: o PID não pode mais ser cancelado por esta execução
+                        if run_id is not None:
+                            self._register_backend_pid(run_id, None)
+            
+            execution_time = round((time.time() - start_time) * 1000, 2)
+            return {
+                'success': True,
+                **payload,
+                'rows_affected': rows_affected,
+                'execution_time': f"{execution_time}ms",
+                'message': f'Comando {command} executado no PostgreSQL',
+                'backend': 'postgresql'
+            }
+        
+        except Exception as e:
+            execution_time = round((time.time() - start_time) * 1000, 2)
+            return {
+                'success': False,
+                'error': str(e).strip(),
+                'pgcode': getattr(e, 'pgcode', None),
+                'execution_time': f"{execution_time}ms",
+                'message': f'Erro na execução: {str(e).strip()}',
+                'backend': 'postgresql'
+            }
+    
+    def open_query_stream(self, query: str, params=None, page_size: int = 100) -> Optional[QueryStream]:
+        """Abre um cursor no servidor para leitura paginada (None sem backend nativo ou se não for leitura)"""
+        command = query.strip().split()[0].upper() if query.strip() else ''
+        if command not in ('SELECT', 'WITH', 'VALUES', 'TABLE') or not self.native_available:
+            return None
+        
+        self.close_idle_streams()
+        stream = QueryStream(self._get_pg_pool(), query, params, page_size=page_size)
+        with self._lock:
+            self._streams[stream.stream_id] = stream
+        return stream
+    
+    def get_query_stream(self, stream_id: Optional[str]) -> Optional[QueryStream]:
+        with self._lock:
+            return self._streams.get(stream_id)
+    
+    def close_query_stream(self, stream_id: Optional[str]):
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream is not None:
+            stream.close()
+    
+    def close_idle_streams(self, max_idle: float = 300):
+        """Libera cursores abandonados (sessões encerradas ou resultados esquecidos)"""
+        now = time.time()
+        with self._lock:
+            idle = [sid for sid, stream in self._streams.items() if now - stream.last_used >= max_idle]
+            streams = [self._streams.pop(sid) for sid in idle]
+        for stream in streams:
+            stream.close()
+    
+    def explain_query(self, query: str, analyze: bool = False, timeout: Optional[float] = None,
+                      record_history: bool = True) -> Dict:
+        """EXPLAIN (FORMAT JSON); com analyze executa a query (ANALYZE, BUFFERS) e desfaz escritas.
+        record_history=False não grava o plano no histórico de planos (query_plans.json)."""
+        if not self.native_available:
+            return {
+                'success': False,
+                'error': 'EXPLAIN requer conexão PostgreSQL direta (configure a seção PostgreSQL)',
+                'execution_time': '0ms',
+                'message': 'Backend nativo indisponível'
+            }
+        
+        statement = query.strip().rstrip(';')
+        options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+        start_time = time.time()
+        
+        try:
+            with self._get_pg_pool().connection() as conn:
+                with conn.cursor() as cursor:
+                    if timeout:
+                        cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+                    cursor.execute(f"EXPLAIN ({options}) {statement}")
+                    explain = cursor.fetchone()[0]
+                # EXPLAIN ANALYZE executa de fato: nenhuma escrita pode persistir
+                conn.rollback()
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e).strip(),
+                'execution_time': f"{round((time.time() - start_time) * 1000, 2)}ms",
+                'message': f'Erro no EXPLAIN: {str(e).strip()}'
+            }
+        
+        if isinstance(explain, str):
+            explain = json.loads(explain)
+        root = explain[0]
+        nodes = flatten_query_plan(root['Plan'])
+        entry = {
+            'captured_at': datetime.now().isoformat(timespec='seconds'),
+            'query': statement,
+            'analyze': analyze,
+            'plan': root,
+            'total_cost': root['Plan'].get('Total Cost'),
+            'planning_ms': root.get('Planning Time'),
+            'execution_ms': root.get('Execution Time'),
+            'signature': plan_signature(nodes),
+            'seq_scans': len([n for n in nodes if n['seq_scan']]),
+            'misestimates': len([n for n in nodes if n['misestimate'] is not None])
+        }
+        
+        fingerprint = query_fingerprint(statement)
+        if record_history:
+            get_plan_history_store().add(fingerprint, entry)
+        
+        return {
+            'success': True,
+            'fingerprint': fingerprint,
+            'nodes': nodes,
+            'execution_time': f"{round((time.time() - start_time) * 1000, 2)}ms",
+            **entry
+        }
+    
+    def log_slow_query(self, query: str, duration_ms: float, result: Dict, source: str = 'query',
+                       user: Optional[str] = None, parameters: Optional[Dict] = None,
+                       explain_sql: Optional[str] = None) -> Optional[int]:
+        """Registra no log de queries lentas se a duração passou do limite configurado.
+        O plano (EXPLAIN sem ANALYZE de explain_sql, padrão a própria query) é capturado
+        em segundo plano para não atrasar quem executou."""
+        if result.get('from_cache') or not self.slow_query_log.is_slow(duration_ms):
+            return None
+        
+        if user is None:
+            try:
+                user = st.session_state.get('username') or None
+            except Exception:
+                user = None  # Fora da thread do script não há sessão
+        
+        entry_id = self.slow_query_log.log(query, duration_ms, result, source, user, parameters)
+        
+        explain_sql = normalize_sql(explain_sql or query)
+        if explain_sql and explain_sql.split()[0].upper() in EXPLAINABLE_COMMANDS and self.native_available:
+            self._get_query_executor().submit(self._capture_slow_query_plan, entry_id, explain_sql)
+        return entry_id
+    
+    def _capture_slow_query_plan(self, entry_id: int, query: str):
+        # O plano fica só no log de queries lentas; o histórico de planos é do EXPLAIN manual
+        explain = self.explain_query(query, analyze=False, timeout=SLOW_QUERY_EXPLAIN_TIMEOUT,
+                                     record_history=False)
+        if explain.get('success'):
+            # nodes é derivado de plan: render_query_plan recalcula ao exibir
+            self.slow_query_log.attach_plan(entry_id, {k: v for k, v in explain.items() if k != 'nodes'})
+    
+    # -----------------------------------------------------------------
+    # Jobs de query em segundo plano (statement_timeout + pg_cancel_backend)
+    # -----------------------------------------------------------------
+    
+    def _get_query_executor(self) -> ThreadPoolExecutor:
+        """Pool de workers dos jobs, dimensionado por query_workers"""
+        with self._lock:
+            if self._query_executor is None:
+                db_settings = {**load_user_settings().get('database', {}), **self._pool_settings}
+                self._query_executor = ThreadPoolExecutor(
+                    max_workers=max(1, int(db_settings.get('query_workers', 4))),
+                    thread_name_prefix='sql-job'
+                )
+            return self._query_executor
+    
+    def submit_query_job(self, query: str, timeout: Optional[float] = None, owner: Optional[str] = None,
+                         on_finish=None, log_context: Optional[Dict] = None) -> str:
+        """Enfileira a query no pool de workers e retorna o ID do job.
+        on_finish(job) é chamado na thread do worker quando a query termina (não se cancelada na fila);
+        log_context (source/user) identifica a execução no log de queries lentas."""
+        self._purge_query_jobs()
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._query_jobs[job_id] = {
+                'id': job_id,
+                'query': query,
+                'owner': owner,
+                'status': 'queued',
+                'pid': None,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'cancelled': False,
+                'result': None,
+                'on_finish': on_finish,
+                'log_context': log_context
+            }
+            self._query_jobs[job_id]['future'] = self._get_query_executor().submit(
+                self._run_query_job, job_id, timeout
+            )
+        return job_id
+    
+    def _run_query_job(self, job_id: str, timeout: Optional[float]):
+        with self._lock:
+            job = self._query_jobs.get(job_id)
+            if job is None or job['cancelled']:
+                if job is not None:
+                    job.update(status='cancelled', finished_at=time.time(),
+                               result=self._cancelled_result('Job cancelado antes de iniciar'))
+                return
+            job.update(status='running', started_at=time.time())
+        
+        try:
+            result = self.execute_query(job['query'], True, timeout, job_id, columnar=True,
+                                        log_context=job['log_context'])
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'execution_time': '0ms',
+                      'message': f'Erro na execução: {e}'}
+        
+        with self._lock:
+            if job['cancelled'] and (result.get('cancelled') or result.get('pgcode') == QUERY_CANCELED_PGCODE):
+                # O backend interrompeu o comando (ou ele nem chegou a rodar)
+                status = 'cancelled'
+                result = {**self._cancelled_result('Query cancelada pelo usuário'),
+                          'execution_time': result.get('execution_time', '0ms')}
+            else:
+                if job['cancelled']:
+                    # O comando terminou antes do cancelamento: resultado e escrita confirmada valem
+                    note = 'cancelamento chegou após a conclusão'
+                    result = {**result, 'cancel_note': note,
+                              'message': f"{result.get('message') or 'Comando executado'} ({note})"}
+                status = 'done' if result.get('success') else 'error'
+            job.update(status=status, result=result, finished_at=time.time())
+        
+        if job['on_finish'] is not None:
+            try:
+                job['on_finish'](job)
+            except Exception:
+                pass  # Registro auxiliar (histórico) não pode derrubar o worker
+    
+    @staticmethod
+    def _cancelled_result(message: str) -> Dict:
+        return {'success': False, 'error': message, 'execution_time': '0ms',
+                'message': message, 'cancelled': True}
+    
+    def _register_backend_pid(self, job_id: str, pid: Optional[int]) -> bool:
+        """Associa o PID ao job; False se o job já foi cancelado (não deve executar)"""
+        with self._lock:
+            job = self._query_jobs.get(job_id)
+            if job is not None:
+                job['pid'] = pid
+                return not job['cancelled']
+            return True
+    
+    def get_query_job(self, job_id: Optional[str]) -> Optional[Dict]:
+        with self._lock:
+            return self._query_jobs.get(job_id)
+    
+    def list_query_jobs(self, owner: Optional[str] = None) -> List[Dict]:
+        """Jobs da sessão, mais recentes primeiro"""
+        with self._lock:
+            jobs = [job for job in self._query_jobs.values() if owner is None or job['owner'] == owner]
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+    
+    def cancel_query_job(self, job_id: Optional[str]) -> Dict:
+        """Cancela o job: na fila é descartado; em execução recebe pg_cancel_backend(pid)"""
+        with self._lock:
+            job = self._query_jobs.get(job_id)
+            if job is None or job['status'] not in ('queued', 'running'):
+                return {'success': False, 'message': 'O job não está em execução'}
+            job['cancelled'] = True
+            status, pid = job['status'], job['pid']
+        
+        if status == 'queued':
+            return {'success': True, 'message': 'Job removido da fila'}
+        
+        if pid is None:
+            # Aguardando conexão do pool: não chega a rodar. REST/demonstração: não há backend
+            # a interromper e o comando segue até o fim, com o resultado real
+            return {'success': True, 'message': 'Cancelamento registrado; sem backend PostgreSQL '
+                                                'para interromper, o comando pode concluir mesmo assim'}
+        
+        result = self._execute_native_query("SELECT pg_cancel_backend(%s) AS cancelled", (pid,))
+        if result['success'] and result['data'] and result['data'][0]['cancelled']:
+            return {'success': True, 'message': f'Cancelamento enviado ao backend PID {pid}'}
+        return {'success': False, 'message': result.get('error') or f'Backend PID {pid} não encontrado'}
+    
+    def dismiss_query_job(self, job_id: Optional[str]):
+        """Remove um job concluído e seu resultado da memória"""
+        with self._lock:
+            job = self._query_jobs.get(job_id)
+            if job is not None and job['status'] not in ('queued', 'running'):
+                del self._query_jobs[job_id]
+    
+    def _purge_query_jobs(self):
+        """Descarta jobs concluídos antigos e o excedente por sessão"""
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._query_jobs.values() if job['finished_at'] is not None),
+                key=lambda job: job['finished_at'], reverse=True
+            )
+            kept_per_owner = {}
+            for job in finished:
+                kept = kept_per_owner.get(job['owner'], 0)
+                if kept >= QUERY_JOBS_PER_OWNER or now - job['finished_at'] > QUERY_JOB_RETENTION:
+                    del self._query_jobs[job['id']]
+                else:
+                    kept_per_owner[job['owner']] = kept + 1
+    
+    def invalidate_catalog(self):
+        """Marca o catálogo em memória como alterado (hook de invalidação)"""
+        with self._lock:
+            self.catalog_version += 1
+            self._exact_counts = {}
+        self.cache.invalidate()
+        self.result_cache.invalidate_tables()
+    
+    def get_catalog_snapshot(self, force: bool = False) -> Dict[str, Dict]:
+        """Metadados de todas as tabelas (linhas, tamanho, índices, vacuum) em uma consulta"""
+        with self._lock:
+            fresh = (time.time() - self._catalog_snapshot_at) < CATALOG_SNAPSHOT_TTL
+            same_version = self._catalog_snapshot_version == self.catalog_version
+            if not force and fresh and same_version:
+                return self._catalog_snapshot
+            
+            # TTL expirado com catálogo estável: só a impressão digital e as tabelas alteradas
+            if not force and same_version and self._fingerprints:
+                if self._refresh_snapshot_incremental() is not None:
+                    self._catalog_snapshot_at = time.time()
+                    return self._catalog_snapshot
+            
+            rows = self._fetch_catalog_snapshot()
+            if rows is not None:
+                self._catalog_snapshot = {row['name']: row for row in rows}
+                self._fingerprints = self._fetch_catalog_fingerprint() or {}
+            
+            # Fonte indisponível: manter o último snapshot válido sem repetir a tentativa até o TTL
+            self._catalog_snapshot_at = time.time()
+            self._catalog_snapshot_version = self.catalog_version
+            return self._catalog_snapshot
+    
+    def _fetch_catalog_fingerprint(self) -> Optional[Dict[str, str]]:
+        """Impressão digital por tabela (uma consulta leve; requer backend nativo)"""
+        if not self.native_available:
+            return None
+        result = self._execute_native_query(CATALOG_FINGERPRINT_SQL)
+        if not result['success']:
+            return None
+        return {row['name']: (row['fingerprint'], row['schema_fingerprint']) for row in result['data']}
+    
+    def _refresh_snapshot_incremental(self) -> Optional[Dict[str, List[str]]]:
+        """Compara impressões digitais e rebusca só tabelas novas ou alteradas (requer o lock).
+        
+        Retorna o diff {'added', 'dropped', 'changed'} ou None se não houver impressão digital.
+        """
+        fingerprints = self._fetch_catalog_fingerprint()
+        if fingerprints is None:
+            return None
+        
+        diff = {
+            'added': sorted(n for n in fingerprints if n not in self._fingerprints),
+            'dropped': sorted(n for n in self._fingerprints if n not in fingerprints),
+            'changed': sorted(n for n in fingerprints
+                              if n in self._fingerprints and self._fingerprints[n] != fingerprints[n])
+        }
+        
+        stale_names = diff['added'] + diff['changed']
+        if stale_names:
+            rows = self._fetch_catalog_snapshot(stale_names)
+            if rows is None:
+                return None
+            for row in rows:
+                self._catalog_snapshot[row['name']] = row
+        
+        for name in diff['dropped']:
+            self._catalog_snapshot.pop(name, None)
+        
+        # Estatísticas em cache continuam válidas para as tabelas inalteradas
+        for name in diff['dropped'] + diff['changed']:
+            self._exact_counts.pop(name, None)
+            self._counted_tables.discard(name)
+        
+        if diff['changed'] or diff['dropped']:
+            touched = set(diff['changed'] + diff['dropped'])
+            self.cache.invalidate(lambda key: key[0] in ('table_data', 'table_page') and key[1] in touched)
+            self.result_cache.invalidate_tables(touched)
+        
+        # Estrutura alterada (DDL): nova versão do catálogo para a introspecção de colunas
+        schema_changed = diff['added'] or diff['dropped'] or any(
+            self._fingerprints[n][1] != fingerprints[n][1] for n in diff['changed']
+        )
+        if schema_changed:
+            self.catalog_version += 1
+            self._catalog_snapshot_version = self.catalog_version
+            self.cache.invalidate(lambda key: key[0] == 'columns')
+        
+        self._fingerprints = fingerprints
+        return diff
+    
+    def _fetch_catalog_snapshot(self, table_names: Optional[List[str]] = None) -> Optional[List[Dict]]:
+        """Busca o snapshot via SQL direto ou RPC get_catalog_snapshot"""
+        if self.native_available:
+            if table_names is not None:
+                result = self._execute_native_query(
+                    CATALOG_SNAPSHOT_SQL + "  AND c.relname = ANY(%(names)s)",
+                    {'names': list(table_names)}
+                )
+            else:
+                result = self._execute_native_query(CATALOG_SNAPSHOT_SQL)
+            return result['data'] if result['success'] else None
+        
+        if not (CONFIG.get('supabase_url') and CONFIG.get('supabase_service_key')):
+            return None
+        
+        try:
+            response = get_http_transport().post(
+                f"{CONFIG['supabase_url']}/rest/v1/rpc/get_catalog_snapshot",
+                headers={
+                    'apikey': CONFIG['supabase_service_key'],
+                    'Authorization': f"Bearer {CONFIG['supabase_service_key']}",
+                    'Content-Type': 'application/json'
+                },
+                json={},
+                timeout=10,
+                retry=True  # RPC somente leitura
+            )
+            if response.status_code == 200 and isinstance(response.json(), list):
+                return response.json()
+        except Exception:
+            pass
+        return None
+    
+    def _apply_snapshot_entry(self, table: Dict, entry: Dict):
+        """Copia os metadados do snapshot para o dicionário da tabela"""
+        last_vacuum = entry.get('last_vacuum')
+        last_analyze = entry.get('last_analyze')
+        exact_rows = self._exact_counts.get(entry['name'])
+        
+        table.update({
+            'schema': entry.get('schema', table.get('schema', 'public')),
+            'rows': exact_rows if exact_rows is not None else int(entry.get('row_estimate') or 0),
+            'rows_estimated': exact_rows is None,
+            'size': format_bytes(entry.get('total_bytes')),
+            'size_bytes': int(entry.get('total_bytes') or 0),
+            'index_count': int(entry.get('index_count') or 0),
+            'has_indexes': bool(entry.get('has_indexes')),
+            'has_rules': bool(entry.get('has_rules')),
+            'has_triggers': bool(entry.get('has_triggers')),
+            'rls_enabled': bool(entry.get('rls_enabled')),
+            'last_vacuum': str(last_vacuum)[:19] if last_vacuum else None,
+            'last_analyze': str(last_analyze)[:19] if last_analyze else None
+        })
+    
+    def _apply_catalog_snapshot(self, snapshot: Dict[str, Dict]) -> set:
+        """Atualiza as tabelas em memória a partir do snapshot; retorna os nomes cobertos"""
+        # Tabelas pequenas (estimativa abaixo do limite) recebem contagem exata, uma vez por catálogo
+        threshold = load_user_settings().get('database', {}).get('exact_count_threshold', 10000)
+        small_tables = [name for name, entry in snapshot.items()
+                        if name not in self._exact_counts and int(entry.get('row_estimate') or 0) < threshold]
+        if small_tables:
+            self._exact_counts.update(self._exact_counts_for(small_tables))
+        
+        covered = set()
+        for table in self.real_tables:
+            entry = snapshot.get(table['name'])
+            if entry:
+                self._apply_snapshot_entry(table, entry)
+                covered.add(table['name'])
+        self._counted_tables.update(covered)
+        return covered
+    
+    def _exact_counts_for(self, table_names: List[str]) -> Dict[str, int]:
+        """Contagens exatas de várias tabelas (uma consulta UNION ALL no backend nativo).
+        Se a consulta conjunta falhar, conta tabela a tabela: lock, permissão ou timeout em uma
+        não impede as demais, e a que falhou só é tentada de novo após COUNT_RETRY_SECONDS."""
+        if self.native_available:
+            timeout = load_user_settings().get('database', {}).get('count_timeout', 10)
+            now = time.time()
+            with self._lock:
+                table_names = [name for name in table_names
+                               if now - self._exact_count_failures.get(name, 0) >= COUNT_RETRY_SECONDS]
+            if not table_names:
+                return {}
+            
+            if len(table_names) > 1:
+                union_sql = " UNION ALL ".join(
+                    f"SELECT '{name.replace(chr(39), chr(39) * 2)}' AS name, count(*) AS total "
+                    f"FROM {quote_identifier(name)}"
+                    for name in table_names
+                )
+                result = self._execute_native_query(union_sql, timeout=timeout * len(table_names))
+                if result['success']:
+                    return {row['name']: int(row['total']) for row in result['data']}
+            
+            counts = {}
+            for name in table_names:
+                result = self._execute_native_query(
+                    f"SELECT count(*) AS total FROM {quote_identifier(name)}", timeout=timeout
+                )
+                if result['success']:
+                    counts[name] = int(result['data'][0]['total'])
+                else:
+                    with self._lock:
+                        self._exact_count_failures[name] = now
+            return counts
+        
+        counts, _ = self._count_tables_concurrently(table_names, exact=True)
+        return {name: rows for name, (rows, _) in counts.items()}
+    
+    def _count_table(self, table_name: str, exact: bool = False) -> Tuple[int, bool]:
+        """Conta registros usando a estimativa do planejador; exata abaixo do limite configurado.
+        
+        Retorna (contagem, é_estimativa).
+        """
+        if self.native_available:
+            if not exact:
+                entry = self.get_catalog_snapshot().get(table_name)
+                threshold = load_user_settings().get('database', {}).get('exact_count_threshold', 10000)
+                if entry and int(entry.get('row_estimate') or 0) >= threshold:
+                    return int(entry['row_estimate']), True
+            return self._exact_counts_for([table_name]).get(table_name, 0), False
+        
+        if not exact:
+            result = self.supabase_client.table(table_name).select('*', count='planned').limit(1).execute()
+            planned = result.count if getattr(result, 'count', None) is not None else 0
+            threshold = load_user_settings().get('database', {}).get('exact_count_threshold', 10000)
+            if planned >= threshold:
+                return planned, True
+        
+        result = self.supabase_client.table(table_name).select('*', count='exact').limit(1).execute()
+        return (result.count if getattr(result, 'count', None) is not None else 0), False
+    
+    def count_table_exact(self, table_name: str) -> int:
+        """Força a contagem exata de uma tabela (ação explícita do usuário)"""
+        if not self.connected and not self.native_available:
+            return self.get_table_row_count(table_name)
+        
+        rows, _ = self._count_table(table_name, exact=True)
+        with self._lock:
+            self._exact_counts[table_name] = rows
+            for table in self.real_tables:
+                if table['name'] == table_name:
+                    table['rows'] = rows
+                    table['rows_estimated'] = False
+        return rows
+    
+    def _init_connection(self):
+        """Inicializa conexão com o Supabase (as contagens ficam para _update_table_counts,
+        chamado fora do lock)"""
+        with self._lock:
+            self._init_connection_locked()
+    
+    def _init_connection_locked(self):
+        """Cria os clientes Supabase e descobre as tabelas (requer o lock)"""
+        try:
+            if SUPABASE_AVAILABLE and CONFIG['supabase_url']:
+                # Cliente normal (anon key)
+                self.supabase_client = create_client(
+                    CONFIG['supabase_url'],
+                    CONFIG['supabase_anon_key']
+                )
+                
+                # Cliente admin (service role key) para operações administrativas
+                self.supabase_admin = create_client(
+                    CONFIG['supabase_url'],
+                    CONFIG['supabase_service_key']
+                )
+                
+                # Descobrir tabelas reais do banco
+                self._discover_real_tables()
+                
+                self.connected = True
+                self.connection_info = {
+                    'type': 'Supabase',
+                    'url': CONFIG['supabase_url'],
+                    'status': 'Conectado',
+                    'tables_found': len(self.real_tables)
+                }
+                
+                self._status_ui().success(f"✅ Conectado ao Supabase! {len(self.real_tables)} tabelas encontradas.")
+                
+            else:
+                self._init_demo_mode()
+        
+        except Exception as e:
+            self._status_ui().error(f"❌ Erro ao conectar com Supabase: {e}")
+            self._init_demo_mode()
+    
+    def _init_demo_mode(self):
+        """Inicializa modo demonstração"""
+        self.connected = False
+        self.connection_info = {
+            'type': 'Demo',
+            'url': 'localhost',
+            'status': 'Modo Demonstração'
+        }
+        self.real_tables = []
+    
+    def _discover_real_tables(self):
+        """Descobre as tabelas reais do banco Supabase usando múltiplas estratégias"""
+        self.real_tables = []
+        self._counted_tables = set()
+        
+        try:
+            self._status_ui().info("🔍 Descobrindo tabelas do Supabase...")
+            
+            # Método 0: Snapshot do catálogo (uma única consulta com todos os metadados)
+            snapshot = self.get_catalog_snapshot(force=True)
+            for name, entry in sorted(snapshot.items()):
+                table = {'name': name, 'last_modified': datetime.now().strftime('%Y-%m-%d')}
+                self._apply_snapshot_entry(table, entry)
+                self.real_tables.append(table)
+            
+            # Método 1: Usar PostgREST para consultar information_schema
+            if not self.real_tables:
+                self._discover_via_information_schema()
+            
+            # Método 2: Se não funcionou, tentar via API REST OpenAPI
+            if not self.real_tables:
+                self._discover_via_openapi()
+            
+            # Método 3: Se ainda não funcionou, testar tabelas comuns
+            if not self.real_tables:
+                self._discover_via_common_tables()
+            
+            # Remover duplicatas
+            seen = set()
+            unique_tables = []
+            for table in self.real_tables:
+                if table['name'] not in seen:
+                    seen.add(table['name'])
+                    unique_tables.append(table)
+            
+            self.real_tables = unique_tables
+            
+            # Contagens das tabelas fora do snapshot: _update_table_counts, fora do lock
+            self._apply_catalog_snapshot(snapshot)
+            
+            self._status_ui().success(f"✅ {len(self.real_tables)} tabelas descobertas!")
+            
+        except Exception as e:
+            self._status_ui().error(f"❌ Erro ao descobrir tabelas: {e}")
+            self.real_tables = []
+
+    def get_table_row_count(self, table_name):
+        """Obtém contagem de registros de uma tabela"""
+        try:
+            if not self.connected:
+                # Retornar dados simulados para modo demo
+                demo_counts = {
+                    'users': 1250,
+                    'products': 850, 
+                    'orders': 3200,
+                    'categories': 25,
+                    'reviews': 4500,
+                    'customers': 890,
+                    'inventory': 1200,
+                    'payments': 2800,
+                    'pets': 1840,
+                    'appointments': 2650,
+                    'medical_records': 3420,
+                    'veterinarians': 45,
+                    'clinics': 12,
+                    'treatments': 5680,
+                    'medications': 234,
+                    'invoices': 1890
+                }
+                
+                # Se for uma tabela conhecida, retornar valor simulado, senão gerar aleatório
+                if isinstance(table_name, dict):
+                    table_name = table_name.get('name', 'unknown')
+                
+                return demo_counts.get(table_name, random.randint(50, 1000))
+            
+            if table_name in self._exact_counts:
+                return self._exact_counts[table_name]
+            
+            entry = self.get_catalog_snapshot().get(table_name)
+            if entry:
+                return int(entry.get('row_estimate') or 0)
+            
+            # Estimativa do planejador (exata para tabelas pequenas)
+            return self._count_table(table_name)[0]
+                
+        except Exception as e:
+            # Em caso de erro, retornar valor simulado
+            return random.randint(10, 500)
+
+    def get_table_size_mb(self, table_name):
+        """Estima o tamanho de uma tabela em MB"""
+        try:
+            entry = self.get_catalog_snapshot().get(table_name) if self.connected else None
+            if entry:
+                return int(entry.get('total_bytes') or 0) / 1024 / 1024
+            
+            row_count = self.get_table_row_count(table_name)
+            
+            # Estimar tamanho baseado no número de registros
+            # Assumindo média de 0.5KB por registro
+            estimated_size_kb = row_count * 0.5
+            estimated_size_mb = estimated_size_kb / 1024
+            
+            return max(0.1, estimated_size_mb)  # Mínimo de 0.1MB
+            
+        except Exception:
+            return random.uniform(0.5, 50.0)
+
+    def get_table_last_modified(self, table_name):
+        """Obtém data da última modificação de uma tabela"""
+        try:
+            if not self.connected:
+                # Retornar data simulada
+                return datetime.now() - timedelta(days=random.randint(1, 30))
+            
             # Para Supabase, tentar buscar o registro mais recente
             result = self.supabase_client.table(table_name).select('created_at').order('created_at', desc=True).limit(1).execute()
             
@@ -1426,13 +4485,13 @@ def get_table_with_policies_info(self, table_name):
             return complete_info
             
         except Exception as e:
-            st.error(f"❌ Erro ao buscar informações completas de {table_name}: {e}")
+            self._status_ui().error(f"❌ Erro ao buscar informações completas de {table_name}: {e}")
             return table_info if 'table_info' in locals() else {}
             
     def _discover_via_information_schema(self):
         """Método 1: Descobrir tabelas via information_schema"""
         try:
-            import requests
+            http = get_http_transport()
             
             # URL para consultar information_schema
             url = f"{CONFIG['supabase_url']}/rest/v1/rpc/get_tables"
@@ -1445,7 +4504,7 @@ def _discover_via_information_schema(self):
             
             # Tentar função customizada primeiro (se existir)
             try:
-                response = requests.post(url, headers=headers, json={}, timeout=10)
+                response = http.post(url, headers=headers, json={}, timeout=10, retry=True)
                 if response.status_code == 200:
                     tables_data = response.json()
                     for table in tables_data:
@@ -1472,7 +4531,7 @@ def _discover_via_information_schema(self):
                 'table_schema': 'eq.public'
             }
             
-            response = requests.get(schema_query_url, headers=headers, params=params, timeout=10)
+            response = http.get(schema_query_url, headers=headers, params=params, timeout=10)
             
             if response.status_code == 200:
                 tables_data = response.json()
@@ -1490,13 +4549,13 @@ def _discover_via_information_schema(self):
                         })
         
         except Exception as e:
-            st.warning(f"⚠️ Método information_schema falhou: {e}")
+            self._status_ui().warning(f"⚠️ Método information_schema falhou: {e}")
 
     
     def _discover_via_openapi(self):
         """Método 2: Descobrir tabelas via OpenAPI spec"""
         try:
-            import requests
+            http = get_http_transport()
             
             # Buscar especificação OpenAPI do Supabase
             openapi_url = f"{CONFIG['supabase_url']}/rest/v1/"
@@ -1505,7 +4564,7 @@ def _discover_via_openapi(self):
                 'apikey': CONFIG['supabase_anon_key']
             }
             
-            response = requests.get(openapi_url, headers=headers, timeout=10)
+            response = http.get(openapi_url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 openapi_spec = response.json()
@@ -1533,7 +4592,7 @@ def _discover_via_openapi(self):
                                     })
         
         except Exception as e:
-            st.warning(f"⚠️ Método OpenAPI falhou: {e}")
+            self._status_ui().warning(f"⚠️ Método OpenAPI falhou: {e}")
     
     def _discover_via_common_tables(self):
         """Método 3: Testar tabelas comuns por tentativa e erro"""
@@ -1585,7 +4644,7 @@ def _discover_via_common_tables(self):
                 'badges', 'achievements', 'leaderboards', 'games'
             ]
             
-            progress_bar = st.progress(0)
+            progress_bar = self._status_ui().progress(0)
             total_tables = len(common_tables)
             
             for i, table_name in enumerate(common_tables):
@@ -1616,57 +4675,79 @@ def _discover_via_common_tables(self):
             progress_bar.empty()
             
         except Exception as e:
-            st.warning(f"⚠️ Método de teste comum falhou: {e}")
+            self._status_ui().warning(f"⚠️ Método de teste comum falhou: {e}")
 
 
     def _update_table_counts(self):
-        """Atualiza contagens de registros das tabelas descobertas"""
-        if not self.real_tables:
+        """Atualiza contagens de registros das tabelas descobertas. Não pode ser chamado com o
+        lock: as threads de contagem precisam dele (snapshot do catálogo, contagens exatas)."""
+        with self._lock:
+            pending_tables = [t for t in self.real_tables if t['name'] not in self._counted_tables]
+        if not pending_tables:
             return
         
-        st.info("📊 Atualizando contagens de registros...")
-        progress_bar = st.progress(0)
+        self._status_ui().info("📊 Atualizando contagens de registros...")
+        progress_bar = self._status_ui().progress(0)
         
-        total_tables = len(self.real_tables)
+        # Contagens em paralelo; a barra avança conforme cada tabela termina
+        counts, failed = self._count_tables_concurrently(
+            [t['name'] for t in pending_tables],
+            on_progress=lambda done, total: progress_bar.progress(done / total)
+        )
         
-        for i, table in enumerate(self.real_tables):
-            try:
-                # Atualizar barra de progresso
-                progress_bar.progress((i + 1) / total_tables)
+        with self._lock:
+            current = {id(t) for t in self.real_tables}
+            for table in pending_tables:
+                if table['name'] not in counts or id(table) not in current:
+                    # Se der erro ou timeout (ou a tabela saiu do catálogo), manter valores padrão
+                    continue
                 
-                # Buscar contagem real
-                result = self.supabase_client.table(table['name']).select('*', count='exact').limit(1).execute()
+                table['rows'], table['rows_estimated'] = counts[table['name']]
+                self._counted_tables.add(table['name'])
                 
-                if hasattr(result, 'count') and result.count is not None:
-                    table['rows'] = result.count
-                    
-                    # Calcular tamanho estimado
-                    if table['rows'] > 0:
-                        if table['rows'] > 100000:
-                            table['size'] = f"{(table['rows'] * 0.5 / 1024):.1f} MB"
-                        else:
-                            table['size'] = f"{(table['rows'] * 0.5):.1f} KB"
+                # Calcular tamanho estimado
+                if table['rows'] > 0:
+                    if table['rows'] > 100000:
+                        table['size'] = f"{(table['rows'] * 0.5 / 1024):.1f} MB"
                     else:
-                        table['size'] = "0 KB"
-            
-            except Exception:
-                # Se der erro, manter valores padrão
-                continue
+                        table['size'] = f"{(table['rows'] * 0.5):.1f} KB"
+                else:
+                    table['size'] = "0 KB"
         
         progress_bar.empty()
+        
+        if failed:
+            self._status_ui().warning(f"⚠️ Contagem indisponível para {len(failed)} tabela(s) (erro ou timeout): {', '.join(failed[:10])}")
 
+    def _count_tables_concurrently(self, table_names: List[str], on_progress=None,
+                                   exact: bool = False) -> Tuple[Dict[str, Tuple[int, bool]], List[str]]:
+        """Conta registros de várias tabelas em paralelo (resultados parciais em caso de timeout)"""
+        db_settings = load_user_settings().get('database', {})
+        
+        def count(table_name):
+            # Threads do pool não têm ScriptRunContext
+            with self.quiet_status():
+                return self._count_table(table_name, exact=exact)
+        
+        return run_bounded_concurrently(
+            count,
+            table_names,
+            max_workers=db_settings.get('count_concurrency', 8),
+            item_timeout=db_settings.get('count_timeout', 10),
+            on_progress=on_progress
+        )
+    
     def _get_table_count(self, table_name: str) -> int:
         """Obtém contagem de registros de uma tabela"""
         try:
-            result = self.supabase_client.table(table_name).select('*', count='exact').limit(1).execute()
-            return result.count if hasattr(result, 'count') else 0
+            return self._count_table(table_name)[0]
         except:
             return 0
     
     def _discover_tables_via_rest_api(self):
         """Tenta descobrir tabelas via API REST"""
         try:
-            import requests
+            http = get_http_transport()
             
             # Fazer chamada para o endpoint de metadados (se disponível)
             headers = {
@@ -1676,7 +4757,7 @@ def _discover_tables_via_rest_api(self):
             
             # Tentar endpoint de esquema
             schema_url = f"{CONFIG['supabase_url']}/rest/v1/"
-            response = requests.get(schema_url, headers=headers, timeout=5)
+            response = http.get(schema_url, headers=headers, timeout=5)
             
             if response.status_code == 200:
                 # O Supabase retorna OpenAPI spec que pode conter nomes de tabelas
@@ -1697,7 +4778,7 @@ def _discover_tables_via_rest_api(self):
                                     'has_triggers': False
                                 })
         except Exception as e:
-            st.warning(f"⚠️ Não foi possível descobrir tabelas via API: {e}")
+            self._status_ui().warning(f"⚠️ Não foi possível descobrir tabelas via API: {e}")
     
     def _try_supabase_default_tables(self):
         """Tenta usar tabelas padrão do Supabase"""
@@ -1726,24 +4807,51 @@ def get_tables(self) -> List[Dict]:
         if not self.connected or not self.real_tables:
             return self._get_demo_tables()
         
-        # Atualizar contagens se necessário
-        for table in self.real_tables:
-            if table['rows'] == 0:  # Só atualizar se não tiver dados
-                table['rows'] = self._get_table_count(table['name'])
+        with self._lock:
+            # Metadados vindos do snapshot do catálogo (uma consulta, reutilizada por TTL)
+            self._apply_catalog_snapshot(self.get_catalog_snapshot())
+            
+            # Contar (em paralelo) apenas tabelas que ainda não foram contadas neste catálogo;
+            # falhas ficam marcadas (não viram 0 linhas) e são repetidas após COUNT_RETRY_SECONDS
+            now = time.time()
+            pending = [t for t in self.real_tables
+                       if t['rows'] == 0 and t['name'] not in self._counted_tables
+                       and now - t.get('count_failed_at', 0) >= COUNT_RETRY_SECONDS]
+            if not pending:
+                return self.real_tables
+        
+        # Fora do lock: as threads de contagem precisam dele, e as demais sessões não esperam
+        counts, _ = self._count_tables_concurrently([t['name'] for t in pending])
+        
+        with self._lock:
+            current = {id(t) for t in self.real_tables}
+            for table in pending:
+                if id(table) not in current:
+                    continue  # catálogo recarregado durante a contagem
+                if table['name'] not in counts:
+                    table['count_failed_at'] = now
+                    continue
+                table.pop('count_failed_at', None)
+                table['rows'], table['rows_estimated'] = counts[table['name']]
                 table['size'] = f"{max(1, table['rows'] * 0.5 / 1024):.1f} KB"
-        
-        return self.real_tables
+                self._counted_tables.add(table['name'])
+            
+            return self.real_tables
     
     def get_table_info(self, table_name: str) -> Dict:
         """Obtém informações detalhadas de uma tabela"""
         if not self.connected:
             return self._get_demo_table_info(table_name)
         
+        entry = self.get_catalog_snapshot().get(table_name)
+        if entry:
+            table_info = {'last_modified': datetime.now().strftime('%Y-%m-%d')}
+            self._apply_snapshot_entry(table_info, entry)
+            return table_info
+        
         try:
-            # Buscar informações reais da tabela
-            result = self.supabase_client.table(table_name).select('*', count='exact').limit(1).execute()
-            
-            row_count = result.count if hasattr(result, 'count') else 0
+            # Buscar informações reais da tabela (estimativa para tabelas grandes)
+            row_count, rows_estimated = self._count_table(table_name)
             
             # Calcular tamanho estimado
             if row_count > 0:
@@ -1756,6 +4864,7 @@ def get_table_info(self, table_name: str) -> Dict:
             
             return {
                 'rows': row_count,
+                'rows_estimated': rows_estimated,
                 'size': size_estimate,
                 'last_modified': datetime.now().strftime('%Y-%m-%d')
             }
@@ -1769,56 +4878,451 @@ def get_table_columns(self, table_name: str) -> List[Dict]:
         if not self.connected:
             return self._get_demo_columns(table_name)
         
+        schema = self.get_schema_introspection().get(table_name)
+        if schema:
+            return schema['columns']
+        
+        try:
+            return self.cache.get_or_load(
+                ('columns', self.catalog_version, table_name),
+                lambda: self._load_table_columns(table_name)
+            )
+        except Exception as e:
+            st.error(f"❌ Erro ao buscar colunas da tabela {table_name}: {e}")
+            return self._get_demo_columns(table_name)
+    
+    def get_schema_introspection(self) -> Dict[str, Dict]:
+        """Estrutura real de todas as tabelas (tipos, nulidade, defaults, PK, FKs, índices).
+        
+        Uma única consulta ao catálogo (ou à especificação OpenAPI), em cache por versão do catálogo.
+        """
+        if not self.connected and not self.native_available:
+            return {}
+        
+        # Memoizada por versão do catálogo independentemente do cache configurável: sem ela,
+        # cada get_table_columns refaria a introspecção completa com o cache desligado
+        with self._lock:
+            version = self.catalog_version
+            memo = self._schema_memo
+            if memo is not None and memo[0] == version and time.time() - memo[1] < SCHEMA_INTROSPECTION_TTL:
+                return memo[2]
+        
+        schema = self._load_schema_introspection()
+        if schema:
+            with self._lock:
+                if self.catalog_version == version:
+                    self._schema_memo = (version, time.time(), schema)
+        return schema
+    
+    def get_table_schema(self, table_name: str) -> Optional[Dict]:
+        """Colunas, chave primária, chaves estrangeiras e índices de uma tabela"""
+        return self.get_schema_introspection().get(table_name)
+    
+    def _load_schema_introspection(self) -> Dict[str, Dict]:
+        """Busca a estrutura via pg_catalog (nativo) ou OpenAPI do PostgREST"""
+        if self.native_available:
+            result = self._execute_native_query(SCHEMA_INTROSPECTION_SQL)
+            if not result['success']:
+                return {}
+            
+            schema = {}
+            for row in result['data']:
+                primary_key = row['primary_key'] or []
+                foreign_keys = row['foreign_keys'] or []
+                fk_by_column = {
+                    column: f"{fk['references_table']}({', '.join(fk['references_columns'] or [])})"
+                    for fk in foreign_keys for column in (fk['columns'] or [])
+                }
+                columns = [
+                    {**column, 'primary_key': column['name'] in primary_key,
+                     'foreign_key': fk_by_column.get(column['name'])}
+                    for column in (row['columns'] or [])
+                ]
+                schema[row['table_name']] = {
+                    'columns': columns,
+                    'primary_key': primary_key,
+                    'foreign_keys': foreign_keys,
+                    'indexes': row['indexes'] or []
+                }
+            return schema
+        
+        return self._load_schema_from_openapi()
+    
+    def _load_schema_from_openapi(self) -> Dict[str, Dict]:
+        """Extrai tipos, obrigatoriedade, defaults, PKs e FKs das definições OpenAPI"""
+        if not CONFIG.get('supabase_url'):
+            return {}
+        
         try:
-            # Buscar uma linha da tabela para analisar estrutura
-            result = self.supabase_client.table(table_name).select('*').limit(1).execute()
+            response = get_http_transport().get(
+                f"{CONFIG['supabase_url']}/rest/v1/",
+                headers={'apikey': CONFIG['supabase_service_key'] or CONFIG['supabase_anon_key']},
+                timeout=10
+            )
+            if response.status_code != 200:
+                return {}
+            definitions = response.json().get('definitions', {})
+        except Exception:
+            return {}
+        
+        schema = {}
+        for table_name, definition in definitions.items():
+            required = set(definition.get('required', []))
+            columns, primary_key, foreign_keys = [], [], []
             
-            if result.data and len(result.data) > 0:
-                first_row = result.data[0]
-                columns = []
-                
-                for column_name, value in first_row.items():
-                    # Determinar tipo baseado no valor
-                    if isinstance(value, str):
-                        if '@' in value and '.' in value:
-                            data_type = 'email'
-                        elif len(value) == 36 and '-' in value:
-                            data_type = 'uuid'
-                        else:
-                            data_type = 'text'
-                    elif isinstance(value, int):
-                        data_type = 'integer'
-                    elif isinstance(value, float):
-                        data_type = 'numeric'
-                    elif isinstance(value, bool):
-                        data_type = 'boolean'
-                    elif value is None:
-                        data_type = 'unknown'
-                    else:
-                        data_type = str(type(value).__name__)
-                    
-                    columns.append({
-                        'name': column_name,
-                        'type': data_type,
-                        'nullable': True,
-                        'default': None,
-                        'max_length': len(str(value)) if value else None
+            for column_name, prop in definition.get('properties', {}).items():
+                description = prop.get('description', '') or ''
+                fk_match = re.search(r"<fk table='([^']+)' column='([^']+)'/>", description)
+                foreign_key = f"{fk_match.group(1)}({fk_match.group(2)})" if fk_match else None
+                
+                if '<pk/>' in description:
+                    primary_key.append(column_name)
+                if fk_match:
+                    foreign_keys.append({
+                        'name': f"{table_name}_{column_name}_fkey",
+                        'columns': [column_name],
+                        'references_table': fk_match.group(1),
+                        'references_columns': [fk_match.group(2)],
+                        'definition': f"FOREIGN KEY ({column_name}) REFERENCES {foreign_key}"
                     })
                 
-                return columns
-            else:
-                # Se tabela vazia, retornar estrutura básica
-                return [
-                    {'name': 'id', 'type': 'uuid', 'nullable': False, 'default': 'gen_random_uuid()', 'max_length': None},
-                    {'name': 'created_at', 'type': 'timestamp', 'nullable': False, 'default': 'now()', 'max_length': None}
-                ]
+                columns.append({
+                    'name': column_name,
+                    'type': prop.get('format') or prop.get('type', 'unknown'),
+                    'nullable': column_name not in required,
+                    'default': prop.get('default'),
+                    'max_length': prop.get('maxLength'),
+                    'primary_key': '<pk/>' in description,
+                    'foreign_key': foreign_key
+                })
+            
+            schema[table_name] = {
+                'columns': columns,
+                'primary_key': primary_key,
+                'foreign_keys': foreign_keys,
+                'indexes': []  # Não expostos pela especificação OpenAPI
+            }
+        return schema
+    
+    def _load_table_columns(self, table_name: str) -> List[Dict]:
+        """Infere as colunas a partir de uma linha da tabela"""
+        # Buscar uma linha da tabela para analisar estrutura
+        result = self.supabase_client.table(table_name).select('*').limit(1).execute()
+        
+        if result.data and len(result.data) > 0:
+            first_row = result.data[0]
+            columns = []
+            
+            for column_name, value in first_row.items():
+                # Determinar tipo baseado no valor
+                if isinstance(value, str):
+                    if '@' in value and '.' in value:
+                        data_type = 'email'
+                    elif len(value) == 36 and '-' in value:
+                        data_type = 'uuid'
+                    else:
+                        data_type = 'text'
+                elif isinstance(value, int):
+                    data_type = 'integer'
+                elif isinstance(value, float):
+                    data_type = 'numeric'
+                elif isinstance(value, bool):
+                    data_type = 'boolean'
+                elif value is None:
+                    data_type = 'unknown'
+                else:
+                    data_type = str(type(value).__name__)
+                
+                columns.append({
+                    'name': column_name,
+                    'type': data_type,
+                    'nullable': True,
+                    'default': None,
+                    'max_length': len(str(value)) if value else None
+                })
+            
+            return columns
+        else:
+            # Se tabela vazia, retornar estrutura básica
+            return [
+                {'name': 'id', 'type': 'uuid', 'nullable': False, 'default': 'gen_random_uuid()', 'max_length': None},
+                {'name': 'created_at', 'type': 'timestamp', 'nullable': False, 'default': 'now()', 'max_length': None}
+            ]
+    
+    def execute_query(self, query: str, use_cache: bool = True, timeout: Optional[float] = None,
+                      run_id: Optional[str] = None, columnar: bool = False,
+                      log_context: Optional[Dict] = None) -> Dict:
+        """Executa uma query SQL (leituras repetidas são servidas do cache de resultados).
+        columnar pede o resultado como DataFrame em 'frame' (só no backend nativo; use result_frame).
+        Execuções acima do limite vão para o log de queries lentas com log_context (source, user)."""
+        real_backend = self.native_available or self.connected
+        cacheable = use_cache and real_backend and QueryResultCache.is_cacheable(query)
+        
+        if cacheable:
+            lookup_start = time.time()
+            entry = self.result_cache.get(query, self.catalog_version, columnar)
+            if entry is not None:
+                return {
+                    **entry['result'],
+                    'execution_time': f"{round((time.time() - lookup_start) * 1000, 2)}ms",
+                    'from_cache': True,
+                    'cache_age': round(time.time() - entry['stored_at'], 1),
+                    'original_execution_time': entry['result'].get('execution_time')
+                }
+        
+        start_time = time.time()
+        result = self._run_query(query, timeout=timeout, run_id=run_id, columnar=columnar)
+        self.log_slow_query(query, (time.time() - start_time) * 1000, result, **(log_context or {}))
+        if not result.get('success'):
+            return result
         
+        if cacheable:
+            self.result_cache.put(query, self.catalog_version, result, columnar,
+                                  known_tables={table['name'].lower() for table in self.real_tables})
+        else:
+            self._invalidate_after_write(query)
+
+        return result
+
+    def _invalidate_after_write(self, query: str):
+        """Escritas invalidam os dados de tabela e os resultados que leem as tabelas afetadas"""
+        if query.strip().upper().startswith(READ_ONLY_COMMANDS + MAINTENANCE_COMMANDS) and not extract_written_tables(query):
+            return
+        written = extract_written_tables(query)
+        self.cache.invalidate(lambda key: key[0] in ('table_data', 'table_page') and (not written or key[1] in written))
+        self.result_cache.invalidate_tables(written or None)
+
+    def execute_statements(self, statements: List[str], commit_each: bool = False,
+                           timeout: Optional[float] = None,
+                           parameters: Optional[Dict[str, Tuple[str, Any]]] = None,
+                           prepare: bool = False) -> Dict:
+        """Executa os comandos de um script em sequência numa única conexão.
+        Por padrão tudo roda em uma transação (erro desfaz o script inteiro);
+        commit_each confirma cada comando isoladamente. Para no primeiro erro.
+        parameters vem de bind_script_parameters; com prepare, os comandos viram
+        prepared statements reaproveitados pela conexão do pool em execuções seguintes."""
+        start_time = time.time()
+        if not statements:
+            return {
+                'success': False,
+                'error': 'Script vazio',
+                'execution_time': '0ms',
+                'message': 'Nenhum comando para executar',
+                'statements': []
+            }
+
+        if not self.native_available:
+            if parameters:
+                # Sem bind no servidor: valores entram como literais escapados
+                statements = [
+                    _rewrite_script_parameters(s, lambda m: sql_literal(parameters[m.group(1)][1]))
+                    for s in statements
+                ]
+            return self._execute_statements_individually(statements, timeout, start_time)
+
+        if not commit_each:
+            def label(statement):
+                return ' '.join(normalize_sql(statement).split()[:3]).upper()
+            
+            blocked = [label(s) for s in statements if requires_autocommit(s)]
+            control = [label(s) for s in statements if TRANSACTION_CONTROL_PATTERN.match(normalize_sql(s))]
+            if blocked or control:
+                reasons = []
+                if blocked:
+                    reasons.append(f"{', '.join(sorted(set(blocked)))} não pode rodar dentro de uma transação")
+                if control:
+                    reasons.append(f"{', '.join(sorted(set(control)))}: o script já roda em uma única "
+                                   "transação e não pode controlá-la")
+                return {
+                    'success': False,
+                    'error': f"{'; '.join(reasons)}. "
+                             "Marque 'Commit por comando' para executar este script.",
+                    'execution_time': '0ms',
+                    'message': 'Script incompatível com transação única',
+                    'statements': [],
+                    'backend': 'postgresql'
+                }
+
+        report = []
+        frame = None
+        error = None
+        pool = self._get_pg_pool()
+        try:
+            with pool.connection(autocommit=commit_each) as conn:
+                with conn.cursor() as cursor:
+                    if timeout:
+                        # Em transação, SET LOCAL cobre o script todo; em autocommit, SET + RESET
+                        scope = 'SET' if commit_each else 'SET LOCAL'
+                        cursor.execute(f"{scope} statement_timeout = %s", (int(timeout * 1000),))
+
+                    for index, statement in enumerate(statements, 1):
+                        entry = {'index': index, 'sql': statement[:200], 'rows_affected': 0, 'execution_ms': 0.0}
+                        if error is not None:
+                            report.append({**entry, 'status': 'ignorado'})
+                            continue
+
+                        statement_start = time.time()
+                        try:
+                            entry['prepared'] = self._execute_statement(
+                                pool, conn, cursor, statement, parameters or {}, prepare
+                            )
+                            rows = fetch_columnar(cursor) if cursor.description else None
+                            entry['rows_affected'] = len(rows) if rows is not None else max(cursor.rowcount, 0)
+                            entry['status'] = 'sucesso'
+                            if rows is not None and len(rows) > 0:
+                                frame = rows
+                        except psycopg2.Error as e:
+                            error = f"Comando {index}: {str(e).strip()}"
+                            entry['status'] = 'erro'
+                            entry['error'] = str(e).strip()
+                        entry['execution_ms'] = round((time.time() - statement_start) * 1000, 2)
+                        report.append(entry)
+
+                    if error is not None and not commit_each:
+                        conn.rollback()
+                        for entry in report:
+                            if entry['status'] == 'sucesso':
+                                entry['status'] = 'desfeito'
+                    elif timeout and commit_each:
+                        cursor.execute("RESET statement_timeout")
         except Exception as e:
-            st.error(f"❌ Erro ao buscar colunas da tabela {table_name}: {e}")
-            return self._get_demo_columns(table_name)
+            error = error or str(e).strip()
+
+        for entry in report:
+            if entry['status'] == 'sucesso':
+                self._invalidate_after_write(normalize_sql(statements[entry['index'] - 1]))
+
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        executed = len([e for e in report if e['status'] in ('sucesso', 'desfeito')])
+        result = {
+            'success': error is None,
+            'frame': frame if error is None else None,
+            'rows_affected': sum(e['rows_affected'] for e in report if e['status'] == 'sucesso'),
+            'execution_time': f"{execution_time}ms",
+            'statements': report,
+            'transactional': not commit_each,
+            'backend': 'postgresql'
+        }
+        if error is None:
+            result['message'] = f"{len(statements)} comando(s) executado(s) " + \
+                ('com commit individual' if commit_each else 'em uma transação')
+        else:
+            result['error'] = error
+            result['message'] = f"Script interrompido: {executed} de {len(statements)} comando(s) executado(s)" + \
+                ('' if commit_each else '; transação desfeita')
+        return result
+
+    @staticmethod
+    def _execute_statement(pool, conn, cursor, statement: str, parameters: Dict[str, Tuple[str, Any]],
+                           prepare: bool) -> Optional[str]:
+        """Executa um comando do script; devolve 'novo'/'reutilizado' quando usa prepared statement"""
+        names = find_script_parameters(statement)
+        command = normalize_sql(statement).split()[0].upper()
+        
+        if not prepare or command not in PREPARABLE_COMMANDS:
+            if names:
+                # psycopg2 interpola %(nome)s no cliente; '%' literal precisa ser dobrado
+                pyformat = _rewrite_script_parameters(statement.replace('%', '%%'), lambda m: f"%({m.group(1)})s")
+                cursor.execute(pyformat, {name: parameters[name][1] for name in names})
+            else:
+                cursor.execute(statement)
+            return None
+        
+        positional = _rewrite_script_parameters(
+            statement.strip().rstrip(';'), lambda m: f"${names.index(m.group(1)) + 1}"
+        )
+        types = [SCRIPT_PARAMETER_TYPES[parameters[name][0]] for name in names]
+        name = 'petcare_' + hashlib.md5(f"{positional}|{','.join(types)}".encode()).hexdigest()[:16]
+        
+        execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(names))})" if names else f"EXECUTE {name}"
+        values = [parameters[n][1] for n in names]
+        prepared = pool.prepared_statements(conn)
+        
+        if name in prepared:
+            # DDL depois do PREPARE pode mudar o tipo do resultado ("cached plan must not change
+            # result type"): o comando é descartado e preparado de novo, uma vez. Em transação,
+            # o savepoint evita que esse erro aborte o script inteiro. SAVEPOINT/RELEASE usam
+            # outro cursor: um execute no cursor do script descartaria as linhas do EXECUTE.
+            savepoint = not conn.autocommit
+            if savepoint:
+                with conn.cursor() as control:
+                    control.execute("SAVEPOINT petcare_prepared")
+            try:
+                cursor.execute(execute_sql, values)
+                if savepoint:
+                    with conn.cursor() as control:
+                        control.execute("RELEASE SAVEPOINT petcare_prepared")
+                pool.record_prepared_use(reused=True)
+                return 'reutilizado'
+            except psycopg2.Error as e:
+                if e.pgcode != STALE_PREPARED_PGCODE:
+                    raise
+                if savepoint:
+                    with conn.cursor() as control:
+                        control.execute("ROLLBACK TO SAVEPOINT petcare_prepared")
+                cursor.execute(f"DEALLOCATE {name}")
+                prepared.discard(name)
+        
+        if len(prepared) >= PREPARED_STATEMENTS_PER_CONNECTION:
+            cursor.execute("DEALLOCATE ALL")
+            prepared.clear()
+        type_list = f" ({', '.join(types)})" if types else ''
+        cursor.execute(f"PREPARE {name}{type_list} AS {positional}")
+        prepared.add(name)
+        cursor.execute(execute_sql, values)
+        
+        pool.record_prepared_use(reused=False)
+        return 'novo'
+    
+    def _execute_statements_individually(self, statements: List[str], timeout: Optional[float],
+                                         start_time: float) -> Dict:
+        """Sem conexão direta não há transação: cada comando vai ao backend separadamente"""
+        report = []
+        data = []
+        error = None
+        for index, statement in enumerate(statements, 1):
+            entry = {'index': index, 'sql': statement[:200], 'rows_affected': 0, 'execution_ms': 0.0}
+            if error is not None:
+                report.append({**entry, 'status': 'ignorado'})
+                continue
+
+            statement_start = time.time()
+            # _run_query direto: o script inteiro é que entra no log de queries lentas
+            result = self._run_query(statement, timeout=timeout)
+            entry['execution_ms'] = round((time.time() - statement_start) * 1000, 2)
+            entry['rows_affected'] = result.get('rows_affected', 0) or 0
+            if result.get('success'):
+                self._invalidate_after_write(statement)
+                entry['status'] = 'sucesso'
+                if result.get('data'):
+                    data = result['data']
+            else:
+                entry['status'] = 'erro'
+                entry['error'] = result.get('error', 'Erro desconhecido')
+                error = f"Comando {index}: {entry['error']}"
+            report.append(entry)
+
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        result = {
+            'success': error is None,
+            'data': data if error is None else [],
+            'rows_affected': sum(e['rows_affected'] for e in report if e['status'] == 'sucesso'),
+            'execution_time': f"{execution_time}ms",
+            'message': f"{len(statements)} comando(s) executado(s) sem transação",
+            'statements': report,
+            'transactional': False
+        }
+        if error is not None:
+            result['error'] = error
+            result['message'] = 'Script interrompido; comandos anteriores ao erro já foram aplicados'
+        return result
     
-    def execute_query(self, query: str) -> Dict:
-        """Executa uma query SQL"""
+    def _run_query(self, query: str, timeout: Optional[float] = None, run_id: Optional[str] = None,
+                   columnar: bool = False) -> Dict:
+        """Despacha a query para o backend nativo, Supabase ou demonstração"""
+        if self.native_available:
+            return self._execute_native_query(query, timeout=timeout, run_id=run_id, columnar=columnar)
+        
         if not self.connected:
             return self._execute_demo_query(query)
         
@@ -1826,7 +5330,7 @@ def execute_query(self, query: str) -> Dict:
             start_time = time.time()
             query_upper = query.upper().strip()
             
-            if query_upper.startswith('SELECT'):
+            if query_upper.startswith(('SELECT', 'WITH')):
                 return self._execute_select_query(query, start_time)
             elif query_upper.startswith(('INSERT', 'UPDATE', 'DELETE')):
                 return self._execute_modification_query(query, start_time)
@@ -1852,75 +5356,30 @@ def execute_query(self, query: str) -> Dict:
             }
     
     def _execute_select_query(self, query: str, start_time: float) -> Dict:
-        """Executa query SELECT no Supabase"""
+        """Executa SELECT no Supabase com filtros, ordem, projeção e paginação no servidor"""
         try:
-            query_lower = query.lower()
-            
-            # Extrair nome da tabela
-            import re
-            table_match = re.search(r'from\s+(\w+)', query_lower)
-            
-            if table_match:
-                table_name = table_match.group(1)
-                
-                # Verificar se a tabela existe
-                if table_name not in [t['name'] for t in self.real_tables]:
-                    return {
-                        'success': False,
-                        'error': f'Tabela {table_name} não encontrada',
-                        'execution_time': '0ms',
-                        'message': f'Tabela {table_name} não existe no banco'
-                    }
-                
-                # Executar query
-                supabase_query = self.supabase_client.table(table_name).select('*')
-                
-                # Aplicar LIMIT se especificado
-                limit_match = re.search(r'limit\s+(\d+)', query_lower)
-                if limit_match:
-                    limit_value = int(limit_match.group(1))
-                    supabase_query = supabase_query.limit(limit_value)
-                else:
-                    supabase_query = supabase_query.limit(100)  # Limit padrão
-                
-                # Aplicar WHERE se especificado (implementação básica)
-                where_match = re.search(r'where\s+(\w+)\s*=\s*[\'"]([^\'"]+)[\'"]', query_lower)
-                if where_match:
-                    column = where_match.group(1)
-                    value = where_match.group(2)
-                    supabase_query = supabase_query.eq(column, value)
-                
-                result = supabase_query.execute()
-                
-                end_time = time.time()
-                execution_time = round((end_time - start_time) * 1000, 2)
-                
-                return {
-                    'success': True,
-                    'data': result.data if result.data else [],
-                    'rows_affected': len(result.data) if result.data else 0,
-                    'execution_time': f"{execution_time}ms",
-                    'message': f'SELECT executado com sucesso em {table_name}'
-                }
-            else:
-                # Se não conseguir extrair tabela, tentar primeira tabela disponível
-                if self.real_tables:
-                    first_table = self.real_tables[0]['name']
-                    result = self.supabase_client.table(first_table).select('*').limit(10).execute()
-                    
-                    end_time = time.time()
-                    execution_time = round((end_time - start_time) * 1000, 2)
-                    
-                    return {
-                        'success': True,
-                        'data': result.data if result.data else [],
-                        'rows_affected': len(result.data) if result.data else 0,
-                        'execution_time': f"{execution_time}ms",
-                        'message': f'Query executada na tabela {first_table}'
-                    }
-                else:
-                    return self._execute_demo_query(query)
+            plan = translate_select_to_postgrest(query)
+        except SQLTranslationError as e:
+            # Traduzir parcialmente devolveria dados errados: executar como SQL real
+            return self._execute_sql_rpc(query, start_time, reason=str(e))
+        
+        table_name = plan['table']
+        if table_name not in [t['name'] for t in self.real_tables]:
+            return {
+                'success': False,
+                'error': f'Tabela {table_name} não encontrada',
+                'execution_time': '0ms',
+                'message': f'Tabela {table_name} não existe no banco'
+            }
+        
+        if plan['aggregates']:
+            return self._execute_aggregate_query(query, plan, start_time)
         
+        try:
+            limit = plan['limit'] if plan['limit'] is not None else POSTGREST_DEFAULT_LIMIT
+            data = []
+            if limit > 0:
+                data = self._build_postgrest_query(plan, limit).execute().data or []
         except Exception as e:
             return {
                 'success': False,
@@ -1928,6 +5387,99 @@ def _execute_select_query(self, query: str, start_time: float) -> Dict:
                 'execution_time': '0ms',
                 'message': f'Erro ao executar SELECT: {e}'
             }
+        
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        message = f'SELECT executado em {table_name} via PostgREST ({len(plan["filters"])} filtro(s) no servidor)'
+        if plan['limit'] is None and len(data) >= POSTGREST_DEFAULT_LIMIT:
+            message += f'; sem LIMIT, resultado limitado a {POSTGREST_DEFAULT_LIMIT} linhas'
+        
+        return {
+            'success': True,
+            'data': data,
+            'rows_affected': len(data),
+            'execution_time': f"{execution_time}ms",
+            'message': message,
+            'backend': 'postgrest'
+        }
+    
+    def _execute_aggregate_query(self, query: str, plan: Dict, start_time: float) -> Dict:
+        """Agregação executada no banco: só as linhas agregadas trafegam"""
+        select = plan['select']
+        table_name = plan['table']
+        
+        try:
+            if len(select) == 1 and select[0]['aggregate'] == 'count' and select[0]['column'] == '*':
+                # COUNT(*) pelo cabeçalho Content-Range (HEAD): funciona em qualquer versão do PostgREST
+                builder = self.supabase_client.table(table_name).select('*', count='exact', head=True)
+                result = self._apply_postgrest_filters(builder, plan['filters']).execute()
+                # O agregado tem uma única linha: LIMIT 0 ou OFFSET >= 1 a descartam
+                data = apply_plan_window([{select[0]['alias'] or 'count': result.count or 0}], plan)
+            else:
+                limit = plan['limit'] if plan['limit'] is not None else POSTGREST_DEFAULT_LIMIT
+                data = self._build_postgrest_query(plan, limit).execute().data or []
+        except Exception as e:
+            # Agregações desabilitadas no PostgREST (db-aggregates-enabled): SQL real
+            return self._execute_sql_rpc(query, start_time, reason=f"agregação recusada pelo PostgREST: {e}")
+        
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return {
+            'success': True,
+            'data': data,
+            'rows_affected': len(data),
+            'execution_time': f"{execution_time}ms",
+            'message': f'Agregação executada no banco para {table_name} ({len(data)} linha(s) retornada(s))',
+            'backend': 'postgrest'
+        }
+    
+    @staticmethod
+    def _apply_postgrest_filters(builder, filters: List[Tuple]):
+        """Aplica os predicados traduzidos (eq, in, is, like... com not_ para negação)"""
+        def encode(value):
+            return str(value).lower() if isinstance(value, bool) else value
+        
+        for negate, operator, column, value in filters:
+            target = builder.not_ if negate else builder
+            if operator == 'in_':
+                builder = target.in_(column, [encode(v) for v in value])
+            else:
+                builder = getattr(target, operator)(column, encode(value))
+        return builder
+    
+    def _build_postgrest_query(self, plan: Dict, limit: int):
+        """Monta a requisição PostgREST (select=, filtros, order=, Range) a partir do plano traduzido"""
+        builder = self.supabase_client.table(plan['table']).select(build_postgrest_select(plan['select']))
+        builder = self._apply_postgrest_filters(builder, plan['filters'])
+        
+        for order in plan['order']:
+            builder = builder.order(order['column'], desc=order['desc'], nullsfirst=order['nullsfirst'])
+        
+        offset = plan['offset'] or 0
+        return builder.range(offset, offset + limit - 1) if offset else builder.limit(limit)
+    
+    def _execute_sql_rpc(self, query: str, start_time: float, reason: str) -> Dict:
+        """Executa SQL real pela função RPC execute_sql (queries fora do subconjunto do PostgREST)"""
+        client = self.supabase_admin or self.supabase_client
+        try:
+            result = client.rpc('execute_sql', {'sql_query': query}).execute()
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Query não traduzível para PostgREST ({reason}) e a função RPC execute_sql '
+                         f'não está disponível: {e}',
+                'execution_time': f"{round((time.time() - start_time) * 1000, 2)}ms",
+                'message': 'Configure a conexão PostgreSQL direta ou crie a função execute_sql no Supabase'
+            }
+        
+        data = result.data if isinstance(result.data, list) else ([result.data] if result.data else [])
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return {
+            'success': True,
+            'data': data,
+            'rows_affected': len(data),
+            'execution_time': f"{execution_time}ms",
+            'message': f'Executada como SQL real via RPC execute_sql (não traduzível para PostgREST: {reason})',
+            'backend': 'rpc'
+        }
     
     def _execute_modification_query(self, query: str, start_time: float) -> Dict:
         """Executa queries de modificação"""
@@ -1943,11 +5495,68 @@ def _execute_modification_query(self, query: str, start_time: float) -> Dict:
             'message': 'Operação de modificação simulada (por segurança)'
         }
     
+    def sample_table(self, table_name: str, target_rows: int = SAMPLE_TARGET_ROWS, method: str = 'auto') -> Dict:
+        """Amostra aleatória da tabela inteira com TABLESAMPLE, com percentual calculado a partir do
+        tamanho estimado. Sem SQL real disponível recai nas primeiras linhas (sample['biased'])."""
+        start_time = time.time()
+        table = next((t for t in self.get_tables() if t['name'] == table_name), {})
+        table_rows = int(table.get('rows') or 0)
+        target_rows = max(1, int(target_rows))
+        
+        if method == 'auto':
+            method = 'SYSTEM' if table_rows >= SAMPLE_SYSTEM_MIN_ROWS else 'BERNOULLI'
+        method = method.upper()
+        if method not in ('SYSTEM', 'BERNOULLI'):
+            raise ValueError(f"Método de amostragem inválido: {method}")
+        
+        # Sem a chave, a contagem veio de um caminho que não distingue: tratada como estimativa
+        exact_size = not table.get('rows_estimated', True) and not table.get('count_failed_at')
+        if table_rows == 0 or table.get('count_failed_at') or (not exact_size and table_rows <= target_rows):
+            # Tamanho desconhecido (fallbacks do PostgREST informam 0) ou estimativa pequena do
+            # planejador (reltuples desatualizado pode esconder uma tabela grande): sorteio sobre a
+            # tabela inteira em vez de tratar as primeiras linhas como completa
+            query = f"SELECT * FROM {quote_identifier(table_name)} ORDER BY random() LIMIT {target_rows}"
+            sample = {'method': 'aleatória', 'percent': None}
+        elif table_rows <= target_rows:
+            # Tabela pequena com contagem exata: ler tudo custa o mesmo que amostrar
+            query = f"SELECT * FROM {quote_identifier(table_name)} LIMIT {target_rows}"
+            sample = {'method': 'completa', 'percent': 100.0}
+        else:
+            # Margem para a variação do sorteio (maior no SYSTEM, que sorteia páginas inteiras);
+            # o excedente é cortado em ordem aleatória para não favorecer as primeiras páginas
+            oversample = 1.5 if method == 'SYSTEM' else 1.2
+            percent = min(100.0, max(0.0001, target_rows / table_rows * 100 * oversample))
+            query = (f"SELECT * FROM {quote_identifier(table_name)} TABLESAMPLE {method} ({percent:.4f}) "
+                     f"ORDER BY random() LIMIT {target_rows}")
+            sample = {'method': method, 'percent': round(percent, 4)}
+        sample.update(table=table_name, table_rows=table_rows, target_rows=target_rows, biased=False)
+        
+        if self.native_available:
+            result = self.execute_query(query, columnar=True)
+        elif self.connected:
+            result = self._execute_sql_rpc(query, start_time, reason='amostragem TABLESAMPLE')
+            if not result['success']:
+                result = self.get_table_data(table_name, limit=target_rows)
+                sample.update(method='primeiras linhas', percent=None, biased=True)
+        else:
+            result = self._execute_demo_query(query)
+            sample.update(method='demonstração', percent=None, biased=True)
+        
+        return {**result, 'sample': sample, 'query': query}
+    
     def get_table_data(self, table_name: str, limit: int = 50) -> Dict:
         """Busca dados reais de uma tabela específica"""
         if not self.connected:
             return self._execute_demo_query(f"SELECT * FROM {table_name} LIMIT {limit}")
         
+        return self.cache.get_or_load(
+            ('table_data', table_name, limit),
+            lambda: self._load_table_data(table_name, limit),
+            cacheable=lambda result: result['success']
+        )
+    
+    def _load_table_data(self, table_name: str, limit: int) -> Dict:
+        """Carrega as primeiras linhas de uma tabela do Supabase"""
         try:
             start_time = time.time()
             
@@ -1986,23 +5595,115 @@ def get_table_data(self, table_name: str, limit: int = 50) -> Dict:
                 'message': f'Erro ao carregar dados do Supabase: {e}'
             }
     
+    def get_table_page(self, table_name: str, cursor=None, page_size: int = 100) -> Dict:
+        """Uma página de linhas a partir de cursor; a página seguinte é pré-carregada em segundo plano"""
+        if not self.connected:
+            result = self._execute_demo_query(f"SELECT * FROM {table_name} LIMIT {page_size}")
+            return {**result, 'next_cursor': None, 'has_more': False, 'pagination': 'demo'}
+        
+        cacheable = lambda result: result['success']
+        result = self.cache.get_or_load(
+            ('table_page', table_name, cursor, page_size),
+            lambda: self._load_table_page(table_name, cursor, page_size),
+            cacheable=cacheable
+        )
+        
+        if result['success'] and result['has_more']:
+            next_cursor = result['next_cursor']
+            self.cache.prefetch(
+                ('table_page', table_name, next_cursor, page_size),
+                lambda: self._load_table_page(table_name, next_cursor, page_size),
+                cacheable=cacheable
+            )
+        return result
+    
+    def _load_table_page(self, table_name: str, cursor, page_size: int) -> Dict:
+        """Keyset na chave primária quando existe; senão deslocamento (OFFSET / Range do PostgREST)"""
+        start_time = time.time()
+        schema = self.get_table_schema(table_name) or {}
+        primary_key = list(schema.get('primary_key') or [])
+        
+        # PostgREST só filtra keyset de uma coluna; chaves compostas usam Range
+        keyset = bool(primary_key) and (self.native_available or len(primary_key) == 1)
+        pagination = 'keyset' if keyset else 'range'
+        offset = cursor or 0
+        
+        try:
+            if self.native_available:
+                rows = self._fetch_page_native(table_name, primary_key if keyset else [], cursor, offset, page_size + 1)
+            else:
+                query = self.supabase_client.table(table_name).select('*')
+                if keyset:
+                    if cursor is not None:
+                        query = query.gt(primary_key[0], cursor[0])
+                    query = query.order(primary_key[0]).limit(page_size + 1)
+                else:
+                    if primary_key:
+                        # Range sem ORDER BY não tem fronteiras estáveis (linhas repetidas ou puladas);
+                        # "a,b" vira order=a,b (uma única ordenação por todas as colunas da chave)
+                        query = query.order(','.join(primary_key))
+                    query = query.range(offset, offset + page_size)
+                rows = query.execute().data or []
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'data': [],
+                'rows_affected': 0,
+                'execution_time': '0ms',
+                'message': f'Erro ao paginar {table_name}: {e}',
+                'next_cursor': None,
+                'has_more': False,
+                'pagination': pagination
+            }
+        
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = None
+        if has_more:
+            next_cursor = tuple(rows[-1][column] for column in primary_key) if keyset else offset + page_size
+        
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return {
+            'success': True,
+            'data': rows,
+            'rows_affected': len(rows),
+            'execution_time': f"{execution_time}ms",
+            'message': f'Página de {table_name} carregada ({pagination})',
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'pagination': pagination,
+            'key_columns': primary_key if keyset else []
+        }
+    
+    def _fetch_page_native(self, table_name: str, key_columns: List[str], cursor, offset: int, limit: int) -> List[Dict]:
+        """SELECT paginado: WHERE (pk) > (cursor) ORDER BY pk usa o índice da chave primária"""
+        sql = f"SELECT * FROM {quote_identifier(table_name)}"
+        params = []
+        
+        if key_columns:
+            columns = ', '.join(quote_identifier(column) for column in key_columns)
+            if cursor is not None:
+                sql += f" WHERE ({columns}) > ({', '.join(['%s'] * len(key_columns))})"
+                params.extend(cursor)
+            sql += f" ORDER BY {columns} LIMIT {int(limit)}"
+        else:
+            sql += f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        
+        result = self._execute_native_query(sql, params or None)
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return result['data']
+    
     def get_database_metrics(self) -> Dict:
         """Obtém métricas reais do banco Supabase"""
         if not self.connected:
             return self._get_demo_metrics()
         
         try:
-            # Calcular métricas baseadas nas tabelas reais
+            # Calcular métricas baseadas no catálogo já carregado (sem novas requisições)
             total_tables = len(self.real_tables)
-            total_records = 0
-            
-            # Contar registros de cada tabela (limitado para performance)
-            for table in self.real_tables[:5]:  # Limitar a 5 tabelas para não sobrecarregar
-                try:
-                    count = self._get_table_count(table['name'])
-                    total_records += count
-                except:
-                    continue
+            total_records = sum(table.get('rows', 0) for table in self.real_tables)
             
             # Estimar tamanho total
             if total_records > 0:
@@ -2024,19 +5725,95 @@ def get_database_metrics(self) -> Dict:
                 'cache_hit_ratio': random.randint(80, 95)
             }
         
-        except Exception as e:
-            st.error(f"❌ Erro ao buscar métricas: {e}")
-            return self._get_demo_metrics()
+        except Exception as e:
+            st.error(f"❌ Erro ao buscar métricas: {e}")
+            return self._get_demo_metrics()
+    
+    def refresh_tables_incremental(self) -> Dict[str, List[str]]:
+        """Atualiza o catálogo buscando apenas tabelas novas, removidas ou alteradas"""
+        with self._lock:
+            known = {t['name'] for t in self.real_tables}
+            previous_snapshot = dict(self._catalog_snapshot)
+            
+            fingerprint_diff = self._refresh_snapshot_incremental() if self._fingerprints else None
+            if fingerprint_diff is not None:
+                self._catalog_snapshot_at = time.time()
+                discovered = set(self._catalog_snapshot)
+                changed = fingerprint_diff['changed']
+            else:
+                # Sem impressão digital: uma descoberta completa, mas diff por nome/metadados
+                discovered = self._discover_table_names()
+                changed = sorted(n for n in discovered & known
+                                 if n in previous_snapshot and previous_snapshot[n] != self._catalog_snapshot.get(n))
+            
+            diff = {
+                'added': sorted(discovered - known),
+                'dropped': sorted(known - discovered),
+                'changed': changed
+            }
+            for name in diff['dropped'] + diff['changed']:
+                self._exact_counts.pop(name, None)
+                self._counted_tables.discard(name)
+            
+            # Aplicar o diff à lista em memória, preservando as estatísticas das demais
+            self.real_tables = [t for t in self.real_tables if t['name'] not in diff['dropped']]
+            for name in diff['added']:
+                self.real_tables.append({
+                    'name': name,
+                    'schema': 'public',
+                    'rows': 0,
+                    'size': '0 KB',
+                    'last_modified': datetime.now().strftime('%Y-%m-%d'),
+                    'has_indexes': True,
+                    'has_rules': False,
+                    'has_triggers': False
+                })
+            
+            self._apply_catalog_snapshot(self._catalog_snapshot)
+            
+            # Mudança de esquema: novas versões de colunas/metadados
+            if diff['added'] or diff['dropped']:
+                self.catalog_version += 1
+                self._catalog_snapshot_version = self.catalog_version
+                self.cache.invalidate(lambda key: key[0] == 'columns')
+            
+            diff['unchanged'] = len(self.real_tables) - len(diff['added']) - len(diff['changed'])
+        
+        self._update_table_counts()
+        return diff
+    
+    def _discover_table_names(self) -> set:
+        """Executa a cadeia de descoberta sem alterar a lista atual; retorna os nomes"""
+        current_tables = self.real_tables
+        try:
+            self.real_tables = []
+            rows = self._fetch_catalog_snapshot()
+            if rows is not None:
+                self._catalog_snapshot = {row['name']: row for row in rows}
+                self._catalog_snapshot_at = time.time()
+                return set(self._catalog_snapshot)
+            
+            self._discover_via_information_schema()
+            if not self.real_tables:
+                self._discover_via_openapi()
+            if not self.real_tables:
+                self._discover_via_common_tables()
+            return {t['name'] for t in self.real_tables}
+        finally:
+            self.real_tables = current_tables
     
     def refresh_tables(self):
         """Atualiza lista de tabelas com feedback detalhado"""
         if self.connected:
-            with st.spinner("🔍 Redescobrindo todas as tabelas..."):
-                self.real_tables = []  # Limpar lista atual
-                self._discover_real_tables()
+            with st.spinner("🔍 Verificando alterações no catálogo..."):
+                diff = self.refresh_tables_incremental()
             
             if self.real_tables:
-                st.success(f"✅ Lista atualizada! {len(self.real_tables)} tabelas encontradas.")
+                st.success(
+                    f"✅ Lista atualizada! {len(self.real_tables)} tabelas • "
+                    f"{len(diff['added'])} novas, {len(diff['dropped'])} removidas, "
+                    f"{len(diff['changed'])} alteradas, {diff['unchanged']} inalteradas."
+                )
                 
                 # Mostrar resumo das tabelas encontradas
                 with st.expander("📋 Tabelas Descobertas", expanded=False):
@@ -2091,22 +5868,209 @@ def _get_demo_metrics(self):
         }
     
     def backup_table(self, table_name: str) -> Dict:
-        """Simula backup de tabela"""
+        """Copia a tabela para uma tabela de backup (simulado sem conexão nativa)"""
+        backup_name = f"{table_name}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        if self.native_available:
+            result = self.execute_query(
+                f"CREATE TABLE {quote_identifier(backup_name)} AS TABLE {quote_identifier(table_name)}"
+            )
+            if result['success']:
+                self.invalidate_catalog()
+            return {
+                'success': result['success'],
+                'backup_name': backup_name,
+                'message': f'Backup da tabela {table_name} criado em {backup_name}' if result['success'] else result['message']
+            }
+        
         return {
             'success': True,
-            'backup_name': f"{table_name}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'backup_name': backup_name,
             'message': f'Backup simulado da tabela {table_name}'
         }
     
     def optimize_table(self, table_name: str) -> Dict:
-        """Simula otimização de tabela"""
+        """Executa VACUUM ANALYZE na tabela (simulado sem conexão nativa)"""
+        if self.native_available:
+            result = self.execute_query(f"VACUUM ANALYZE {quote_identifier(table_name)}")
+            return {
+                'success': result['success'],
+                'message': f'Tabela {table_name} otimizada (VACUUM ANALYZE)' if result['success'] else result['message']
+            }
+        
         return {
             'success': True,
             'message': f'Tabela {table_name} otimizada (simulado)'
         }
 
-# Instância global do gerenciador de banco
-db_manager = DatabaseManager()
+    def bulk_import(self, table_name: str, chunks, columns: List[str],
+                    column_types: Optional[Dict[str, str]] = None, create_table: bool = False,
+                    truncate: bool = False, defer_indexes: bool = False, progress=None,
+                    timeout: Optional[float] = None) -> Dict:
+        """Carrega lotes de DataFrame na tabela com COPY FROM STDIN em uma única transação.
+        create_table cria a tabela com column_types; defer_indexes remove os índices secundários
+        durante a carga e os recria no final (a tabela fica bloqueada para leitura até o commit).
+        progress(linhas, fração) é chamado a cada lote; timeout limita cada comando (cada lote)."""
+        start_time = time.time()
+
+        if not self.native_available:
+            if create_table or truncate or defer_indexes:
+                return {
+                    'success': False,
+                    'error': 'Criar tabela, truncar e adiar índices exigem conexão PostgreSQL direta',
+                    'rows_affected': 0,
+                    'execution_time': '0ms',
+                    'message': 'Backend nativo indisponível'
+                }
+            return self._bulk_import_rest(table_name, chunks, columns, progress, start_time)
+
+        target = quote_identifier(table_name)
+        column_list = ', '.join(quote_identifier(c) for c in columns)
+        copy_sql = f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+        rows_loaded = 0
+        deferred = []
+
+        try:
+            with self._get_pg_pool().connection() as conn:
+                with conn.cursor() as cursor:
+                    # statement_timeout vale por comando, ou seja, por lote de COPY; lock_timeout
+                    # evita ficar esperando indefinidamente por TRUNCATE/DROP INDEX em tabela em uso
+                    cursor.execute("SET LOCAL statement_timeout = %s", (int((timeout or 0) * 1000),))
+                    cursor.execute("SET LOCAL lock_timeout = %s", (IMPORT_LOCK_TIMEOUT_SECONDS * 1000,))
+
+                    if create_table:
+                        definitions = ', '.join(
+                            f"{quote_identifier(c)} {(column_types or {}).get(c, 'text')}" for c in columns
+                        )
+                        cursor.execute(f"CREATE TABLE {target} ({definitions})")
+                    elif truncate:
+                        cursor.execute(f"TRUNCATE {target}")
+
+                    if defer_indexes and not create_table:
+                        # Índices que não sustentam constraints (PK/UNIQUE/EXCLUDE continuam validando a carga)
+                        cursor.execute("""
+                            SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+                            FROM pg_index i
+                            WHERE i.indrelid = %s::regclass
+                              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+                        """, (target,))
+                        deferred = cursor.fetchall()
+                        for index_name, _ in deferred:
+                            cursor.execute(f"DROP INDEX {index_name}")
+
+                    for chunk, fraction in chunks:
+                        buffer = StringIO()
+                        _prepare_import_chunk(chunk, columns).to_csv(buffer, index=False, header=False)
+                        buffer.seek(0)
+                        cursor.copy_expert(copy_sql, buffer)
+                        rows_loaded += len(chunk)
+                        if progress:
+                            progress(rows_loaded, fraction)
+
+                    # Recriar índices de uma tabela grande pode passar do timeout de um lote
+                    cursor.execute("SET LOCAL statement_timeout = 0")
+                    for _, index_definition in deferred:
+                        cursor.execute(index_definition)
+                    cursor.execute(f"ANALYZE {target}")
+
+        except Exception as e:
+            execution_time = round((time.time() - start_time) * 1000, 2)
+            return {
+                'success': False,
+                'error': str(e).strip(),
+                'rows_affected': 0,
+                'execution_time': f"{execution_time}ms",
+                'message': f'Importação desfeita após {rows_loaded:,} linhas: {str(e).strip()}',
+                'backend': 'postgresql'
+            }
+
+        if create_table:
+            self.invalidate_catalog()
+        else:
+            self._invalidate_after_write(f"INSERT INTO {target}")
+
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return {
+            'success': True,
+            'data': [],
+            'rows_affected': rows_loaded,
+            'execution_time': f"{execution_time}ms",
+            'message': f'{rows_loaded:,} linhas importadas em {table_name} via COPY'
+                       + (f' ({len(deferred)} índice(s) recriados)' if deferred else ''),
+            'backend': 'postgresql'
+        }
+
+    def _bulk_import_rest(self, table_name: str, chunks, columns: List[str], progress, start_time: float) -> Dict:
+        """Importação pelo PostgREST em inserts de IMPORT_REST_BATCH_ROWS linhas (sem transação)"""
+        client = self.supabase_admin or self.supabase_client
+        if not self.connected or client is None:
+            return {
+                'success': False,
+                'error': 'Sem conexão com o banco de dados',
+                'rows_affected': 0,
+                'execution_time': '0ms',
+                'message': 'Importação indisponível no modo demonstração'
+            }
+
+        rows_loaded = 0
+        try:
+            for chunk, fraction in chunks:
+                chunk = _prepare_import_chunk(chunk, columns).astype(object)
+                records = chunk.where(pd.notna(chunk), None).to_dict('records')
+                for start in range(0, len(records), IMPORT_REST_BATCH_ROWS):
+                    batch = records[start:start + IMPORT_REST_BATCH_ROWS]
+                    client.table(table_name).insert(batch, returning='minimal').execute()
+                    rows_loaded += len(batch)
+                if progress:
+                    progress(rows_loaded, fraction)
+        except Exception as e:
+            self._invalidate_after_write(f"INSERT INTO {table_name}")
+            execution_time = round((time.time() - start_time) * 1000, 2)
+            return {
+                'success': False,
+                'error': str(e).strip(),
+                'rows_affected': rows_loaded,
+                'execution_time': f"{execution_time}ms",
+                'message': f'Importação interrompida: {rows_loaded:,} linhas já inseridas',
+                'backend': 'postgrest'
+            }
+
+        self._invalidate_after_write(f"INSERT INTO {table_name}")
+        execution_time = round((time.time() - start_time) * 1000, 2)
+        return {
+            'success': True,
+            'data': [],
+            'rows_affected': rows_loaded,
+            'execution_time': f"{execution_time}ms",
+            'message': f'{rows_loaded:,} linhas importadas em {table_name} via PostgREST',
+            'backend': 'postgrest'
+        }
+
+@st.cache_resource(show_spinner=False)
+def _shared_db_manager_slot() -> Dict:
+    """Referência à instância em cache, para descartá-la sem chamar get_shared_db_manager"""
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def get_shared_db_manager():
+    """Retorna o DatabaseManager único do processo, compartilhado entre sessões e reruns"""
+    manager = DatabaseManager()
+    if manager.has_backend:
+        manager.heartbeat.start()
+    _shared_db_manager_slot()['manager'] = manager
+    return manager
+
+def reset_shared_db_manager():
+    """Descarta o DatabaseManager compartilhado (heartbeat, pool e streams) e cria um novo"""
+    manager = _shared_db_manager_slot().pop('manager', None)
+    if manager is not None:
+        manager.heartbeat.stop()
+        manager._close_pg_pool()
+    get_shared_db_manager.clear()
+    return get_shared_db_manager()
+
+# Instância global do gerenciador de banco (não reconecta a cada rerun)
+db_manager = get_shared_db_manager()
 
 class ProjectManager:
     """Gerenciador de projetos com integração ao Supabase"""
@@ -2122,42 +6086,59 @@ def get_projects(self):
           if not self.db_manager.connected or not self.supabase_admin:
               return self._get_demo_projects()
           
-          # Usar cliente admin para buscar projetos
-          response = self.supabase_admin.table('projetos_analytics').select("""
-              id, nome, descricao, categoria, prioridade, status, tags, membros, 
-              configuracoes, created_at, updated_at, created_by
-          """).eq('status', 'ativo').order('updated_at', desc=True).execute()
-          
-          if response.data:
-              projects = []
-              for proj in response.data:
-                  # Buscar contagem de scripts usando cliente admin
-                  scripts_response = self.supabase_admin.table('scripts_projetos').select(
-                      'id', count='exact'
-                  ).eq('projeto_id', proj['id']).eq('status', 'ativo').execute()
-                  
-                  scripts_count = scripts_response.count if hasattr(scripts_response, 'count') else 0
-                  
-                  projects.append({
-                      'id': proj['id'],
-                      'name': proj['nome'],
-                      'description': proj['descricao'] or '',
-                      'category': proj['categoria'] or 'Outros',
-                      'priority': proj['prioridade'] or 'Média',
-                      'status': proj['status'],
-                      'tags': proj['tags'] or [],
-                      'members': proj['membros'] or [],
-                      'scripts': scripts_count,
-                      'created_at': datetime.fromisoformat(proj['created_at'].replace('Z', '+00:00')) if proj['created_at'] else datetime.now(),
-                      'settings': proj['configuracoes'] or {}
-                  })
-              return projects
-          else:
-              return []
-              
+          return self._cached(('projects',), self._fetch_projects)
+      
       except Exception as e:
           st.error(f"Erro ao carregar projetos do Supabase: {e}")
           return self._get_demo_projects()
+    
+    def _cached(self, key, loader):
+      """Lê pelo cache compartilhado do DatabaseManager (quando disponível)"""
+      cache = getattr(self.db_manager, 'cache', None)
+      if cache is None:
+          return loader()
+      return cache.get_or_load(key, loader)
+    
+    def _invalidate_cache(self, *keys):
+      """Remove entradas de projetos/scripts do cache após escritas"""
+      cache = getattr(self.db_manager, 'cache', None)
+      if cache is not None:
+          cache.invalidate(lambda key: key in keys)
+    
+    def _fetch_projects(self):
+      """Carrega projetos ativos e a contagem de scripts de cada um"""
+      # Usar cliente admin para buscar projetos
+      response = self.supabase_admin.table('projetos_analytics').select("""
+          id, nome, descricao, categoria, prioridade, status, tags, membros, 
+          configuracoes, created_at, updated_at, created_by
+      """).eq('status', 'ativo').order('updated_at', desc=True).execute()
+          
+      if response.data:
+          projects = []
+          for proj in response.data:
+              # Buscar contagem de scripts usando cliente admin
+              scripts_response = self.supabase_admin.table('scripts_projetos').select(
+                  'id', count='exact'
+              ).eq('projeto_id', proj['id']).eq('status', 'ativo').execute()
+                  
+              scripts_count = scripts_response.count if hasattr(scripts_response, 'count') else 0
+                  
+              projects.append({
+                  'id': proj['id'],
+                  'name': proj['nome'],
+                  'description': proj['descricao'] or '',
+                  'category': proj['categoria'] or 'Outros',
+                  'priority': proj['prioridade'] or 'Média',
+                  'status': proj['status'],
+                  'tags': proj['tags'] or [],
+                  'members': proj['membros'] or [],
+                  'scripts': scripts_count,
+                  'created_at': datetime.fromisoformat(proj['created_at'].replace('Z', '+00:00')) if proj['created_at'] else datetime.now(),
+                  'settings': proj['configuracoes'] or {}
+              })
+          return projects
+      else:
+          return []
       
     def create_project(self, project_data):
       """Cria novo projeto no Supabase"""
@@ -2183,6 +6164,7 @@ def create_project(self, project_data):
           response = self.supabase_admin.table('projetos_analytics').insert(insert_data).execute()
           
           if response.data and len(response.data) > 0:
+              self._invalidate_cache(('projects',))
               project_id = response.data[0]['id']
               project_name = response.data[0]['nome']
               return {
@@ -2204,35 +6186,40 @@ def get_project_scripts(self, project_id):
             if not self.db_manager.connected or not self.supabase_client:
                 return self._get_demo_scripts()
             
-            response = self.supabase_client.table('scripts_projetos').select("""
-                id, nome, descricao, sql_content, tipo_script, tags, status, 
-                versao, created_at, updated_at, total_execucoes, ultima_execucao
-            """).eq('projeto_id', project_id).neq('status', 'obsoleto').order('updated_at', desc=True).execute()
-            
-            if response.data:
-                scripts = []
-                for script in response.data:
-                    scripts.append({
-                        'id': script['id'],
-                        'name': script['nome'],
-                        'description': script['descricao'] or '',
-                        'sql_content': script['sql_content'],
-                        'type': script['tipo_script'],
-                        'tags': script['tags'] or [],
-                        'status': script['status'],
-                        'version': script['versao'] or 1,
-                        'executions': script['total_execucoes'] or 0,
-                        'last_execution': script['ultima_execucao'],
-                        'created_at': script['created_at']
-                    })
-                return scripts
-            else:
-                return []
-                
+            return self._cached(('scripts', project_id), lambda: self._fetch_project_scripts(project_id))
+        
         except Exception as e:
             st.error(f"Erro ao buscar scripts: {e}")
             return self._get_demo_scripts()
     
+    def _fetch_project_scripts(self, project_id):
+        """Carrega os scripts não obsoletos de um projeto"""
+        response = self.supabase_client.table('scripts_projetos').select("""
+            id, nome, descricao, sql_content, tipo_script, tags, status, parametros,
+            versao, created_at, updated_at, total_execucoes, ultima_execucao
+        """).eq('projeto_id', project_id).neq('status', 'obsoleto').order('updated_at', desc=True).execute()
+        
+        if response.data:
+            scripts = []
+            for script in response.data:
+                scripts.append({
+                    'id': script['id'],
+                    'name': script['nome'],
+                    'description': script['descricao'] or '',
+                    'sql_content': script['sql_content'],
+                    'type': script['tipo_script'],
+                    'tags': script['tags'] or [],
+                    'parameters': script.get('parametros') or {},
+                    'status': script['status'],
+                    'version': script['versao'] or 1,
+                    'executions': script['total_execucoes'] or 0,
+                    'last_execution': script['ultima_execucao'],
+                    'created_at': script['created_at']
+                })
+            return scripts
+        else:
+            return []
+    
     def create_script(self, project_id, script_data):
         """Cria novo script para um projeto"""
         try:
@@ -2256,6 +6243,7 @@ def create_script(self, project_id, script_data):
             response = self.supabase_client.table('scripts_projetos').insert(insert_data).execute()
             
             if response.data and len(response.data) > 0:
+                self._invalidate_cache(('projects',), ('scripts', project_id))
                 return {
                     'success': True, 
                     'script_id': response.data[0]['id'], 
@@ -2267,17 +6255,51 @@ def create_script(self, project_id, script_data):
         except Exception as e:
             return {'success': False, 'message': f'❌ Erro ao criar script: {str(e)}'}
     
-    def execute_script(self, script_id, project_id, sql_content, parameters=None):
-        """Executa um script e salva o resultado"""
+    def execute_script(self, script_id, project_id, sql_content, parameters=None, commit_each=False,
+                       declared_parameters=None):
+        """Executa um script comando a comando e salva o resultado.
+        parameters são os valores informados para os ":nome" declarados em declared_parameters."""
         try:
+            try:
+                bound = bind_script_parameters(sql_content, declared_parameters, parameters)
+            except ValueError as e:
+                return {'success': False, 'error': str(e), 'message': f'Parâmetros inválidos: {e}'}
+            parameters = {
+                name: value.isoformat() if isinstance(value, (date, datetime)) else
+                      str(value) if isinstance(value, Decimal) else value
+                for name, (_, value) in bound.items()
+            }
+            
             start_time = time.time()
             
-            # Executar o script SQL
-            result = self.db_manager.execute_query(sql_content)
+            # Executar o script SQL (statement_timeout do servidor = timeout de query)
+            statements = split_sql_statements(sql_content)
+            if hasattr(self.db_manager, 'execute_statements'):
+                result = self.db_manager.execute_statements(
+                    statements,
+                    commit_each=commit_each,
+                    timeout=get_query_timeout(),
+                    parameters=bound,
+                    prepare=True
+                )
+            else:
+                result = self.db_manager.execute_query(sql_content, timeout=get_query_timeout())
             
             end_time = time.time()
             execution_time = end_time - start_time
             
+            # Script lento: o plano capturado é o do comando mais demorado, com os valores inline
+            if hasattr(self.db_manager, 'log_slow_query') and result.get('statements'):
+                slowest = max((e for e in result['statements'] if e['status'] != 'ignorado'),
+                              key=lambda e: e['execution_ms'])
+                self.db_manager.log_slow_query(
+                    sql_content, execution_time * 1000, result, source='script',
+                    user=st.session_state.get('username') or None, parameters=parameters,
+                    explain_sql=_rewrite_script_parameters(
+                        statements[slowest['index'] - 1], lambda m: sql_literal(bound[m.group(1)][1])
+                    )
+                )
+            
             # Salvar histórico de execução no Supabase se conectado
             if self.db_manager.connected and self.supabase_client:
                 execution_data = {
@@ -2285,9 +6307,13 @@ def execute_script(self, script_id, project_id, sql_content, parameters=None):
                     'projeto_id': project_id,
                     'status': 'sucesso' if result['success'] else 'erro',
                     'resultado': {
-                        'data': result.get('data', [])[:100] if result.get('data') else [],  # Limitar dados salvos
+                        # Limitar dados salvos; to_json converte datas e decimais para JSON válido
+                        'data': json.loads(frame_to_json_records(result_frame(result).head(100), date_format='iso'))
+                                if result_has_rows(result) else [],
                         'rows_affected': result.get('rows_affected', 0),
-                        'execution_time': f"{execution_time:.2f}s"
+                        'execution_time': f"{execution_time:.2f}s",
+                        'commit_por_comando': commit_each,
+                        'comandos': result.get('statements', [])
                     },
                     'tempo_execucao': f"{execution_time} seconds",
                     'registros_afetados': result.get('rows_affected', 0),
@@ -2305,6 +6331,9 @@ def execute_script(self, script_id, project_id, sql_content, parameters=None):
                             'ultima_execucao': 'now()',
                             'total_execucoes': script_id  # Será incrementado via trigger ou função
                         }).eq('id', script_id).execute()
+                    
+                    # Estatísticas de execução mudaram
+                    self._invalidate_cache(('scripts', project_id))
                         
                 except Exception as e:
                     st.warning(f"Erro ao salvar execução: {e}")
@@ -2586,6 +6615,7 @@ def render_sidebar():
             "🗃️ Tabelas": "tables", 
             "📜 Editor SQL": "sql_editor",
             "🔧 Operações DBA": "dba_operations",
+            "📥 Importar Dados": "data_import",
             "📁 Projetos": "projects",
             "🤖 Dúvida (IA)": "ai_assistant",
             "⚙️ Configurações": "settings"
@@ -2612,6 +6642,10 @@ def render_sidebar():
         </div>
         """, unsafe_allow_html=True)
         
+        if getattr(db_manager, 'native_password_missing', False):
+            st.warning("⚠️ PostgreSQL direto sem senha: usando Supabase REST. Informe a senha em "
+                       "Configurações ou use secrets/PGPASSWORD.")
+        
         # Métricas rápidas
         metrics = db_manager.get_database_metrics()
         cpu_usage = metrics.get('cpu_usage', 50)
@@ -2647,7 +6681,7 @@ def get_table_policies(self, table_name):
             return self._get_demo_table_policies(table_name)
         
         # Para Supabase, usar a API REST para buscar políticas
-        import requests
+        http = get_http_transport()
         
         # Tentar buscar políticas via função RPC do Supabase
         try:
@@ -2663,7 +6697,7 @@ def get_table_policies(self, table_name):
             # Payload com nome da tabela
             payload = {'table_name_param': table_name}
             
-            response = requests.post(policies_url, headers=headers, json=payload, timeout=10)
+            response = http.post(policies_url, headers=headers, json=payload, timeout=10, retry=True)
             
             if response.status_code == 200:
                 policies_data = response.json()
@@ -2701,7 +6735,7 @@ def get_table_policies(self, table_name):
             
             payload = {'sql_query': sql_query}
             
-            response = requests.post(sql_url, headers=headers, json=payload, timeout=10)
+            response = http.post(sql_url, headers=headers, json=payload, timeout=10)
             
             if response.status_code == 200:
                 result_data = response.json()
@@ -3150,7 +7184,7 @@ def test_table_access(table_name, db_manager):
             
             if st.button(f"▶️ Executar {test['name']}", key=f"test_{test['name']}"):
                 with st.spinner(f"Executando {test['name']}..."):
-                    result = db_manager.execute_query(test['query'])
+                    result = db_manager.execute_query(test['query'], use_cache=False)
                     
                     if result['success']:
                         st.success(f"✅ {test['name']} executado com sucesso!")
@@ -3247,10 +7281,16 @@ def render_dashboard():
         connection_status = "🟢 Online" if db_manager.connected else "🔴 Offline"
         st.metric("Status", connection_status)
     
+    heartbeat_stats = db_manager.heartbeat.get_stats() if hasattr(db_manager, 'heartbeat') else None
+    
     with col2:
-        # Simular latência
-        latency = random.randint(15, 85)
-        st.metric("Latência", f"{latency}ms", delta=f"{random.randint(-5, 5)}ms")
+        # Latência real medida pelo heartbeat (p50, com p95 no delta)
+        if heartbeat_stats and heartbeat_stats['p50_ms'] is not None:
+            st.metric("Latência", f"{heartbeat_stats['p50_ms']}ms",
+                      delta=f"p95 {heartbeat_stats['p95_ms']}ms", delta_color="off",
+                      help=f"Heartbeat: {heartbeat_stats['samples']} amostras, circuito {heartbeat_stats['state']}")
+        else:
+            st.metric("Latência", "N/A", help="Aguardando o primeiro heartbeat")
     
     with col3:
         # Pool de conexões
@@ -3275,14 +7315,14 @@ def render_dashboard():
     with col1:
         st.markdown("#### 📊 Métricas de Performance")
         
-        # Gráfico de latência
-        latency_data = pd.DataFrame({
-            'Timestamp': pd.date_range(start=datetime.now() - timedelta(hours=2), periods=20, freq='6min'),
-            'Latência (ms)': [random.randint(10, 100) for _ in range(20)]
-        })
+        # Gráfico de latência (amostras reais do heartbeat; falhas ficam como lacunas)
+        if heartbeat_stats and heartbeat_stats['timeline']:
+            latency_data = pd.DataFrame(heartbeat_stats['timeline'], columns=['Timestamp', 'Latência (ms)'])
+        else:
+            latency_data = pd.DataFrame({'Timestamp': [], 'Latência (ms)': []})
         
         fig_latency = px.line(latency_data, x='Timestamp', y='Latência (ms)', 
-                             title="Latência da Conexão (Últimas 2 horas)")
+                             title="Latência da Conexão (Heartbeat)")
         fig_latency.update_layout(height=300, 
                                  xaxis_title="Hora",
                                  yaxis_title="Latência (ms)")
@@ -3333,6 +7373,47 @@ def render_dashboard():
     if db_manager.connected:
         tables = db_manager.get_tables()
         
+        # Snapshot do catálogo: todos os metadados em uma única consulta
+        catalog_snapshot = db_manager.get_catalog_snapshot()
+        
+        # Tabelas fora do snapshot: buscar detalhes em paralelo (concorrência limitada)
+        existing_rows_by_table = {
+            (t['name'] if isinstance(t, dict) else t): (t.get('rows', 0) if isinstance(t, dict) else 0)
+            for t in tables
+        }
+        count_failed = {t['name'] for t in tables if isinstance(t, dict) and t.get('count_failed_at')}
+        fallback_names = [name for name in existing_rows_by_table if name not in catalog_snapshot]
+        
+        def fetch_table_details(table_name):
+            # Roda em thread do pool, sem ScriptRunContext: nenhuma mensagem de status do gerenciador
+            with (db_manager.quiet_status() if hasattr(db_manager, 'quiet_status') else nullcontext()):
+                existing_rows = existing_rows_by_table[table_name]
+                if existing_rows > 0 or table_name in count_failed:
+                    row_count = existing_rows
+                else:
+                    row_count = db_manager.get_table_row_count(table_name)
+                return (
+                    row_count,
+                    db_manager.get_table_size_mb(table_name),
+                    db_manager.get_table_last_modified(table_name)
+                )
+        
+        fallback_details = {}
+        if fallback_names:
+            db_settings = st.session_state.user_settings.get('database', {}) if 'user_settings' in st.session_state else {}
+            details_progress = st.progress(0, text="📊 Carregando detalhes das tabelas...")
+            fallback_details, failed_tables = run_bounded_concurrently(
+                fetch_table_details,
+                fallback_names,
+                max_workers=db_settings.get('count_concurrency', 8),
+                item_timeout=db_settings.get('count_timeout', 10),
+                on_progress=lambda done, total: details_progress.progress(done / total)
+            )
+            details_progress.empty()
+            
+            if failed_tables:
+                st.caption(f"⚠️ Detalhes parciais: {len(failed_tables)} tabela(s) não responderam a tempo")
+        
         # Criar dados detalhados para cada tabela
         table_details = []
         for table in tables:
@@ -3344,37 +7425,62 @@ def render_dashboard():
                 table_name = table
                 existing_rows = 0
             
-            # Usar contagem existente ou buscar nova
-            row_count = existing_rows if existing_rows > 0 else db_manager.get_table_row_count(table_name)
+            entry = catalog_snapshot.get(table_name)
+            if entry:
+                last_maintenance = entry.get('last_vacuum') or entry.get('last_analyze')
+                table_details.append({
+                    'Tabela': table_name,
+                    'Registros': format_row_count(
+                        table.get('rows', entry.get('row_estimate')) if isinstance(table, dict) else entry.get('row_estimate'),
+                        table.get('rows_estimated', True) if isinstance(table, dict) else True
+                    ),
+                    'Tamanho': f"{int(entry.get('total_bytes') or 0) / 1024 / 1024:.1f} MB",
+                    # Catálogo não registra a última escrita: o sinal disponível é o último VACUUM/ANALYZE
+                    'Última Manutenção': str(last_maintenance)[:16] if last_maintenance else 'Nunca',
+                    'Índices': int(entry.get('index_count') or 0),
+                    'RLS Ativo': '✅ Sim' if entry.get('rls_enabled') else '❌ Não',
+                    'Backup': random.choice(['✅ Ok', '⚠️ Pendente']),
+                    'Crescimento/dia': f"+{random.randint(5, 50)} registros"
+                })
+                continue
             
-            # Obter outras informações
-            table_size = db_manager.get_table_size_mb(table_name)
-            last_modified = db_manager.get_table_last_modified(table_name)
+            # Detalhes buscados em paralelo (tabelas que expiraram ficam com valores parciais)
+            if table_name in fallback_details:
+                row_count, table_size, last_modified = fallback_details[table_name]
+                last_modified_display = last_modified.strftime('%d/%m/%Y %H:%M')
+            else:
+                row_count, table_size, last_modified_display = existing_rows, 0.0, 'N/A'
             
             # Simular dados adicionais
             table_details.append({
                 'Tabela': table_name,
-                'Registros': f"{row_count:,}",
+                'Registros': 'N/D' if table_name in count_failed else f"{row_count:,}",
                 'Tamanho': f"{table_size:.1f} MB",
-                'Última Modificação': last_modified.strftime('%d/%m/%Y %H:%M'),
+                'Último Registro': last_modified_display,
                 'Índices': random.randint(1, 5),
                 'RLS Ativo': random.choice(['✅ Sim', '❌ Não']),
                 'Backup': random.choice(['✅ Ok', '⚠️ Pendente']),
                 'Crescimento/dia': f"+{random.randint(5, 50)} registros"
             })
         
-        df_tables = pd.DataFrame(table_details)
+        # Tabelas do snapshot têm a última manutenção; as do fallback, o registro mais recente
+        df_tables = pd.DataFrame(table_details).fillna('—')
         
         # Mostrar tabela com mais colunas
         st.dataframe(df_tables, use_container_width=True)
         
+        if any(detail['Registros'].startswith('~') for detail in table_details):
+            st.caption("~ indica estimativa do planejador. Use \"🔢 Contar Exato\" na página de tabelas para a contagem precisa.")
+        
         # Resumo das tabelas
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             # Calcular total de registros usando os dados da tabela
-            total_records = sum([int(detail['Registros'].replace(',', '')) for detail in table_details])
-            st.metric("Total de Registros", f"{total_records:,}")
+            total_records = sum([int(detail['Registros'].replace(',', '').lstrip('~'))
+                                 for detail in table_details if detail['Registros'] != 'N/D'])
+            has_estimates = any(detail['Registros'].startswith('~') for detail in table_details)
+            st.metric("Total de Registros", format_row_count(total_records, has_estimates))
         
         with col2:
             # Calcular tamanho médio
@@ -3709,7 +7815,7 @@ def render_dashboard():
     with action_col1:
         if st.button("🔄 Reiniciar Conexão", use_container_width=True):
             with st.spinner("Reiniciando conexão..."):
-                time.sleep(2)
+                db_manager.reconnect()
             st.success("✅ Conexão reiniciada!")
             log_activity("Conexão com Supabase reiniciada")
     
@@ -3878,7 +7984,7 @@ def render_tables():
                     st.session_state.current_page = 'sql_editor'
                     st.rerun()
                 if st.button("🔄 Reiniciar Conexão", use_container_width=True):
-                    db_manager._init_connection()
+                    db_manager.reconnect()
                     st.success("✅ Conexão reiniciada!")
                 if st.button("📋 Copiar Lista", use_container_width=True):
                     tables = db_manager.get_tables()
@@ -3937,7 +8043,7 @@ def render_tables():
         with action_col2:
             if st.button("🔄 Tentar Reconectar", use_container_width=True):
                 with st.spinner("Reconectando..."):
-                    db_manager._init_connection()
+                    db_manager.reconnect()
                 st.rerun()
         
         with action_col3:
@@ -4080,6 +8186,11 @@ def render_tables():
     
     st.markdown("---")
     
+    # Navegação paginada da tabela aberta com "Visualizar"
+    if st.session_state.get('table_browser'):
+        render_table_browser(db_manager)
+        st.markdown("---")
+    
     # Exibir tabelas com base no modo de visualização
     if filtered_tables:
         tab1, tab2, tab3, tab4 = st.tabs(["📋 Visualização Principal", "📊 Análise Detalhada", "🔧 Operações em Lote", "📈 Insights"])
@@ -4142,7 +8253,7 @@ def render_tables_card_view(filtered_tables, db_manager):
                         {status_icon} {table['name']}
                     </h3>
                     <p style='color: #228B22; margin: 0.2rem 0 0 0; font-size: 0.9rem;'>
-                        📂 {table.get('schema', 'public')} • 📊 {table.get('rows', 0):,} registros
+                        📂 {table.get('schema', 'public')} • 📊 {format_row_count(table.get('rows', 0), table.get('rows_estimated', False))} registros
                     </p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -4172,7 +8283,7 @@ def render_tables_card_view(filtered_tables, db_manager):
                 ("🗂️ Índices", table.get('has_indexes', False)),
                 ("📋 Regras", table.get('has_rules', False)),
                 ("⚡ Triggers", table.get('has_triggers', False)),
-                ("🛡️ RLS", random.choice([True, False]))  # Simulated
+                ("🛡️ RLS", table['rls_enabled'] if 'rls_enabled' in table else random.choice([True, False]))  # Simulated sem snapshot
             ]
             
             for j, (resource_col, (label, has_resource)) in enumerate(zip([resources_col1, resources_col2, resources_col3, resources_col4], resources)):
@@ -4189,7 +8300,7 @@ def render_tables_card_view(filtered_tables, db_manager):
             # Botões de ação organizados
             st.markdown("<div style='padding: 0 1.5rem 1.5rem 1.5rem;'>", unsafe_allow_html=True)
             
-            action_col1, action_col2, action_col3, action_col4, action_col5, action_col6 = st.columns(6)
+            action_col1, action_col2, action_col3, action_col4, action_col5, action_col6, action_col7 = st.columns(7)
             
             actions = [
                 ("👁️", "Visualizar", "primary"),
@@ -4197,10 +8308,11 @@ def render_tables_card_view(filtered_tables, db_manager):
                 ("📊", "Análise", "secondary"),
                 ("💾", "Backup", "secondary"),
                 ("⚡", "Otimizar", "secondary"),
-                ("🔧", "SQL", "secondary")
+                ("🔧", "SQL", "secondary"),
+                ("🔢", "Contar Exato", "secondary")
             ]
             
-            for k, (action_col, (icon, label, btn_type)) in enumerate(zip([action_col1, action_col2, action_col3, action_col4, action_col5, action_col6], actions)):
+            for k, (action_col, (icon, label, btn_type)) in enumerate(zip([action_col1, action_col2, action_col3, action_col4, action_col5, action_col6, action_col7], actions)):
                 with action_col:
                     button_key = f"{label.lower()}_{table['name']}_{i}"
                     if st.button(f"{icon}", key=button_key, help=label, use_container_width=True):
@@ -4239,7 +8351,7 @@ def render_tables_table_view(filtered_tables, db_manager):
             "Status": status,
             "Nome": table['name'],
             "Schema": table.get('schema', 'public'),
-            "Registros": f"{rows:,}",
+            "Registros": format_row_count(rows, table.get('rows_estimated', False)),
             "Tamanho": table.get('size', 'N/A'),
             "Recursos": " ".join(resources) if resources else "—",
             "Modificado": table.get('last_modified', 'N/A'),
@@ -4368,7 +8480,7 @@ def render_tables_compact_view(filtered_tables, db_manager):
                         📊 {table['name']}
                     </div>
                     <div style='color: #666; font-size: 0.8rem;'>
-                        {rows:,} registros<br>
+                        {format_row_count(rows, table.get('rows_estimated', False))} registros<br>
                         {table.get('size', 'N/A')}
                     </div>
                 </div>
@@ -4387,76 +8499,113 @@ def render_tables_compact_view(filtered_tables, db_manager):
                         st.session_state.sql_query = f"SELECT * FROM {table['name']} LIMIT 10;"
                         st.rerun()
 
-def handle_table_action(action, table, db_manager, index):
-    """Manipula ações das tabelas de forma centralizada"""
-    table_name = table['name']
+def render_table_browser(db_manager):
+    """Navegação página a página da tabela selecionada (keyset na chave primária)"""
+    browser = st.session_state.table_browser
+    table_name = browser['table']
+    page_index = len(browser['cursors']) - 1
     
-    if action == 'visualizar':
-        with st.spinner(f"🔍 Carregando dados de {table_name}..."):
-            result = db_manager.get_table_data(table_name, limit=100)
+    st.markdown(f"### 👁️ Navegando: {table_name}")
+    
+    with st.spinner(f"🔍 Carregando dados de {table_name}..."):
+        result = db_manager.get_table_page(table_name, browser['cursors'][-1], browser['page_size'])
+    
+    nav_col1, nav_col2, nav_col3, nav_col4 = st.columns([1, 1, 2, 1])
+    
+    with nav_col1:
+        if st.button("⬅️ Anterior", disabled=page_index == 0, use_container_width=True, key="browser_prev"):
+            browser['cursors'].pop()
+            st.rerun()
+    
+    with nav_col2:
+        if st.button("➡️ Próxima", disabled=not result.get('has_more'), use_container_width=True, key="browser_next"):
+            browser['cursors'].append(result['next_cursor'])
+            st.rerun()
+    
+    with nav_col3:
+        first_row = page_index * browser['page_size'] + 1
+        mode = "keyset por " + ", ".join(result.get('key_columns') or []) if result.get('pagination') == 'keyset' else "deslocamento"
+        st.caption(
+            f"📄 Página {page_index + 1} · linhas {first_row}–{first_row + len(result.get('data') or []) - 1} · "
+            f"paginação {mode}"
+        )
+    
+    with nav_col4:
+        if st.button("✖️ Fechar", use_container_width=True, key="browser_close"):
+            st.session_state.table_browser = None
+            st.rerun()
+    
+    if result['success'] and result['data']:
+        st.success(f"✅ Dados de {table_name} carregados!")
         
-        if result['success'] and result['data']:
-            st.success(f"✅ Dados de {table_name} carregados!")
-            
-            df_data = pd.DataFrame(result['data'])
-            
-            # Informações resumidas
-            info_col1, info_col2, info_col3 = st.columns(3)
-            with info_col1:
-                st.metric("📊 Registros", len(df_data))
-            with info_col2:
-                st.metric("📋 Colunas", len(df_data.columns))
-            with info_col3:
-                st.metric("⏱️ Tempo", result['execution_time'])
+        df_data = pd.DataFrame(result['data'])
+        
+        # Informações resumidas
+        info_col1, info_col2, info_col3 = st.columns(3)
+        with info_col1:
+            st.metric("📊 Registros", len(df_data))
+        with info_col2:
+            st.metric("📋 Colunas", len(df_data.columns))
+        with info_col3:
+            st.metric("⏱️ Tempo", result['execution_time'])
+        
+        # Dados com controles
+        st.markdown("#### 📊 Preview dos Dados")
+        
+        preview_col1, preview_col2 = st.columns([3, 1])
+        
+        with preview_col1:
+            st.dataframe(df_data, use_container_width=True, height=400)
+        
+        with preview_col2:
+            st.markdown("**💾 Exportar:**")
             
-            # Dados com controles
-            st.markdown("#### 📊 Preview dos Dados")
+            # CSV
+            csv_data = df_data.to_csv(index=False)
+            st.download_button(
+                "📄 CSV",
+                csv_data,
+                f"{table_name}_pagina_{page_index + 1}.csv",
+                "text/csv",
+                use_container_width=True
+            )
             
-            preview_col1, preview_col2 = st.columns([3, 1])
+            # JSON
+            json_data = frame_to_json_records(df_data, indent=2)
+            st.download_button(
+                "📋 JSON",
+                json_data,
+                f"{table_name}_pagina_{page_index + 1}.json",
+                "application/json",
+                use_container_width=True
+            )
             
-            with preview_col1:
-                st.dataframe(df_data, use_container_width=True, height=400)
+            # Excel
+            excel_buffer = io.BytesIO()
+            with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+                df_data.to_excel(writer, sheet_name=table_name[:31], index=False)
             
-            with preview_col2:
-                st.markdown("**💾 Exportar:**")
-                
-                # CSV
-                csv_data = df_data.to_csv(index=False)
-                st.download_button(
-                    "📄 CSV",
-                    csv_data,
-                    f"{table_name}_data.csv",
-                    "text/csv",
-                    use_container_width=True
-                )
-                
-                # JSON
-                json_data = df_data.to_json(orient='records', indent=2)
-                st.download_button(
-                    "📋 JSON",
-                    json_data,
-                    f"{table_name}_data.json",
-                    "application/json",
-                    use_container_width=True
-                )
-                
-                # Excel
-                excel_buffer = io.BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-                    df_data.to_excel(writer, sheet_name=table_name[:31], index=False)
-                
-                st.download_button(
-                    "📊 Excel",
-                    excel_buffer.getvalue(),
-                    f"{table_name}_data.xlsx",
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-        
-        elif result['success'] and not result['data']:
-            st.info(f"📭 A tabela {table_name} está vazia")
-        else:
-            st.error(f"❌ Erro: {result.get('message', 'Erro desconhecido')}")
+            st.download_button(
+                "📊 Excel",
+                excel_buffer.getvalue(),
+                f"{table_name}_pagina_{page_index + 1}.xlsx",
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
+    
+    elif result['success'] and not result['data']:
+        st.info(f"📭 A tabela {table_name} está vazia")
+    else:
+        st.error(f"❌ Erro: {result.get('message', 'Erro desconhecido')}")
+
+def handle_table_action(action, table, db_manager, index):
+    """Manipula ações das tabelas de forma centralizada"""
+    table_name = table['name']
+    
+    if action == 'visualizar':
+        # Navegação paginada persistente entre reruns (ver render_table_browser)
+        st.session_state.table_browser = {'table': table_name, 'cursors': [None], 'page_size': 100}
+        st.rerun()
     
     elif action == 'estrutura':
         with st.spinner(f"🔍 Analisando estrutura de {table_name}..."):
@@ -4481,13 +8630,87 @@ def handle_table_action(action, table, db_manager, index):
                 st.metric("❓ Colunas Nulas", nullable_count)
             
             with stats_col3:
-                key_count = len([c for c in columns if 'id' in c.get('name', '').lower()])
-                st.metric("🗂️ Possíveis Chaves", key_count)
+                table_schema = db_manager.get_table_schema(table_name) if hasattr(db_manager, 'get_table_schema') else None
+                if table_schema:
+                    st.metric("🔑 Chave Primária", ", ".join(table_schema['primary_key']) or "—")
+                else:
+                    key_count = len([c for c in columns if 'id' in c.get('name', '').lower()])
+                    st.metric("🗂️ Possíveis Chaves", key_count)
+            
+            if table_schema and table_schema['foreign_keys']:
+                st.markdown("**🔗 Chaves Estrangeiras:**")
+                for fk in table_schema['foreign_keys']:
+                    st.code(f"{fk['name']}: {fk['definition']}", language='sql')
+            
+            if table_schema and table_schema['indexes']:
+                st.markdown("**🗂️ Índices:**")
+                for index in table_schema['indexes']:
+                    st.code(index['definition'], language='sql')
         else:
             st.warning(f"⚠️ Não foi possível carregar a estrutura de {table_name}")
     
+    elif action == 'contar exato':
+        with st.spinner(f"🔢 Contando registros de {table_name} (contagem exata)..."):
+            try:
+                start_time = time.time()
+                exact_rows = db_manager.count_table_exact(table_name)
+                elapsed = round((time.time() - start_time) * 1000, 2)
+            except Exception as e:
+                st.error(f"❌ Erro na contagem exata de {table_name}: {e}")
+                return
+        
+        previous_rows = table.get('rows', 0)
+        st.success(f"✅ {table_name}: {exact_rows:,} registros (contagem exata em {elapsed}ms)")
+        if table.get('rows_estimated') and previous_rows != exact_rows:
+            st.caption(f"Estimativa anterior: ~{previous_rows:,} (diferença de {exact_rows - previous_rows:+,})")
+        log_activity("Contagem exata", table_name)
+    
     # Implementar outras ações...
 
+def sampled_table_for_query(sql_query: str) -> Optional[str]:
+    """Tabela de uma query de prévia (SELECT * FROM t [LIMIT n] [OFFSET n]), cujo perfil pode vir de amostra"""
+    match = re.fullmatch(r'select \* from ([\w."]+)(?: limit \d+)?(?: offset \d+)?;?', normalize_sql(sql_query or ''))
+    return match.group(1).split('.')[-1].strip('"') if match else None
+
+def render_table_sample_profile(result: Dict):
+    """Perfil das colunas calculado sobre uma amostra TABLESAMPLE da tabela inteira (db_manager.sample_table)"""
+    if not result['success']:
+        st.error(f"❌ Erro na amostragem: {result.get('error', 'Erro desconhecido')}")
+        return
+    
+    df_sample = result_frame(result)
+    sample = result['sample']
+    if sample['biased']:
+        st.warning("⚠️ Sem SQL real disponível (conexão PostgreSQL direta ou RPC execute_sql): "
+                   "perfil calculado sobre as primeiras linhas, que podem não representar a tabela")
+    elif sample['method'] == 'completa':
+        st.caption(f"📋 {sample['table']}: tabela pequena, perfil sobre todas as {len(df_sample):,} linhas")
+    elif sample['method'] == 'aleatória':
+        st.caption(f"🎲 {sample['table']}: tamanho desconhecido, {len(df_sample):,} linhas sorteadas "
+                   f"da tabela inteira (ORDER BY random())")
+    else:
+        st.caption(f"🎲 {sample['table']} TABLESAMPLE {sample['method']} ({sample['percent']}%): "
+                   f"{len(df_sample):,} linhas sorteadas de ~{sample['table_rows']:,}")
+    
+    if df_sample.empty:
+        st.info("📭 A amostra não retornou linhas")
+        return
+    
+    render_data_statistics(df_sample)
+    
+    st.write("**Informações Gerais:**")
+    st.write(df_sample.describe(include='all'))
+    
+    numeric_columns = list(df_sample.select_dtypes(include='number').columns)
+    if numeric_columns:
+        chart_cols = st.columns(min(len(numeric_columns), 2))
+        for i, column in enumerate(numeric_columns[:4]):
+            with chart_cols[i % len(chart_cols)]:
+                fig = px.histogram(df_sample, x=column, nbins=30, title=f"Distribuição de {column}",
+                                   color_discrete_sequence=['#2E8B57'])
+                fig.update_layout(height=300)
+                st.plotly_chart(fig, use_container_width=True)
+
 def render_tables_detailed_analysis(filtered_tables):
     """Renderiza análise detalhada das tabelas"""
     st.subheader("📊 Análise Detalhada das Tabelas")
@@ -4581,6 +8804,31 @@ def render_tables_detailed_analysis(filtered_tables):
     df_analysis = pd.DataFrame(advanced_analysis)
     st.dataframe(df_analysis, use_container_width=True)
     
+    # Perfil de dados por amostragem da tabela inteira
+    if hasattr(db_manager, 'sample_table'):
+        st.markdown("#### 🎲 Perfil por Amostragem")
+        
+        sample_col1, sample_col2, sample_col3 = st.columns(3)
+        with sample_col1:
+            sample_table = st.selectbox("Tabela:", [t['name'] for t in filtered_tables], key="sample_profile_table")
+        with sample_col2:
+            sample_method = st.selectbox(
+                "Método:", ['auto', 'SYSTEM', 'BERNOULLI'], key="sample_profile_method",
+                help="SYSTEM sorteia páginas (lê poucas, mais rápido); BERNOULLI sorteia linhas (mais uniforme, "
+                     "percorre a tabela). Automático usa SYSTEM a partir de 100 mil linhas."
+            )
+        with sample_col3:
+            sample_rows = st.number_input("Linhas na amostra:", min_value=100, max_value=100000,
+                                          value=SAMPLE_TARGET_ROWS, step=500, key="sample_profile_rows")
+        
+        if st.button("🎲 Gerar Perfil", key="sample_profile_run"):
+            with st.spinner(f"🎲 Amostrando {sample_table}..."):
+                st.session_state.sample_profile = db_manager.sample_table(sample_table, int(sample_rows), sample_method)
+        
+        # A amostra fica na sessão: reruns da página não voltam a consultar o banco
+        if st.session_state.get('sample_profile'):
+            render_table_sample_profile(st.session_state.sample_profile)
+    
     # Insights automáticos
     st.markdown("#### 💡 Insights Automáticos")
     
@@ -4911,12 +9159,20 @@ def execute_batch_export(selected_tables, db_manager):
             progress_bar.progress((i + 1) / len(selected_tables))
             
             try:
-                result = db_manager.get_table_data(table_name, limit=max_records)
+                if getattr(db_manager, 'native_available', False):
+                    # Backend nativo: resultado lido direto em colunas, sem um dict por linha
+                    result = db_manager.execute_query(
+                        f"SELECT * FROM {quote_identifier(table_name)} LIMIT {int(max_records)}",
+                        use_cache=False, columnar=True
+                    )
+                else:
+                    result = db_manager.get_table_data(table_name, limit=max_records)
                 
-                if result['success'] and result['data']:
+                if result['success'] and result_has_rows(result):
+                    df_table = result_frame(result)
                     export_data[table_name] = {
-                        'data': result['data'],
-                        'count': len(result['data']),
+                        'frame': df_table,
+                        'count': len(df_table),
                         'execution_time': result['execution_time']
                     }
                     successful_exports += 1
@@ -4936,22 +9192,19 @@ def execute_batch_export(selected_tables, db_manager):
             # Gerar arquivo baseado no formato
             if export_format == "JSON Consolidado":
                 # Preparar dados para JSON
-                json_export = {
-                    'metadata': {
-                        'exported_at': datetime.now().isoformat(),
-                        'tables_count': len(export_data),
-                        'total_records': sum([info['count'] for info in export_data.values()])
-                    },
-                    'tables': {}
+                metadata = {
+                    'exported_at': datetime.now().isoformat(),
+                    'tables_count': len(export_data),
+                    'total_records': sum([info['count'] for info in export_data.values()])
                 }
                 
-                for table_name, info in export_data.items():
-                    json_export['tables'][table_name] = {
-                        'count': info['count'],
-                        'data': info['data']
-                    }
-                
-                json_str = json.dumps(json_export, indent=2, default=str)
+                # Dados de cada tabela serializados direto das colunas, sem um dict por linha
+                tables_json = ',\n'.join(
+                    f'{json.dumps(table_name)}: {{"count": {info["count"]}, '
+                    f'"data": {frame_to_json_records(info["frame"], date_format="iso")}}}'
+                    for table_name, info in export_data.items()
+                )
+                json_str = f'{{"metadata": {json.dumps(metadata, indent=2)},\n"tables": {{{tables_json}}}}}'
                 
                 st.download_button(
                     "📥 Download JSON Consolidado",
@@ -4979,10 +9232,9 @@ def execute_batch_export(selected_tables, db_manager):
                     
                     # Abas de dados
                     for table_name, info in export_data.items():
-                        if info['data']:
-                            df_table = pd.DataFrame(info['data'])
+                        if info['count']:
                             sheet_name = table_name[:31]  # Limite do Excel
-                            df_table.to_excel(writer, sheet_name=sheet_name, index=False)
+                            info['frame'].to_excel(writer, sheet_name=sheet_name, index=False)
                 
                 st.download_button(
                     "📥 Download Excel Multi-Sheets",
@@ -5301,7 +9553,7 @@ def check_and_reconnect_database():
             
             # Tentar reinicializar o database manager global
             try:
-                db_manager = DatabaseManager()
+                db_manager = reset_shared_db_manager()
                 
                 if db_manager.connected:
                     st.session_state.db_manager = db_manager
@@ -5325,22 +9577,19 @@ def check_and_reconnect_database():
         
         if hasattr(current_db_manager, 'connected'):
             if not current_db_manager.connected:
-                st.warning("⚠️ Conexão perdida. Tentando reconectar...")
+                heartbeat = getattr(current_db_manager, 'heartbeat', None)
                 
-                try:
-                    # Tentar reinicializar
-                    current_db_manager._init_connection()
-                    
-                    if current_db_manager.connected:
-                        st.success("✅ Reconexão bem-sucedida!")
-                        return current_db_manager
+                if heartbeat is not None and getattr(current_db_manager, 'has_backend', False):
+                    # A reconexão acontece no heartbeat, com backoff exponencial
+                    heartbeat_stats = heartbeat.get_stats()
+                    if heartbeat_stats['state'] == 'open':
+                        st.warning(f"⚠️ Conexão perdida. Nova tentativa em {heartbeat_stats['retry_in_s']}s (circuit breaker aberto)")
                     else:
-                        st.info("ℹ️ Continuando em modo demonstração")
-                        return current_db_manager
-                        
-                except Exception as e:
-                    st.error(f"❌ Erro durante reconexão: {e}")
-                    return current_db_manager  # Retornar mesmo assim para modo demo
+                        st.warning("⚠️ Conexão perdida. Reconexão automática em andamento...")
+                else:
+                    st.info("ℹ️ Continuando em modo demonstração")
+                
+                return current_db_manager
         
         return current_db_manager
         
@@ -5350,7 +9599,7 @@ def check_and_reconnect_database():
         # Como último recurso, criar um database manager básico
         try:
             if 'db_manager' not in globals() or globals()['db_manager'] is None:
-                globals()['db_manager'] = DatabaseManager()
+                globals()['db_manager'] = reset_shared_db_manager()
             
             st.session_state.db_manager = globals()['db_manager']
             return globals()['db_manager']
@@ -5408,7 +9657,7 @@ def show_database_connection_error():
             # Forçar recriação do database manager
             try:
                 global db_manager
-                db_manager = DatabaseManager()
+                db_manager = reset_shared_db_manager()
                 st.session_state.db_manager = db_manager
                 st.success("✅ Nova tentativa de conexão realizada!")
                 st.rerun()
@@ -5902,7 +10151,7 @@ def get_table_policies(self, table_name):
                     'rls_enabled': True
                 }
             
-            def execute_query(self, query):
+            def execute_query(self, query, **kwargs):
                 """Simula execução de query"""
                 import time
                 import random
@@ -6283,22 +10532,20 @@ def verify_database_connection(db_manager):
         if hasattr(db_manager, 'connection_info'):
             status['database_type'] = db_manager.connection_info.get('type', 'Desconhecido')
         
-        # Testar resposta do banco
+        # Testar resposta do banco (latência do heartbeat; sem consultas extras)
         if status['connected']:
-            try:
-                import time
-                start_time = time.time()
-                
-                # Tentar buscar tabelas para verificar conectividade
-                tables = db_manager.get_tables()
-                
-                end_time = time.time()
-                status['response_time'] = f"{(end_time - start_time):.2f}s"
-                status['tables_count'] = len(tables) if tables else 0
-                
-            except Exception as e:
-                status['last_error'] = str(e)
+            heartbeat = getattr(db_manager, 'heartbeat', None)
+            heartbeat_stats = heartbeat.get_stats() if heartbeat else None
+            
+            if heartbeat_stats and heartbeat_stats['p50_ms'] is not None:
+                status['response_time'] = f"{heartbeat_stats['p50_ms'] / 1000:.2f}s"
+            
+            if heartbeat_stats and heartbeat_stats['state'] == 'open':
+                status['last_error'] = heartbeat_stats['last_error']
                 status['connected'] = False
+            
+            tables = getattr(db_manager, 'real_tables', None) or db_manager.get_tables()
+            status['tables_count'] = len(tables) if tables else 0
         
         return status
         
@@ -6363,8 +10610,14 @@ def initialize_sql_session_state():
             'auto_format': True,
             'show_line_numbers': True,
             'syntax_highlight': True,
-            'max_rows_display': 100
-        }
+            'max_rows_display': 100,
+            'streaming_mode': False
+        },
+        'sql_stream_id': None,
+        'sql_active_job': None,
+        'sql_explain_result': None,
+        'sql_result_query': None,
+        'sql_job_owner': uuid.uuid4().hex
     }
     
     for key, default_value in session_defaults.items():
@@ -6384,7 +10637,7 @@ def render_sql_editor_layout(db_manager):
         render_main_sql_editor(db_manager)
     
     # Seção de resultados (largura total)
-    render_sql_results_section()
+    render_sql_results_section(db_manager)
     
     # Seção de favoritos
     render_favorites_section()
@@ -6527,6 +10780,7 @@ def render_tables_list(db_manager):
                 if hasattr(db_manager, '_discover_real_tables'):
                     with st.spinner("Descobrindo tabelas..."):
                         db_manager._discover_real_tables()
+                        db_manager._update_table_counts()
                         st.rerun()
     
     except Exception as e:
@@ -6629,6 +10883,54 @@ def render_query_history():
         st.caption(f"📈 Total de queries executadas: {len(st.session_state.sql_history)}")
     else:
         st.info("Nenhuma query executada ainda")
+    
+    render_persistent_query_history()
+
+def render_persistent_query_history():
+    """Busca no histórico persistente: estatísticas de latência por impressão digital da query"""
+    history_store = get_query_history_store()
+    stats = history_store.get_stats()
+    
+    st.markdown("**📚 Histórico Persistente**")
+    if not stats['fingerprints']:
+        st.caption("Nenhuma execução registrada ainda")
+        return
+    
+    search_text = st.text_input("🔍 Buscar:", key="persistent_history_search",
+                                placeholder="trecho do SQL ou impressão digital")
+    order_labels = {
+        'total': '⏱️ Tempo total', 'max': '🐢 Máximo', 'avg': '📊 Média',
+        'executions': '🔁 Execuções', 'recent': '🕒 Recentes'
+    }
+    order = st.selectbox("Ordenar por:", list(order_labels), format_func=order_labels.get,
+                         key="persistent_history_order")
+    
+    for entry in history_store.search(search_text, order, limit=20):
+        p95 = f"{entry['p95_ms']:.0f}ms" if entry['p95_ms'] is not None else "—"
+        label = f"{p95} p95 · {entry['executions']}× · {entry['query'][:40]}"
+        with st.expander(label, expanded=False):
+            st.code(entry['query'], language='sql')
+            if entry['executions']:
+                st.caption(
+                    f"p50 {entry['p50_ms']:.1f}ms · p95 {entry['p95_ms']:.1f}ms · máx {entry['max_ms']:.1f}ms · "
+                    f"média {entry['avg_ms']:.1f}ms · {entry['avg_rows']:,} linhas em média"
+                )
+            st.caption(f"🔑 {entry['fingerprint']} · última execução "
+                       f"{datetime.fromtimestamp(entry['last_seen']).strftime('%d/%m/%Y %H:%M')}")
+            if entry['last_error']:
+                st.error(f"❌ {entry['errors']} erro(s); último: {entry['last_error'][:300]}")
+            
+            load_col, delete_col = st.columns(2)
+            with load_col:
+                if st.button("🔄 Carregar", key=f"load_fp_{entry['fingerprint']}", use_container_width=True):
+                    st.session_state.sql_query = entry['query']
+                    st.rerun()
+            with delete_col:
+                if st.button("🗑️ Remover", key=f"delete_fp_{entry['fingerprint']}", use_container_width=True):
+                    history_store.delete(entry['fingerprint'])
+                    st.rerun()
+    
+    st.caption(f"📈 {stats['fingerprints']} queries distintas · {stats['executions']} execuções · {stats['errors']} erros")
 
 
 def render_editor_settings():
@@ -6648,6 +10950,13 @@ def render_editor_settings():
         value=prefs['max_rows_display'],
         step=10
     )
+    
+    prefs['streaming_mode'] = st.checkbox(
+        "🌊 Modo streaming",
+        value=prefs.get('streaming_mode', False),
+        help="SELECTs usam um cursor no servidor: a primeira página aparece logo e o restante é "
+             "carregado sob demanda (requer conexão PostgreSQL direta)"
+    )
 
 
 def render_main_sql_editor(db_manager):
@@ -6713,6 +11022,28 @@ def render_editor_action_buttons(sql_query, db_manager):
             else:
                 st.warning("⚠️ Digite uma query para favoritar")
     
+    # Plano de execução (EXPLAIN / EXPLAIN ANALYZE)
+    explain_col1, explain_col2, explain_col3 = st.columns([1, 1, 2])
+    
+    with explain_col1:
+        explain_button = st.button("🧭 Explain", use_container_width=True, disabled=not sql_query.strip(),
+                                   help="Mostra o plano estimado sem executar a query")
+    
+    with explain_col2:
+        analyze_button = st.button("🔬 Explain Analyze", use_container_width=True, disabled=not sql_query.strip(),
+                                   help="Executa a query (escritas são desfeitas) e mostra tempos e buffers reais")
+    
+    with explain_col3:
+        if st.session_state.get('sql_explain_result') and st.button("✖️ Fechar plano", key="close_plan"):
+            st.session_state.sql_explain_result = None
+            st.rerun()
+    
+    if (explain_button or analyze_button) and hasattr(db_manager, 'explain_query'):
+        with st.spinner("🧭 Obtendo plano de execução..."):
+            st.session_state.sql_explain_result = db_manager.explain_query(
+                sql_query, analyze=analyze_button, timeout=get_query_timeout()
+            )
+    
     # Executar query se botão foi pressionado
     if execute_button and sql_query.strip():
         execute_sql_query(sql_query, db_manager)
@@ -6749,9 +11080,39 @@ def execute_sql_query(sql_query, db_manager):
             if len(st.session_state.sql_history) > 100:
                 st.session_state.sql_history = st.session_state.sql_history[-100:]
         
+        st.session_state.sql_result_query = sql_query
+        
+        # Cursor da execução anterior não é mais necessário
+        if hasattr(db_manager, 'close_query_stream'):
+            db_manager.close_query_stream(st.session_state.get('sql_stream_id'))
+            st.session_state.sql_stream_id = None
+        
+        # Modo streaming: primeira página do cursor no servidor; o restante sob demanda
+        if st.session_state.sql_editor_preferences.get('streaming_mode') and hasattr(db_manager, 'open_query_stream'):
+            result = execute_sql_query_streaming(sql_query, db_manager)
+            if result is not None:
+                st.session_state.last_execution_result = result
+                st.session_state.sql_active_job = None
+                return
+        
+        # Job em segundo plano: o editor continua livre enquanto a query executa
+        if hasattr(db_manager, 'submit_query_job'):
+            history_store = get_query_history_store()
+            st.session_state.sql_active_job = db_manager.submit_query_job(
+                sql_query, timeout=get_query_timeout(), owner=st.session_state.sql_job_owner,
+                on_finish=lambda job: history_store.record_result(
+                    job['query'], job['result'], (job['finished_at'] - job['started_at']) * 1000
+                ),
+                log_context={'source': 'editor', 'user': st.session_state.get('username') or None}
+            )
+            st.session_state.last_execution_result = None
+            return
+        
         # Executar query
         try:
+            query_start = time.time()
             result = db_manager.execute_query(sql_query)
+            get_query_history_store().record_result(sql_query, result, (time.time() - query_start) * 1000)
             st.session_state.last_execution_result = result
             
             # Exibir resultados
@@ -6763,12 +11124,298 @@ def execute_sql_query(sql_query, db_manager):
                 st.exception(e)
 
 
-def render_sql_results_section():
+def get_query_timeout() -> int:
+    """Timeout de query (segundos) das configurações do sistema, aplicado como statement_timeout
+    no editor e nos scripts (substitui o padrão do pool, get_pool_statement_timeout)"""
+    settings = st.session_state.get('user_settings') or load_user_settings()
+    return settings.get('system', {}).get('query_timeout', 30)
+
+
+def render_query_jobs_panel(db_manager):
+    """Jobs de query da sessão com status, progresso e ações"""
+    jobs = db_manager.list_query_jobs(st.session_state.sql_job_owner)
+    active_id = st.session_state.get('sql_active_job')
+    
+    # Job acompanhado pelo painel de resultados terminou: exibir o resultado
+    if active_id:
+        active = next((job for job in jobs if job['id'] == active_id), None)
+        if active is None or active['status'] not in ('queued', 'running'):
+            st.session_state.sql_active_job = None
+            if active is not None:
+                st.session_state.last_execution_result = active['result']
+                st.session_state.sql_result_query = active['query']
+            st.rerun()
+    
+    if not jobs:
+        return
+    
+    status_labels = {
+        'queued': '🕒 Na fila',
+        'running': '⏳ Executando',
+        'done': '✅ Concluído',
+        'error': '❌ Erro',
+        'cancelled': '⛔ Cancelado'
+    }
+    
+    st.markdown("---")
+    st.markdown("#### 🧵 Jobs em Segundo Plano")
+    
+    for job in jobs:
+        job_col1, job_col2, job_col3, job_col4 = st.columns([4, 2, 1, 1])
+        active = job['status'] in ('queued', 'running')
+        
+        with job_col1:
+            preview = ' '.join(job['query'].split())
+            st.markdown(f"`{job['id']}` {preview[:80]}{'...' if len(preview) > 80 else ''}")
+        
+        with job_col2:
+            if active:
+                elapsed = time.time() - (job['started_at'] or job['submitted_at'])
+                backend = f" · PID {job['pid']}" if job['pid'] else ""
+                st.caption(f"{status_labels[job['status']]} há {elapsed:.1f}s{backend}")
+            else:
+                result = job['result'] or {}
+                st.caption(
+                    f"{status_labels[job['status']]} · {result.get('execution_time', 'N/A')} · "
+                    f"{result.get('rows_affected', 0)} registros"
+                    + (f" · {result['cancel_note']}" if result.get('cancel_note') else '')
+                )
+        
+        with job_col3:
+            if active:
+                if st.button("⛔", key=f"cancel_job_{job['id']}", use_container_width=True,
+                             help="Cancelar (pg_cancel_backend no backend da query)"):
+                    cancel_result = db_manager.cancel_query_job(job['id'])
+                    if cancel_result['success']:
+                        st.toast(f"⛔ {cancel_result['message']}")
+                    else:
+                        st.toast(f"ℹ️ {cancel_result['message']}")
+            elif st.button("📊", key=f"show_job_{job['id']}", use_container_width=True, help="Exibir resultado"):
+                st.session_state.last_execution_result = job['result']
+                st.session_state.sql_result_query = job['query']
+                st.rerun()
+        
+        with job_col4:
+            if st.button("🗑️", key=f"dismiss_job_{job['id']}", disabled=active,
+                         use_container_width=True, help="Descartar job e resultado"):
+                db_manager.dismiss_query_job(job['id'])
+                st.rerun()
+    
+    if any(job['status'] in ('queued', 'running') for job in jobs) and QUERY_JOBS_LIVE_PANEL is None:
+        st.button("🔄 Atualizar status", key="refresh_query_jobs")
+
+
+# Atualização automática do painel enquanto houver jobs ativos (st.fragment, Streamlit >= 1.37)
+QUERY_JOBS_LIVE_PANEL = st.fragment(run_every=2)(render_query_jobs_panel) if hasattr(st, 'fragment') else None
+
+
+def render_query_jobs_section(db_manager):
+    """Painel de jobs; reexecutado a cada 2s apenas enquanto houver jobs ativos"""
+    if not hasattr(db_manager, 'list_query_jobs'):
+        return
+    
+    jobs = db_manager.list_query_jobs(st.session_state.sql_job_owner)
+    running = any(job['status'] in ('queued', 'running') for job in jobs)
+    if running and QUERY_JOBS_LIVE_PANEL is not None:
+        QUERY_JOBS_LIVE_PANEL(db_manager)
+    else:
+        render_query_jobs_panel(db_manager)
+
+
+def execute_sql_query_streaming(sql_query, db_manager):
+    """Abre um cursor no servidor e busca apenas a primeira página (None = usar execução normal)"""
+    start_time = time.time()
+    page_size = st.session_state.sql_editor_preferences['max_rows_display']
+    
+    try:
+        stream = db_manager.open_query_stream(sql_query, page_size=page_size)
+        if stream is None:
+            return None
+        stream.fetch_page()
+    except Exception:
+        # DECLARE não aceita tudo (ex.: WITH com INSERT); a execução normal reporta o erro real
+        return None
+    
+    st.session_state.sql_stream_id = stream.stream_id
+    execution_time = round((time.time() - start_time) * 1000, 2)
+    return {
+        'success': True,
+        'data': stream.buffered_rows(),
+        'rows_affected': stream.rows_fetched,
+        'execution_time': f"{execution_time}ms",
+        'message': 'Primeira página obtida via cursor no servidor',
+        'backend': 'postgresql',
+        'streaming': True
+    }
+
+
+def render_stream_controls(db_manager):
+    """Controles de paginação do resultado em streaming; atualiza o resultado exibido"""
+    result = st.session_state.last_execution_result
+    stream = db_manager.get_query_stream(st.session_state.get('sql_stream_id')) if hasattr(db_manager, 'get_query_stream') else None
+    if stream is None:
+        if result.get('stream_closed'):
+            st.caption(f"⏹️ Cursor encerrado após {result['rows_affected']:,} linhas; execute a query novamente para ler o restante.")
+        else:
+            st.caption("ℹ️ Cursor encerrado por inatividade; execute a query novamente para continuar a leitura.")
+        return
+    
+    stream_col1, stream_col2, stream_col3 = st.columns([1, 1, 2])
+    
+    with stream_col1:
+        if st.button("⏭️ Carregar mais", disabled=stream.exhausted, use_container_width=True,
+                     key="sql_stream_more", help=f"Busca mais {stream.page_size} linhas no servidor"):
+            try:
+                stream.fetch_page()
+            except Exception as e:
+                st.error(f"❌ Erro ao ler o cursor: {e}")
+            result['data'] = stream.buffered_rows()
+            result['rows_affected'] = stream.rows_fetched
+    
+    with stream_col2:
+        if st.button("⏹️ Encerrar cursor", disabled=stream.exhausted, use_container_width=True,
+                     key="sql_stream_close", help="Libera a conexão sem ler o restante"):
+            # Pelo gerenciador, como os demais fechamentos: o cursor sai do registro de streams
+            stream.exhausted = True
+            db_manager.close_query_stream(stream.stream_id)
+            result['stream_closed'] = True
+    
+    with stream_col3:
+        first_row = stream.first_buffered_row + 1 if stream.rows_fetched else 0
+        status = "fim do resultado" if stream.exhausted else "há mais linhas no servidor"
+        st.caption(
+            f"🌊 Exibindo linhas {first_row}–{stream.rows_fetched} ({status}). "
+            f"Até {stream.pages.maxlen} páginas ficam em memória; as mais antigas são descartadas."
+        )
+
+
+def render_query_plan(explain_result):
+    """Árvore do plano com custo, tempo e linhas por nó; destaca seq scans e estimativas erradas"""
+    st.markdown("---")
+    st.markdown("#### 🧭 Plano de Execução")
+    
+    if not explain_result['success']:
+        st.error(f"❌ {explain_result['error']}")
+        return
+    
+    nodes = explain_result['nodes']
+    
+    plan_col1, plan_col2, plan_col3, plan_col4, plan_col5 = st.columns(5)
+    with plan_col1:
+        st.metric("💰 Custo Total", f"{explain_result['total_cost']:,.2f}")
+    with plan_col2:
+        planning = explain_result.get('planning_ms')
+        st.metric("🧠 Planejamento", f"{planning:.2f}ms" if planning is not None else "N/A")
+    with plan_col3:
+        execution = explain_result.get('execution_ms')
+        st.metric("⏱️ Execução", f"{execution:.2f}ms" if execution is not None else "não executada")
+    with plan_col4:
+        st.metric("🐢 Seq Scans", explain_result['seq_scans'])
+    with plan_col5:
+        st.metric("🎯 Estimativas Erradas", explain_result['misestimates'])
+    
+    # Árvore indentada
+    tree_lines = []
+    for node in nodes:
+        flags = []
+        if node['seq_scan']:
+            flags.append("🐢 SEQ SCAN")
+        if node['misestimate'] is not None:
+            flags.append(f"🎯 real/estimado = {node['misestimate']}x")
+        
+        actual = ""
+        if node['actual_rows'] is not None:
+            actual = f" | real: {node['actual_rows']:,} linhas, {node['time_ms']}ms, {node['loops']} loop(s)"
+        target = f" em {node['target']}" if node['target'] else ""
+        tree_lines.append(
+            f"{'    ' * node['depth']}-> {node['node']}{target} "
+            f"(custo {node['startup_cost']}..{node['total_cost']}, estimado: {node['plan_rows']:,} linhas){actual}"
+            f"{'  ⚠️ ' + ', '.join(flags) if flags else ''}"
+        )
+    st.code('\n'.join(tree_lines), language='text')
+    
+    if explain_result['seq_scans']:
+        seq_tables = sorted({n['target'] for n in nodes if n['seq_scan'] and n['target']})
+        st.warning(f"🐢 Leitura sequencial em: {', '.join(seq_tables)}. Considere índices nas colunas filtradas.")
+    if explain_result['misestimates']:
+        st.warning("🎯 O planejador errou a cardinalidade em ao menos 10x; rode ANALYZE nas tabelas envolvidas.")
+    
+    with st.expander("📋 Detalhes por Nó", expanded=False):
+        df_nodes = pd.DataFrame([{
+            'Nó': f"{'· ' * n['depth']}{n['node']}",
+            'Objeto': n['target'],
+            'Custo': n['total_cost'],
+            'Linhas Est.': n['plan_rows'],
+            'Linhas Reais': n['actual_rows'],
+            'Tempo (ms)': n['time_ms'],
+            'Buffers Hit': n['shared_hit'],
+            'Buffers Lidos': n['shared_read'],
+            'Condição': n['filter'],
+            'Alerta': ' '.join(filter(None, [
+                '🐢 seq scan' if n['seq_scan'] else '',
+                f"🎯 {n['misestimate']}x" if n['misestimate'] is not None else ''
+            ]))
+        } for n in nodes])
+        st.dataframe(df_nodes, use_container_width=True, hide_index=True)
+    
+    with st.expander("🧾 JSON do Plano", expanded=False):
+        st.json(explain_result['plan'])
+    
+    render_plan_history(explain_result['fingerprint'])
+
+
+def render_plan_history(fingerprint):
+    """Planos anteriores da mesma impressão digital, para comparar custo e forma ao longo do tempo"""
+    history = get_plan_history_store().get(fingerprint)
+    if len(history) < 2:
+        st.caption(f"🗂️ Impressão digital `{fingerprint}`: primeiro plano registrado.")
+        return
+    
+    with st.expander(f"🗂️ Histórico de Planos ({len(history)}) · `{fingerprint}`", expanded=False):
+        previous_signature = None
+        rows = []
+        for entry in history:
+            rows.append({
+                'Capturado em': entry['captured_at'],
+                'Modo': 'ANALYZE' if entry['analyze'] else 'EXPLAIN',
+                'Custo Total': entry['total_cost'],
+                'Execução (ms)': entry.get('execution_ms'),
+                'Seq Scans': entry['seq_scans'],
+                'Estimativas Erradas': entry['misestimates'],
+                'Forma': entry['signature'],
+                'Mudou?': '🔀 sim' if previous_signature and entry['signature'] != previous_signature else ''
+            })
+            previous_signature = entry['signature']
+        st.dataframe(pd.DataFrame(rows[::-1]), use_container_width=True, hide_index=True)
+        
+        # Comparar dois planos lado a lado
+        labels = [f"{e['captured_at']} · {e['signature']}" for e in history]
+        compare_col1, compare_col2 = st.columns(2)
+        for column, default, key in ((compare_col1, len(history) - 2, 'plan_compare_a'),
+                                     (compare_col2, len(history) - 1, 'plan_compare_b')):
+            with column:
+                selected = st.selectbox("Plano:", range(len(history)), index=default,
+                                        format_func=lambda i: labels[i], key=key)
+                nodes = flatten_query_plan(history[selected]['plan']['Plan'])
+                st.code('\n'.join(
+                    f"{'  ' * n['depth']}-> {n['node']} {n['target']} (custo {n['total_cost']})" for n in nodes
+                ), language='text')
+
+
+def render_sql_results_section(db_manager):
     """Renderiza seção de resultados da última query"""
+    render_query_jobs_section(db_manager)
+    
+    if st.session_state.get('sql_explain_result'):
+        render_query_plan(st.session_state.sql_explain_result)
+    
     if st.session_state.last_execution_result:
         st.markdown("---")
         st.markdown("#### 📊 Resultados da Query")
-        display_query_results(st.session_state.last_execution_result, st.session_state.sql_query)
+        if st.session_state.last_execution_result.get('streaming'):
+            render_stream_controls(db_manager)
+        display_query_results(st.session_state.last_execution_result,
+                              st.session_state.get('sql_result_query') or st.session_state.sql_query)
 
 
 def display_query_results(result, sql_query):
@@ -6781,21 +11428,29 @@ def display_query_results(result, sql_query):
             st.metric("✅ Status", "Sucesso", delta="Query executada")
         
         with metrics_col2:
-            st.metric("⏱️ Tempo", result.get('execution_time', 'N/A'))
+            st.metric("⏱️ Tempo", result.get('execution_time', 'N/A'),
+                      delta="⚡ cache" if result.get('from_cache') else None, delta_color="off")
         
         with metrics_col3:
             st.metric("📝 Registros", result.get('rows_affected', 0))
         
         with metrics_col4:
-            data_size = len(str(result.get('data', [])))
-            st.metric("💾 Tamanho", f"{data_size} chars")
+            st.metric("💾 Tamanho", format_bytes(result_payload_size(result)))
+        
+        if result.get('from_cache'):
+            st.caption(
+                f"⚡ Servido do cache de resultados (armazenado há {result.get('cache_age', 0)}s; "
+                f"execução original: {result.get('original_execution_time', 'N/A')}). "
+                f"Escritas nas tabelas lidas pela query invalidam esta entrada."
+            )
         
         # Mostrar dados se existirem
-        if result.get('data') and len(result['data']) > 0:
+        if result_has_rows(result):
             st.markdown("**📋 Dados Retornados:**")
             
             try:
-                df_result = pd.DataFrame(result['data'])
+                # Resultado colunar do backend nativo: sem conversão linha a linha
+                df_result = result_frame(result)
                 
                 # Controles de visualização
                 view_col1, view_col2, view_col3, view_col4 = st.columns(4)
@@ -6817,16 +11472,22 @@ def display_query_results(result, sql_query):
                 with view_col4:
                     if st.button("📊 Análise Rápida", help="Mostra estatísticas descritivas"):
                         with st.expander("📈 Análise Estatística", expanded=True):
-                            st.write("**Informações Gerais:**")
-                            st.write(df_result.describe(include='all'))
-                            
-                            if len(df_result.select_dtypes(include=[np.number]).columns) > 0: # type: ignore
-                                st.write("**Correlações (apenas colunas numéricas):**")
-                                st.write(df_result.corr())
+                            # Prévia de tabela (SELECT * ... LIMIT): as primeiras linhas não representam a tabela
+                            sampled_table = sampled_table_for_query(sql_query)
+                            if sampled_table and hasattr(db_manager, 'sample_table'):
+                                with st.spinner(f"🎲 Amostrando {sampled_table}..."):
+                                    render_table_sample_profile(db_manager.sample_table(sampled_table))
+                            else:
+                                st.write("**Informações Gerais:**")
+                                st.write(df_result.describe(include='all'))
+                                
+                                if len(df_result.select_dtypes(include='number').columns) > 0:
+                                    st.write("**Correlações (apenas colunas numéricas):**")
+                                    st.write(df_result.corr(numeric_only=True))
                 
-                # Exibir DataFrame
+                # Exibir DataFrame (em streaming o buffer já é limitado pelas páginas em memória)
                 st.dataframe(
-                    df_result.head(max_rows),
+                    df_result if result.get('streaming') else df_result.head(max_rows),
                     use_container_width=use_container_width,
                     hide_index=not show_index
                 )
@@ -6840,7 +11501,8 @@ def display_query_results(result, sql_query):
                 
             except Exception as e:
                 st.error(f"❌ Erro ao processar resultados: {e}")
-                st.json(result['data'])
+                if result.get('data'):
+                    st.json(result['data'])
         
         else:
             st.info("✅ Query executada com sucesso, mas não retornou dados")
@@ -6930,7 +11592,7 @@ def render_export_options(df_result, sql_query):
         
         with export_col3:
             if st.button("📋 JSON", use_container_width=True, help="Visualizar como JSON"):
-                json_data = df_result.to_json(orient='records', indent=2)
+                json_data = frame_to_json_records(df_result, indent=2)
                 st.text_area(
                     "JSON dos resultados:",
                     value=json_data,
@@ -6951,7 +11613,16 @@ def provide_error_suggestions(error_msg, sql_query):
     
     st.markdown("**💡 Sugestões de Correção:**")
     
-    if any(word in error_lower for word in ['syntax', 'sintaxe', 'near']):
+    if 'statement timeout' in error_lower or 'user request' in error_lower or 'cancelad' in error_lower:
+        st.markdown("""
+        **Query Interrompida:**
+        - ✅ O limite vem de "Timeout de query" nas configurações do sistema
+        - ✅ Adicione filtros (WHERE) ou LIMIT para reduzir o volume
+        - ✅ Verifique índices nas colunas filtradas
+        - ✅ Use o modo streaming para resultados grandes
+        """)
+    
+    elif any(word in error_lower for word in ['syntax', 'sintaxe', 'near']):
         st.markdown("""
         **Erro de Sintaxe:**
         - ✅ Verifique pontos e vírgulas
@@ -7202,7 +11873,8 @@ def render_dba_operations():
     """, unsafe_allow_html=True)
     
     # Abas de operações
-    tab1, tab2, tab3, tab4 = st.tabs(["💾 Backup & Restore", "⚡ Otimização", "📊 Monitoramento", "🔧 Manutenção"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["💾 Backup & Restore", "⚡ Otimização", "📊 Monitoramento",
+                                            "🔧 Manutenção", "🐢 Queries Lentas"])
     
     with tab1:
         st.subheader("💾 Backup e Restore")
@@ -7310,11 +11982,14 @@ def render_dba_operations():
             
             if st.button("📊 Atualizar Estatísticas", use_container_width=True):
                 with st.spinner("📊 Atualizando estatísticas..."):
-                    # Simular atualização de estatísticas
-                    for table in db_manager.get_tables()[:3]:
-                        query = f"ANALYZE {table['name']};"
-                        result = db_manager.execute_query(query)
-                        time.sleep(0.5)
+                    if db_manager.native_available:
+                        result = db_manager.execute_query("ANALYZE")
+                    else:
+                        # Simular atualização de estatísticas
+                        for table in db_manager.get_tables()[:3]:
+                            query = f"ANALYZE {table['name']};"
+                            result = db_manager.execute_query(query)
+                            time.sleep(0.5)
                 
                 st.success("✅ Estatísticas atualizadas para todas as tabelas!")
                 log_activity("Estatísticas atualizadas")
@@ -7324,10 +11999,17 @@ def render_dba_operations():
             
             if st.button("🧹 VACUUM ANALYZE", use_container_width=True):
                 with st.spinner("🧹 Executando VACUUM ANALYZE..."):
-                    time.sleep(3)
+                    if db_manager.native_available:
+                        result = db_manager.execute_query("VACUUM ANALYZE")
+                    else:
+                        time.sleep(3)
+                        result = {'success': True, 'execution_time': '3000ms'}
                 
-                st.success("✅ VACUUM ANALYZE executado com sucesso!")
-                log_activity("VACUUM ANALYZE executado")
+                if result['success']:
+                    st.success(f"✅ VACUUM ANALYZE executado com sucesso! ({result['execution_time']})")
+                    log_activity("VACUUM ANALYZE executado")
+                else:
+                    st.error(f"❌ Erro no VACUUM ANALYZE: {result.get('error', 'Erro desconhecido')}")
         
         # Otimização por tabela
         st.markdown("#### 🗃️ Otimização por Tabela")
@@ -7335,7 +12017,7 @@ def render_dba_operations():
         tables = db_manager.get_tables()
         
         for table in tables[:5]:  # Mostrar apenas as 5 primeiras
-            with st.expander(f"🗃️ {table['name']} ({table['rows']:,} registros)"):
+            with st.expander(f"🗃️ {table['name']} ({format_row_count(table['rows'], table.get('rows_estimated', False))} registros)"):
                 col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
@@ -7435,6 +12117,81 @@ def render_dba_operations():
             
             st.plotly_chart(fig, use_container_width=True)
         
+        # Pool de conexões do backend nativo
+        st.markdown("#### 🏊 Pool de Conexões PostgreSQL")
+        
+        pool_metrics = db_manager.get_pool_metrics()
+        if pool_metrics:
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("🔗 Em Uso", f"{pool_metrics['in_use']}/{pool_metrics['max_connections']}",
+                          delta=f"pico {pool_metrics['peak_in_use']}")
+            
+            with col2:
+                st.metric("📊 Utilização", f"{pool_metrics['utilization']}%",
+                          delta=f"{pool_metrics['idle']} ociosas")
+            
+            with col3:
+                st.metric("⏱️ Espera Média", f"{pool_metrics['avg_wait_ms']}ms",
+                          delta=f"p95 {pool_metrics['p95_wait_ms']}ms")
+            
+            with col4:
+                st.metric("⚠️ Timeouts", pool_metrics['timeouts'],
+                          delta=f"{pool_metrics['connections_created']} conexões abertas")
+
+            if pool_metrics['prepared_created']:
+                st.caption(f"🧩 Prepared statements: {pool_metrics['prepared_created']} criados, "
+                           f"{pool_metrics['prepared_reused']} execuções reaproveitando o plano")
+        else:
+            st.info("💡 Backend PostgreSQL nativo não configurado. Adicione a seção [postgres] nos secrets ou salve os dados de conexão PostgreSQL nas configurações.")
+        
+        # Heartbeat da conexão
+        st.markdown("#### 💓 Heartbeat da Conexão")
+        
+        heartbeat_stats = db_manager.heartbeat.get_stats() if hasattr(db_manager, 'heartbeat') else None
+        if heartbeat_stats and heartbeat_stats['samples']:
+            state_labels = {'closed': '🟢 Fechado', 'half_open': '🟡 Sondando', 'open': '🔴 Aberto'}
+            
+            hb_col1, hb_col2, hb_col3, hb_col4 = st.columns(4)
+            with hb_col1:
+                st.metric("⚡ p50", f"{heartbeat_stats['p50_ms']}ms" if heartbeat_stats['p50_ms'] is not None else "N/A")
+            with hb_col2:
+                st.metric("📈 p95", f"{heartbeat_stats['p95_ms']}ms" if heartbeat_stats['p95_ms'] is not None else "N/A")
+            with hb_col3:
+                st.metric("🔌 Circuit Breaker", state_labels.get(heartbeat_stats['state'], heartbeat_stats['state']),
+                          delta=f"{heartbeat_stats['failures']} falhas", delta_color="off")
+            with hb_col4:
+                st.metric("🔄 Reconexões", heartbeat_stats['reconnect_attempts'])
+            
+            fig_hist = px.bar(
+                x=list(heartbeat_stats['histogram'].keys()),
+                y=list(heartbeat_stats['histogram'].values()),
+                labels={'x': 'Latência', 'y': 'Pings'},
+                title="Histograma de Latência do Heartbeat",
+                color_discrete_sequence=['#2E8B57']
+            )
+            fig_hist.update_layout(height=250)
+            st.plotly_chart(fig_hist, use_container_width=True)
+            
+            if heartbeat_stats['last_error']:
+                st.caption(f"Último erro: {heartbeat_stats['last_error']}")
+        else:
+            st.info("ℹ️ Heartbeat inativo (sem backend configurado) ou aguardando a primeira amostra")
+        
+        # Latência das chamadas REST/RPC pela sessão HTTP compartilhada
+        st.markdown("#### 🌐 Latência HTTP por Endpoint")
+        
+        http_stats = get_http_transport().get_stats()
+        if http_stats:
+            df_http = pd.DataFrame(http_stats).rename(columns={
+                'endpoint': 'Endpoint', 'calls': 'Chamadas', 'errors': 'Erros', 'retries': 'Retries',
+                'avg_ms': 'Média (ms)', 'p95_ms': 'p95 (ms)', 'max_ms': 'Máx (ms)'
+            })
+            st.dataframe(df_http, use_container_width=True, hide_index=True)
+        else:
+            st.info("ℹ️ Nenhuma chamada HTTP registrada ainda")
+        
         # Tabela de processos ativos
         st.markdown("#### 🔄 Processos Ativos")
         
@@ -7444,6 +12201,16 @@ def render_dba_operations():
             {"PID": 12347, "Usuário": "admin", "Database": "petcareai", "Query": "VACUUM ANALYZE pets;", "Tempo": "00:01:23"}
         ]
         
+        if db_manager.native_available:
+            activity = db_manager.execute_query(
+                "SELECT pid AS \"PID\", usename AS \"Usuário\", datname AS \"Database\", "
+                "left(query, 80) AS \"Query\", to_char(now() - query_start, 'HH24:MI:SS') AS \"Tempo\" "
+                "FROM pg_stat_activity WHERE state = 'active' AND pid <> pg_backend_pid() "
+                "ORDER BY query_start"
+            )
+            if activity['success']:
+                active_processes = activity['data']
+        
         df_processes = pd.DataFrame(active_processes)
         st.dataframe(df_processes, use_container_width=True)
         
@@ -7574,6 +12341,281 @@ def render_dba_operations():
             
             for action in next_actions:
                 st.write(action)
+    
+    with tab5:
+        render_slow_query_log()
+
+def render_slow_query_log():
+    """Log de queries lentas: filtros por SQL, duração, origem e usuário, com o plano capturado"""
+    st.subheader("🐢 Log de Queries Lentas")
+    
+    if not hasattr(db_manager, 'slow_query_log'):
+        st.info("ℹ️ Log de queries lentas indisponível no modo demonstração")
+        return
+    
+    slow_log = db_manager.slow_query_log
+    stats = slow_log.get_stats()
+    
+    status = f"ativo · limite {slow_log.threshold_seconds}s" if slow_log.enabled else "desativado"
+    st.caption(f"Execuções do editor, de scripts e das operações do sistema acima do limite ({status}; "
+               f"ajuste em Configurações → Banco de Dados). Mantém as {SLOW_QUERY_LOG_MAX_ENTRIES:,} mais recentes.")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📋 Registros", stats['entries'])
+    with col2:
+        st.metric("🔑 Queries Distintas", stats['fingerprints'])
+    with col3:
+        st.metric("🐢 Mais Lenta", f"{stats['max_ms'] / 1000:.1f}s")
+    with col4:
+        st.metric("❌ Com Erro", stats['errors'])
+    
+    if not stats['entries']:
+        st.info("ℹ️ Nenhuma query lenta registrada")
+        return
+    
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([2, 1, 1, 1])
+    with filter_col1:
+        search_text = st.text_input("🔍 Buscar:", key="slow_log_search",
+                                    placeholder="trecho do SQL ou impressão digital")
+    with filter_col2:
+        min_seconds = st.number_input("Duração mínima (s):", min_value=0.0, value=0.0, step=1.0,
+                                      key="slow_log_min_seconds")
+    with filter_col3:
+        source = st.selectbox("Origem:", [None] + list(SLOW_QUERY_SOURCES),
+                              format_func=lambda s: 'Todas' if s is None else SLOW_QUERY_SOURCES[s],
+                              key="slow_log_source")
+    with filter_col4:
+        user = st.selectbox("Usuário:", [None] + slow_log.get_users(),
+                            format_func=lambda u: 'Todos' if u is None else u, key="slow_log_user")
+    errors_only = st.checkbox("Somente execuções com erro", key="slow_log_errors_only")
+    
+    entries = slow_log.search(search_text, min_seconds * 1000, source, user, errors_only)
+    if not entries:
+        st.info("🔍 Nenhum registro com esses filtros")
+        return
+    
+    df_entries = pd.DataFrame([{
+        'Quando': datetime.fromtimestamp(e['logged_at']).strftime('%d/%m/%Y %H:%M:%S'),
+        'Duração (s)': round(e['duration_ms'] / 1000, 2),
+        'Origem': SLOW_QUERY_SOURCES.get(e['source'], e['source']),
+        'Usuário': e['username'] or '—',
+        'Linhas': e['rows'],
+        'Status': '✅' if e['success'] else '❌',
+        'Plano': '🧭' if e['plan'] else '',
+        'Query': e['query'][:80]
+    } for e in entries])
+    st.dataframe(df_entries, use_container_width=True, hide_index=True)
+    
+    export_col, clear_col = st.columns(2)
+    with export_col:
+        st.download_button(
+            "📥 Exportar CSV",
+            df_entries.assign(Query=[e['query'] for e in entries]).to_csv(index=False),
+            file_name=f"queries_lentas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    with clear_col:
+        if st.button("🗑️ Limpar Log", use_container_width=True, key="slow_log_clear"):
+            slow_log.clear()
+            log_activity("Log de queries lentas limpo")
+            st.rerun()
+    
+    # Detalhe de uma entrada (o plano usa expanders, que não podem ficar aninhados)
+    st.markdown("---")
+    selected = st.selectbox(
+        "🔎 Detalhar execução:", range(len(entries)),
+        format_func=lambda i: f"{df_entries.iloc[i]['Quando']} · {entries[i]['duration_ms'] / 1000:.2f}s · "
+                              f"{entries[i]['query'][:60]}",
+        key="slow_log_selected"
+    )
+    entry = entries[selected]
+    
+    st.code(entry['query'], language='sql')
+    st.caption(f"🔑 {entry['fingerprint']} · backend {entry['backend'] or 'N/A'} · "
+               f"{entry['rows'] if entry['rows'] is not None else '—'} linha(s)")
+    if entry['parameters']:
+        st.markdown("**🧩 Parâmetros**")
+        st.json(entry['parameters'])
+    if entry['error']:
+        st.error(f"❌ {entry['error']}")
+    
+    if entry['plan']:
+        render_query_plan({**entry['plan'], 'nodes': flatten_query_plan(entry['plan']['plan']['Plan'])})
+    else:
+        st.caption("🧭 Sem plano capturado (comando não suporta EXPLAIN, backend sem conexão "
+                   "PostgreSQL direta ou captura ainda em andamento)")
+    
+    if st.button("🔄 Abrir no Editor SQL", key="slow_log_open_editor"):
+        st.session_state.sql_query = entry['query']
+        st.session_state.current_page = 'sql_editor'
+        st.rerun()
+
+def render_data_import():
+    """Renderiza página de importação de dados em massa"""
+    st.markdown("""
+    <div style='background: linear-gradient(135deg, #F0FFF0, #E6FFE6);
+                padding: 1.5rem; border-radius: 15px;
+                border-left: 5px solid #2E8B57; margin-bottom: 2rem;'>
+        <h2 style='color: #2E8B57; margin: 0; font-size: 2rem;'>
+            📥 Importação de Dados
+        </h2>
+        <p style='color: #228B22; margin: 0.5rem 0 0 0; font-size: 1.1rem;'>
+            Carga em massa de CSV, NDJSON ou Excel com COPY
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if not hasattr(db_manager, 'bulk_import'):
+        st.warning("⚠️ Importação indisponível no modo demonstração")
+        return
+
+    if not db_manager.native_available:
+        st.info("💡 Sem conexão PostgreSQL direta a importação usa inserts em lote pelo PostgREST "
+                "(sem COPY e sem transação única). Configure a seção PostgreSQL para cargas grandes.")
+
+    # Arquivo de origem
+    format_col1, format_col2 = st.columns(2)
+
+    with format_col1:
+        format_label = st.selectbox("📄 Formato:", list(IMPORT_FORMATS), key="import_format")
+    file_format = IMPORT_FORMATS[format_label]
+
+    with format_col2:
+        separator = ','
+        if file_format == 'csv':
+            separators = {'Vírgula (,)': ',', 'Ponto e vírgula (;)': ';', 'Tabulação': '\t', 'Barra (|)': '|'}
+            separator = separators[st.selectbox("🔣 Separador:", list(separators), key="import_separator")]
+
+    extensions = {'csv': ['csv', 'txt'], 'ndjson': ['ndjson', 'jsonl', 'json'], 'excel': ['xlsx', 'xls']}
+    uploaded_file = st.file_uploader("📁 Arquivo:", type=extensions[file_format], key="import_file")
+    if uploaded_file is None:
+        return
+
+    # Prévia lida uma vez por arquivo: os reruns do Streamlit não releem o upload
+    sample_key = (getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}",
+                  file_format, separator)
+    cached_sample = st.session_state.get('import_sample')
+    if cached_sample is not None and cached_sample[0] == sample_key:
+        sample = cached_sample[1]
+    else:
+        try:
+            sample = read_import_sample(uploaded_file, file_format, separator)
+        except Exception as e:
+            st.error(f"❌ Não foi possível ler o arquivo: {e}")
+            return
+        st.session_state.import_sample = (sample_key, sample)
+
+    if sample.empty:
+        st.warning("⚠️ O arquivo não contém linhas")
+        return
+
+    st.markdown(f"#### 👁️ Prévia ({len(sample.columns)} colunas)")
+    st.dataframe(sample.head(20), use_container_width=True)
+
+    # Destino
+    st.markdown("#### 🎯 Destino")
+    table_names = [table['name'] for table in db_manager.get_tables()]
+    target_mode = st.radio("Tabela:", ["Tabela existente", "Nova tabela"], horizontal=True, key="import_target_mode")
+    create_table = target_mode == "Nova tabela"
+    column_types = None
+
+    if create_table:
+        suggested = re.sub(r'\W+', '_', Path(uploaded_file.name).stem.lower()).strip('_')
+        table_name = st.text_input("🆕 Nome da nova tabela:", value=suggested, key="import_new_table").strip()
+        columns = list(sample.columns)
+
+        inferred = infer_import_column_types(sample)
+        type_options = ['text', 'bigint', 'numeric', 'boolean', 'date', 'timestamptz', 'jsonb']
+        column_types = {}
+        with st.expander(f"🔤 Tipos das colunas (inferidos de {len(sample)} linhas)", expanded=True):
+            type_cols = st.columns(3)
+            for i, column in enumerate(columns):
+                with type_cols[i % 3]:
+                    column_types[column] = st.selectbox(
+                        column, type_options, index=type_options.index(inferred[column]), key=f"import_type_{column}"
+                    )
+
+        if not re.fullmatch(r'[a-z_][a-z0-9_]*', table_name or ''):
+            st.error("❌ Nome de tabela inválido: use letras minúsculas, números e _")
+            return
+        if table_name in table_names:
+            st.error(f"❌ A tabela {table_name} já existe")
+            return
+        truncate = defer_indexes = False
+
+    else:
+        if not table_names:
+            st.warning("⚠️ Nenhuma tabela encontrada")
+            return
+        table_name = st.selectbox("🗃️ Tabela de destino:", table_names, key="import_table")
+        table_columns = [column['name'] for column in db_manager.get_table_columns(table_name)]
+        columns = [column for column in sample.columns if column in table_columns]
+        ignored = [column for column in sample.columns if column not in table_columns]
+
+        if ignored:
+            st.warning(f"⚠️ Colunas ignoradas (não existem em {table_name}): {', '.join(map(str, ignored))}")
+        if not columns:
+            st.error("❌ Nenhuma coluna do arquivo corresponde às colunas da tabela")
+            return
+
+        option_col1, option_col2 = st.columns(2)
+        with option_col1:
+            truncate = st.checkbox("🧹 Esvaziar a tabela antes (TRUNCATE)", key="import_truncate",
+                                   disabled=not db_manager.native_available)
+        with option_col2:
+            defer_indexes = st.checkbox(
+                "⏸️ Adiar índices", key="import_defer_indexes",
+                disabled=not db_manager.native_available,
+                help="Remove os índices secundários durante a carga e os recria no final (PK e UNIQUE são mantidos)"
+            )
+        if defer_indexes:
+            st.warning("⚠️ Adiar índices bloqueia a tabela (ACCESS EXCLUSIVE) durante toda a importação: "
+                       "leituras e escritas de outras sessões ficam aguardando até o fim da carga.")
+
+    chunk_rows = st.number_input("📦 Linhas por lote:", min_value=1000, max_value=500000,
+                                 value=IMPORT_CHUNK_ROWS, step=10000, key="import_chunk_rows")
+
+    if st.button("📥 Importar", type="primary", key="import_run"):
+        progress_bar = st.progress(0.0)
+        status = st.empty()
+        import_start = time.time()
+
+        def report_progress(rows_loaded, fraction):
+            progress_bar.progress(min(max(fraction, 0.0), 1.0))
+            elapsed = max(time.time() - import_start, 0.001)
+            status.caption(f"🔄 {rows_loaded:,} linhas carregadas ({rows_loaded / elapsed:,.0f} linhas/s)")
+
+        result = db_manager.bulk_import(
+            table_name,
+            iter_import_chunks(uploaded_file, file_format, int(chunk_rows), separator),
+            columns,
+            column_types=column_types,
+            create_table=create_table,
+            truncate=truncate,
+            defer_indexes=defer_indexes,
+            progress=report_progress,
+            timeout=get_query_timeout()
+        )
+        elapsed = max(time.time() - import_start, 0.001)
+
+        if result['success']:
+            progress_bar.progress(1.0)
+            status.empty()
+            st.success(f"✅ {result['message']}")
+
+            metric_col1, metric_col2, metric_col3 = st.columns(3)
+            with metric_col1:
+                st.metric("📊 Linhas", f"{result['rows_affected']:,}")
+            with metric_col2:
+                st.metric("⏱️ Tempo", f"{elapsed:.1f}s")
+            with metric_col3:
+                st.metric("⚡ Vazão", f"{result['rows_affected'] / elapsed:,.0f} linhas/s")
+
+            log_activity("Importação de dados", f"{uploaded_file.name} → {table_name}: {result['rows_affected']} linhas")
+        else:
+            st.error(f"❌ {result['message']}")
 
 def render_projects():
     """Renderiza página de projetos com interface melhorada"""
@@ -8382,9 +13424,10 @@ def render_new_script_form_improved(project_id, project_manager):
             if has_parameters:
                 script_params = st.text_area(
                     "Parâmetros (JSON):", 
-                    placeholder='{\n  "data_inicio": "2025-01-01",\n  "data_fim": "2025-12-31",\n  "limit": 100\n}',
+                    placeholder='{\n  "data_inicio": {"type": "date", "default": "2025-01-01"},\n  "data_fim": "2025-12-31",\n  "limit": 100\n}',
                     height=100,
-                    help="Parâmetros em formato JSON"
+                    help="Use :nome no SQL. Tipos: text, integer, numeric, boolean, date, timestamp "
+                         "(sem \"type\", o tipo é inferido do valor padrão)"
                 )
             else:
                 script_params = ""
@@ -8426,11 +13469,20 @@ def render_new_script_form_improved(project_id, project_manager):
             validation_errors.append("Código SQL é obrigatório")
         
         # Validar JSON se fornecido
+        declared_params = {}
         if has_parameters and script_params:
             try:
-                json.loads(script_params)
+                declared_params = normalize_script_parameters(json.loads(script_params))
             except json.JSONDecodeError:
                 validation_errors.append("Parâmetros devem estar em formato JSON válido")
+            except (AttributeError, ValueError) as e:
+                validation_errors.append(f"Parâmetros inválidos: {e}")
+        
+        if script_sql:
+            undeclared = [name for name in find_script_parameters(script_sql) if name not in declared_params]
+            if undeclared:
+                validation_errors.append("Parâmetros usados no SQL sem declaração: " +
+                                         ", ".join(f":{name}" for name in undeclared))
         
         # Mostrar erros de validação
         if validation_errors:
@@ -8645,11 +13697,20 @@ def render_script_card_improved(script, project, project_manager):
         st.markdown("---")
         st.markdown("#### ⚙️ Ações do Script")
         
+        parameters = render_script_parameter_inputs(script)
+        
+        commit_each = st.checkbox(
+            "🔁 Commit por comando",
+            key=f"commit_each_{script['id']}",
+            help="Sem esta opção o script roda em uma única transação: qualquer erro desfaz todos os comandos"
+        )
+        
         action_col1, action_col2, action_col3, action_col4, action_col5, action_col6 = st.columns(6)
         
         with action_col1:
             if st.button("▶️ Executar", key=f"exec_{script['id']}", type="primary", use_container_width=True):
-                execute_script_improved(script, project, project_manager)
+                execute_script_improved(script, project, project_manager, commit_each=commit_each,
+                                        parameters=parameters)
         
         with action_col2:
             if st.button("✏️ Editar", key=f"edit_{script['id']}", use_container_width=True):
@@ -8684,7 +13745,64 @@ def render_script_card_improved(script, project, project_manager):
                 key=f"copy_area_{script['id']}"
             )
 
-def execute_script_improved(script, project, project_manager):
+def render_script_parameter_inputs(script) -> Dict:
+    """Campos tipados para os parâmetros declarados no script; retorna {nome: valor}"""
+    try:
+        declared = normalize_script_parameters(script.get('parameters'))
+    except ValueError as e:
+        st.error(f"❌ Declaração de parâmetros inválida: {e}")
+        return {}
+    if not declared:
+        return {}
+    
+    st.markdown("#### ⚙️ Parâmetros do Script")
+    values = {}
+    param_cols = st.columns(min(len(declared), 3))
+    for i, (name, spec) in enumerate(declared.items()):
+        key = f"param_{script['id']}_{name}"
+        label = f"{name} ({spec['type']})"
+        default = spec['default']
+        with param_cols[i % len(param_cols)]:
+            try:
+                if spec['type'] == 'boolean':
+                    values[name] = st.checkbox(label, value=bool(coerce_script_parameter(default, 'boolean')), key=key)
+                elif spec['type'] == 'integer':
+                    values[name] = st.number_input(label, value=coerce_script_parameter(default, 'integer'), step=1, key=key)
+                elif spec['type'] == 'numeric':
+                    values[name] = st.number_input(label, value=coerce_script_parameter(default, 'numeric'), key=key)
+                elif spec['type'] == 'date':
+                    values[name] = st.date_input(label, value=coerce_script_parameter(default, 'date'), key=key)
+                else:
+                    values[name] = st.text_input(label, value='' if default is None else str(default), key=key)
+            except (TypeError, ValueError):
+                # Valor padrão incompatível com o tipo: campo livre, validado na execução
+                values[name] = st.text_input(label, value=str(default), key=key)
+    return values
+
+def render_statement_report(result: Dict):
+    """Tempo e registros de cada comando do script"""
+    statements = result.get('statements') or []
+    if len(statements) < 2:
+        return
+    
+    mode = "transação única" if result.get('transactional') else "commit por comando"
+    st.markdown(f"#### 🧾 Comandos ({len(statements)} · {mode})")
+    status_icons = {'sucesso': '✅', 'erro': '❌', 'desfeito': '↩️', 'ignorado': '⏭️'}
+    df_statements = pd.DataFrame([
+        {
+            '#': entry['index'],
+            'Status': f"{status_icons.get(entry['status'], '•')} {entry['status']}",
+            'Tempo (ms)': entry['execution_ms'],
+            'Registros': entry['rows_affected'],
+            'Plano': {'novo': '🧩 preparado', 'reutilizado': '♻️ reutilizado'}.get(entry.get('prepared'), ''),
+            'Comando': entry['sql'].replace('\n', ' ')[:120],
+            'Erro': entry.get('error', '')
+        }
+        for entry in statements
+    ])
+    st.dataframe(df_statements, use_container_width=True, hide_index=True)
+
+def execute_script_improved(script, project, project_manager, commit_each=False, parameters=None):
     """Executa script com interface melhorada"""
     st.markdown(f"### ▶️ Executando: {script['name']}")
     
@@ -8701,11 +13819,8 @@ def execute_script_improved(script, project, project_manager):
         if not st.checkbox("🔓 Confirmo que quero executar este script", key=f"confirm_exec_{script['id']}"):
             st.stop()
     
-    # Parâmetros se necessário
-    if script.get('parameters'):
-        st.markdown("#### ⚙️ Parâmetros do Script")
-        st.json(script['parameters'])
-        st.info("💡 Parâmetros personalizáveis serão implementados em versão futura")
+    if parameters:
+        st.caption("⚙️ Parâmetros: " + ", ".join(f"{name} = {value}" for name, value in parameters.items()))
     
     # Executar
     with st.spinner(f"🔄 Executando '{script['name']}'..."):
@@ -8713,10 +13828,15 @@ def execute_script_improved(script, project, project_manager):
         result = project_manager.execute_script(
             script['id'], 
             project['id'], 
-            script['sql_content']
+            script['sql_content'],
+            parameters=parameters,
+            commit_each=commit_each,
+            declared_parameters=script.get('parameters')
         )
         execution_time = time.time() - start_time
     
+    render_statement_report(result)
+    
     # Mostrar resultados
     if result['success']:
         st.success(f"✅ Script executado com sucesso em {execution_time:.2f}s!")
@@ -8734,14 +13854,13 @@ def execute_script_improved(script, project, project_manager):
             st.metric("✅ Status", "Sucesso")
         
         with metrics_col4:
-            data_size = len(str(result.get('data', [])))
-            st.metric("💾 Dados", f"{data_size} chars")
+            st.metric("💾 Dados", format_bytes(result_payload_size(result)))
         
         # Mostrar dados se existirem
-        if result.get('data') and len(result['data']) > 0:
+        if result_has_rows(result):
             st.markdown("#### 📋 Resultados:")
             
-            df_result = pd.DataFrame(result['data'])
+            df_result = result_frame(result)
             
             # Controles de visualização
             view_col1, view_col2, view_col3 = st.columns(3)
@@ -8780,7 +13899,7 @@ def execute_script_improved(script, project, project_manager):
                 )
             
             with export_col2:
-                json_data = df_result.to_json(orient='records', indent=2)
+                json_data = frame_to_json_records(df_result, indent=2)
                 st.download_button(
                     "📋 JSON",
                     json_data,
@@ -9442,11 +14561,20 @@ def render_script_card(script, project, project_manager):
         # Ações do script
         st.markdown("#### ⚙️ Ações do Script")
         
+        parameters = render_script_parameter_inputs(script)
+        
+        commit_each = st.checkbox(
+            "🔁 Commit por comando",
+            key=f"commit_each_{script['id']}",
+            help="Sem esta opção o script roda em uma única transação: qualquer erro desfaz todos os comandos"
+        )
+        
         action_col1, action_col2, action_col3, action_col4, action_col5 = st.columns(5)
         
         with action_col1:
             if st.button("▶️ Executar", key=f"exec_{script['id']}", type="primary"):
-                execute_project_script(script, project, project_manager)
+                execute_project_script(script, project, project_manager, commit_each=commit_each,
+                                       parameters=parameters)
         
         with action_col2:
             if st.button("✏️ Editar", key=f"edit_{script['id']}"):
@@ -9469,7 +14597,7 @@ def render_script_card(script, project, project_manager):
                         st.success("Script removido!")
                         st.rerun()
 
-def execute_project_script(script, project, project_manager):
+def execute_project_script(script, project, project_manager, commit_each=False, parameters=None):
     """Executa um script do projeto"""
     st.markdown(f"### ▶️ Executando Script: {script['name']}")
     
@@ -9477,9 +14605,14 @@ def execute_project_script(script, project, project_manager):
         result = project_manager.execute_script(
             script['id'], 
             project['id'], 
-            script['sql_content']
+            script['sql_content'],
+            parameters=parameters,
+            commit_each=commit_each,
+            declared_parameters=script.get('parameters')
         )
     
+    render_statement_report(result)
+    
     if result['success']:
         st.success(f"✅ Script executado com sucesso!")
         
@@ -9496,9 +14629,9 @@ def execute_project_script(script, project, project_manager):
             st.metric("✅ Status", "Sucesso")
         
         # Mostrar dados se existirem
-        if result.get('data') and len(result['data']) > 0:
+        if result_has_rows(result):
             st.markdown("#### 📋 Resultados:")
-            df_result = pd.DataFrame(result['data'])
+            df_result = result_frame(result)
             st.dataframe(df_result, use_container_width=True)
             
             # Opções de exportação
@@ -9552,8 +14685,9 @@ def render_new_script_form(project_id, project_manager):
         st.markdown("#### ⚙️ Parâmetros (JSON)")
         script_params = st.text_area(
             "Parâmetros:", 
-            placeholder='{"data_inicio": "2025-01-01", "data_fim": "2025-12-31"}',
-            height=80
+            placeholder='{"data_inicio": "2025-01-01", "data_fim": {"type": "date", "default": "2025-12-31"}}',
+            height=80,
+            help="Use :nome no SQL para referenciar cada parâmetro"
         )
         
         submit_script = st.form_submit_button("💾 Salvar Script", type="primary")
@@ -9567,6 +14701,15 @@ def render_new_script_form(project_id, project_manager):
                     st.error("❌ Parâmetros devem estar em formato JSON válido")
                     return
                 
+                try:
+                    undeclared = set(find_script_parameters(script_sql)) - set(normalize_script_parameters(params))
+                except (AttributeError, ValueError) as e:
+                    st.error(f"❌ Parâmetros inválidos: {e}")
+                    return
+                if undeclared:
+                    st.error("❌ Parâmetros usados no SQL sem declaração: " + ", ".join(f":{n}" for n in sorted(undeclared)))
+                    return
+                
                 script_data = {
                     'name': script_name,
                     'description': script_description,
@@ -9660,7 +14803,7 @@ def show_script_execution_history(script_id, project_manager):
                 WHERE script_id = {script_id} 
                 ORDER BY executed_at DESC 
                 LIMIT 20
-            """)
+            """, use_cache=False)
             
             if result['success'] and result['data']:
                 df_history = pd.DataFrame(result['data'])
@@ -9895,6 +15038,15 @@ def render_database_settings_tab():
                     value=current_settings.get('pg_password', ''),
                     key="db_pg_password"
                 )
+                st.caption("🔒 A senha não é salva em user_settings.json nem incluída em exportações. "
+                           "Ao aplicar, ela vale para todo o processo do servidor (todas as sessões) "
+                           "até ele reiniciar, e o pool recriado encerra as leituras em andamento de "
+                           "todas as sessões. Para manter a conexão após reiniciar, use [postgres] nos "
+                           "secrets ou a variável de ambiente PGPASSWORD.")
+                if getattr(db_manager, 'native_password_missing', False):
+                    st.warning("⚠️ O PostgreSQL direto está configurado, mas sem senha disponível "
+                               "(provavelmente o servidor reiniciou): o app está usando o Supabase REST. "
+                               "Informe a senha e aplique, ou configure secrets/PGPASSWORD.")
             
             # SSL e segurança
             st.markdown("**🔐 Segurança:**")
@@ -9966,6 +15118,33 @@ def render_database_settings_tab():
                 else:
                     st.warning("⚠️ Preencha URL e chave anônima para testar")
             
+            if test_connection and db_type_new == "PostgreSQL":
+                test_dsn = get_postgres_dsn({
+                    'pg_host': pg_host, 'pg_port': int(pg_port), 'pg_database': pg_database,
+                    'pg_username': pg_username, 'pg_password': pg_password, 'ssl_enabled': ssl_enabled
+                })
+                if test_dsn:
+                    with st.spinner("🔍 Testando conexão..."):
+                        test_pool = PostgresConnectionPool(test_dsn, pool_size=1, max_connections=1,
+                                                           connection_timeout=current_settings.get('connection_timeout', 30))
+                        try:
+                            start_time = time.time()
+                            with test_pool.connection() as conn:
+                                with conn.cursor() as cursor:
+                                    cursor.execute("SELECT version()")
+                                    server_version = cursor.fetchone()[0]
+                            st.success(f"✅ Conexão PostgreSQL estabelecida ({round((time.time() - start_time) * 1000, 2)}ms)")
+                            st.caption(server_version)
+                        except Exception as e:
+                            st.error("❌ Falha na conexão PostgreSQL")
+                            st.code(str(e), language='text')
+                        finally:
+                            test_pool.close_all()
+                elif not PSYCOPG2_AVAILABLE:
+                    st.warning("⚠️ psycopg2 não instalado")
+                else:
+                    st.warning("⚠️ Preencha host e senha para testar")
+            
             if save_connection:
                 # Salvar configurações
                 new_db_settings = {
@@ -9978,6 +15157,15 @@ def render_database_settings_tab():
                     'encrypt_connection': encrypt_connection
                 }
                 
+                if db_type_new == "PostgreSQL":
+                    new_db_settings.update({
+                        'pg_host': pg_host,
+                        'pg_port': int(pg_port),
+                        'pg_database': pg_database,
+                        'pg_username': pg_username,
+                        'pg_password': pg_password
+                    })
+                
                 # Atualizar configurações
                 st.session_state.user_settings['database'].update(new_db_settings)
                 
@@ -10000,6 +15188,15 @@ def render_database_settings_tab():
                     'encrypt_connection': encrypt_connection
                 }
                 
+                if db_type_new == "PostgreSQL":
+                    new_db_settings.update({
+                        'pg_host': pg_host,
+                        'pg_port': int(pg_port),
+                        'pg_database': pg_database,
+                        'pg_username': pg_username,
+                        'pg_password': pg_password
+                    })
+                
                 with st.spinner("⚡ Aplicando configurações..."):
                     result = apply_database_settings(new_db_settings)
                 
@@ -10051,12 +15248,14 @@ def render_database_settings_tab():
             key="db_connection_timeout"
         )
         
-        query_timeout_db = st.slider(
-            "Timeout de query (seg):", 
+        statement_timeout_db = st.slider(
+            "Timeout padrão do pool (seg):", 
             5, 300, 
-            current_settings.get('query_timeout', 60),
-            help="Tempo limite para execução de queries",
-            key="db_query_timeout"
+            get_pool_statement_timeout(current_settings),
+            help="statement_timeout das conexões do pool, usado por consultas internas (catálogo, "
+                 "contagens, painéis). Editor SQL e scripts usam o 'Timeout de query' da aba Sistema, "
+                 "que substitui este valor nessas execuções",
+            key="db_statement_timeout"
         )
         
         st.markdown("#### 📊 Logs e Monitoramento")
@@ -10110,6 +15309,39 @@ def render_database_settings_tab():
             key="db_connection_retry_attempts"
         )
         
+        count_concurrency = st.slider(
+            "Contagens em paralelo:", 
+            1, 32, 
+            current_settings.get('count_concurrency', 8),
+            help="Máximo de tabelas contadas simultaneamente",
+            key="db_count_concurrency"
+        )
+        
+        count_timeout = st.slider(
+            "Timeout por tabela (seg):", 
+            1, 60, 
+            current_settings.get('count_timeout', 10),
+            help="Tempo limite da contagem de cada tabela (resultados parciais após isso)",
+            key="db_count_timeout"
+        )
+        
+        exact_count_threshold = st.number_input(
+            "Contagem exata abaixo de (registros):", 
+            0, 10000000, 
+            current_settings.get('exact_count_threshold', 10000),
+            step=1000,
+            help="Tabelas menores que isso são contadas exatamente; maiores usam a estimativa do planejador",
+            key="db_exact_count_threshold"
+        )
+        
+        query_workers = st.slider(
+            "Workers de jobs SQL:", 
+            1, 16, 
+            current_settings.get('query_workers', 4),
+            help="Queries do editor executadas simultaneamente em segundo plano",
+            key="db_query_workers"
+        )
+        
         backup_connection = st.checkbox(
             "Conexão de backup", 
             value=current_settings.get('backup_connection', False),
@@ -10148,25 +15380,34 @@ def render_database_settings_tab():
                 'connection_pool_size': connection_pool_size,
                 'max_connections': max_connections,
                 'connection_timeout': connection_timeout,
-                'query_timeout': query_timeout_db,
+                'statement_timeout': statement_timeout_db,
                 'log_slow_queries': log_slow_queries,
                 'slow_query_threshold': slow_query_threshold,
                 'log_connections': log_connections,
                 'monitor_locks': monitor_locks,
                 'auto_reconnect': auto_reconnect,
                 'connection_retry_attempts': connection_retry_attempts,
+                'count_concurrency': count_concurrency,
+                'count_timeout': count_timeout,
+                'exact_count_threshold': exact_count_threshold,
+                'query_workers': query_workers,
                 'backup_connection': backup_connection,
                 'read_replica': read_replica,
                 'load_balancing': load_balancing,
                 'failover_enabled': failover_enabled
             }
             
-            # Atualizar configurações
+            # Atualizar configurações (database.query_timeout foi renomeado para statement_timeout)
             st.session_state.user_settings['database'].update(performance_settings)
+            st.session_state.user_settings['database'].pop('query_timeout', None)
             
             # Salvar no arquivo
             if save_user_settings(st.session_state.user_settings):
-                st.success("✅ Configurações de performance salvas!")
+                # Recriar o pool nativo com os novos limites e timeouts
+                if db_manager.configure_pool(st.session_state.user_settings['database']):
+                    st.success("✅ Configurações de performance salvas e aplicadas ao pool!")
+                else:
+                    st.success("✅ Configurações de performance salvas!")
                 log_activity("Configurações de performance salvas")
             else:
                 st.error("❌ Erro ao salvar configurações")
@@ -10182,6 +15423,7 @@ def render_database_settings_tab():
                 "Status": "🟢 Conectado",
                 "Tipo": db_manager.connection_info.get('type', 'N/A'),
                 "URL": CONFIG.get('supabase_url', 'N/A'),
+                "Backend SQL": "PostgreSQL nativo (pool)" if db_manager.native_available else "Supabase REST",
                 "Tabelas": len(db_manager.get_tables()),
                 "Última Verificação": datetime.now().strftime('%d/%m/%Y %H:%M:%S')
             }
@@ -10244,7 +15486,7 @@ def render_database_settings_tab():
         if st.button("💾 Testar Query", use_container_width=True, key="test_query"):
             with st.spinner("💾 Testando execução de query..."):
                 try:
-                    result = db_manager.execute_query("SELECT 1 as test_query")
+                    result = db_manager.execute_query("SELECT 1 as test_query", use_cache=False)
                     if result['success']:
                         st.success("✅ Query OK!")
                     else:
@@ -10264,7 +15506,7 @@ def render_database_settings_tab():
         if st.button("🔄 Reiniciar Conexão DB", use_container_width=True, key="restart_db_connection"):
             with st.spinner("🔄 Reiniciando conexão..."):
                 try:
-                    db_manager._init_connection()
+                    db_manager.reconnect()
                     st.success("✅ Conexão reiniciada!")
                     time.sleep(1)
                     st.rerun()
@@ -10301,6 +15543,7 @@ def render_database_settings_tab():
             # Remover dados sensíveis
             safe_config = config_export.copy()
             if 'database_settings' in safe_config:
+                safe_config['database_settings'] = dict(safe_config['database_settings'])
                 for sensitive_key in ['supabase_anon_key', 'supabase_service_key', 'pg_password']:
                     if sensitive_key in safe_config['database_settings']:
                         safe_config['database_settings'][sensitive_key] = "***REMOVIDO***"
@@ -10334,7 +15577,7 @@ def render_backup_restore_tab():
         include_sensitive = st.checkbox(
             "Incluir dados sensíveis (senhas, chaves)",
             value=False,
-            help="⚠️ Cuidado: dados sensíveis serão incluídos no arquivo"
+            help="⚠️ Cuidado: chaves do Supabase serão incluídas no arquivo; a senha PostgreSQL nunca é exportada"
         )
         
         if st.button("📥 Exportar Configurações", type="primary", use_container_width=True):
@@ -10354,7 +15597,7 @@ def render_backup_restore_tab():
                 if section_key in st.session_state.user_settings:
                     section_data = st.session_state.user_settings[section_key].copy()
                     
-                    # Remover dados sensíveis se solicitado
+                    # Remover dados sensíveis se solicitado (pg_password nunca é exportado)
                     if not include_sensitive and section_key == "database":
                         sensitive_keys = ['supabase_anon_key', 'supabase_service_key', 'pg_password']
                         for key in sensitive_keys:
@@ -10598,6 +15841,46 @@ def render_system_settings_tab():
             current_settings.get('cache_duration', 15),
             key="system_cache_duration"
         )
+        
+        if hasattr(db_manager, 'cache'):
+            cache_stats = db_manager.cache.get_stats()
+            
+            cache_col1, cache_col2, cache_col3 = st.columns(3)
+            with cache_col1:
+                st.metric("🎯 Hits", cache_stats['hits'] + cache_stats['stale_hits'] + cache_stats['prefetch_hits'],
+                          delta=f"{cache_stats['hit_ratio']}%")
+            with cache_col2:
+                st.metric("❌ Misses", cache_stats['misses'])
+            with cache_col3:
+                st.metric("🗑️ Remoções", cache_stats['evictions'])
+            
+            st.caption(
+                f"{cache_stats['entries']} entradas • {cache_stats['stale_hits']} servidas expiradas "
+                f"(revalidadas em segundo plano) • {cache_stats['prefetch_hits']} pré-carregadas • "
+                f"{cache_stats['refresh_errors']} erros de revalidação"
+            )
+            
+        query_cache_mb = st.slider(
+            "Memória do cache de resultados SQL (MB):",
+            8, 512,
+            current_settings.get('query_cache_mb', 64),
+            key="system_query_cache_mb"
+        )
+        
+        if hasattr(db_manager, 'result_cache'):
+            result_stats = db_manager.result_cache.get_stats()
+            st.caption(
+                f"Resultados SQL: {result_stats['entries']} entradas • {result_stats['used_mb']}/"
+                f"{result_stats['budget_mb']} MB • {result_stats['hit_ratio']}% hits • "
+                f"{result_stats['evictions']} remoções LRU • {result_stats['invalidations']} invalidadas por escrita"
+            )
+        
+        if hasattr(db_manager, 'cache'):
+            if st.button("🧹 Limpar Cache", key="system_clear_cache"):
+                db_manager.cache.invalidate()
+                if hasattr(db_manager, 'result_cache'):
+                    db_manager.result_cache.invalidate_tables()
+                st.success("✅ Cache limpo!")
         auto_refresh_interval = st.slider(
             "Auto-refresh (segundos):", 
             10, 300, 
@@ -10616,6 +15899,8 @@ def render_system_settings_tab():
             "Timeout de query (segundos):", 
             5, 300, 
             current_settings.get('query_timeout', 30),
+            help="statement_timeout do Editor SQL e dos scripts de projetos; as consultas internas "
+                 "usam o 'Timeout padrão do pool' das configurações de banco",
             key="system_query_timeout"
         )
         
@@ -10688,6 +15973,7 @@ def render_system_settings_tab():
             'auto_scale': auto_scale,
             'enable_cache': enable_cache,
             'cache_duration': cache_duration,
+            'query_cache_mb': query_cache_mb,
             'auto_refresh_interval': auto_refresh_interval,
             'max_records_display': max_records_display,
             'query_timeout': query_timeout,
@@ -10708,6 +15994,12 @@ def render_system_settings_tab():
             st.success("✅ Configurações do sistema salvas com sucesso!")
             log_activity("Configurações do sistema alteradas")
             
+            # Aplicar configurações de cache ao cache compartilhado
+            if hasattr(db_manager, 'cache'):
+                db_manager.cache.configure(enable_cache, cache_duration * 60)
+            if hasattr(db_manager, 'result_cache'):
+                db_manager.result_cache.configure(enable_cache, cache_duration * 60, query_cache_mb)
+            
             # Aplicar configurações imediatamente onde possível
             if debug_mode != CONFIG.get('debug_mode'):
                 CONFIG['debug_mode'] = debug_mode
@@ -11420,7 +16712,8 @@ def create_project(self, project_data):
                 def get_project_scripts(self, project_id):
                     return []
                 
-                def execute_script(self, script_id, project_id, sql_content, parameters=None):
+                def execute_script(self, script_id, project_id, sql_content, parameters=None, commit_each=False,
+                                   declared_parameters=None):
                     return {'success': False, 'message': 'Modo demonstração - execução não disponível'}
                 
                 def create_script(self, project_id, script_data):
@@ -11451,6 +16744,7 @@ def create_script(self, project_id, script_data):
             "tables": render_tables,
             "sql_editor": render_sql_editor,
             "dba_operations": render_dba_operations,
+            "data_import": render_data_import,
             "projects": render_projects,
             "ai_assistant": render_ai_assistant,  # NOVA PÁGINA
             "settings": render_settings
@@ -0,0 +1,61 @@
+"""Carrega definições isoladas de app.py para os testes
+
+app.py monta a interface Streamlit ao ser importado; por isso apenas as definições
+pedidas (funções, classes, constantes ou "Classe.metodo") são compiladas do código-fonte.
+"""
+
+import ast
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+BASE_NAMESPACE = {
+    'hashlib': hashlib, 'json': json, 'math': math, 're': re, 'threading': threading, 'time': time,
+    'OrderedDict': OrderedDict, 'date': date, 'datetime': datetime, 'Decimal': Decimal,
+    'Any': Any, 'Dict': Dict, 'List': List, 'Optional': Optional, 'Tuple': Tuple,
+}
+
+
+def _defined_names(node) -> set:
+    if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+        return {node.name}
+    if isinstance(node, ast.Assign):
+        return {target.id for target in node.targets if isinstance(target, ast.Name)}
+    return set()
+
+
+def load_app_definitions(*names: str, **namespace) -> Dict[str, Any]:
+    """Compila as definições pedidas, na ordem em que aparecem em app.py.
+    Métodos ("Classe.metodo") viram funções soltas, sem decoradores."""
+    tree = ast.parse(APP_PATH.read_text(encoding='utf-8'))
+    top_level = {name for name in names if '.' not in name}
+    methods = {tuple(name.split('.', 1)) for name in names if '.' in name}
+
+    nodes, found = [], set()
+    for node in tree.body:
+        if _defined_names(node) & top_level:
+            nodes.append(node)
+            found |= _defined_names(node) & top_level
+        if isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and (node.name, item.name) in methods:
+                    item.decorator_list = []
+                    nodes.append(item)
+                    found.add(f"{node.name}.{item.name}")
+    missing = set(names) - found
+    if missing:
+        raise LookupError(f"não encontrados em app.py: {', '.join(sorted(missing))}")
+
+    scope = {**BASE_NAMESPACE, **namespace}
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), str(APP_PATH), 'exec'), scope)
+    return scope
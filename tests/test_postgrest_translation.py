@@ -0,0 +1,101 @@
+"""Testes da tradução SELECT → PostgREST (push-down e recusa de queries)"""
+
+import pytest
+
+from app_source import load_app_definitions
+
+sqlparse = pytest.importorskip("sqlparse")
+
+app = load_app_definitions(
+    'POSTGREST_DEFAULT_LIMIT', 'SQLTranslationError', 'PostgrestQueryTranslator',
+    'translate_select_to_postgrest', 'build_postgrest_select', 'apply_plan_window',
+    sqlparse=sqlparse, SQLPARSE_AVAILABLE=True,
+)
+translate = app['translate_select_to_postgrest']
+SQLTranslationError = app['SQLTranslationError']
+
+
+class TestPushDown:
+    def test_filters_order_and_projection(self):
+        plan = translate(
+            "SELECT id, name AS nome FROM public.pets p "
+            "WHERE p.species = 'dog' AND age >= 3 AND status IN ('ativo', 'novo') "
+            "ORDER BY name DESC, id LIMIT 20 OFFSET 40;"
+        )
+
+        assert plan['table'] == 'pets'
+        assert app['build_postgrest_select'](plan['select']) == 'id,nome:name'
+        assert plan['filters'] == [
+            (False, 'eq', 'species', 'dog'),
+            (False, 'gte', 'age', 3),
+            (False, 'in_', 'status', ['ativo', 'novo']),
+        ]
+        assert plan['order'] == [
+            {'column': 'name', 'desc': True, 'nullsfirst': False},
+            {'column': 'id', 'desc': False, 'nullsfirst': False},
+        ]
+        assert (plan['limit'], plan['offset']) == (20, 40)
+        assert plan['aggregates'] is False
+
+    def test_negations_between_and_null_checks(self):
+        plan = translate(
+            "SELECT * FROM pets WHERE name NOT ILIKE '%rex%' AND weight BETWEEN 1.5 AND 10 "
+            "AND owner_id IS NOT NULL"
+        )
+
+        assert plan['filters'] == [
+            (True, 'ilike', 'name', '%rex%'),
+            (False, 'gte', 'weight', 1.5),
+            (False, 'lte', 'weight', 10),
+            (True, 'is_', 'owner_id', 'null'),
+        ]
+        assert plan['limit'] is None
+
+    def test_aggregate_with_group_by(self):
+        plan = translate("SELECT species, COUNT(*) AS total, AVG(age) FROM pets GROUP BY species")
+
+        assert plan['aggregates'] is True
+        assert plan['group_by'] == ['species']
+        assert app['build_postgrest_select'](plan['select']) == 'species,total:count(),age.avg()'
+
+    def test_limit_all_keeps_default_limit(self):
+        assert translate("SELECT * FROM pets LIMIT ALL OFFSET 5")['limit'] is None
+
+
+class TestRejection:
+    @pytest.mark.parametrize("query", [
+        "SELECT * FROM pets LIMIT 10 LIMIT 5",
+        "SELECT * FROM pets LIMIT ALL LIMIT 5",
+        "SELECT * FROM pets OFFSET 1 LIMIT 5 OFFSET 2",
+        "SELECT * FROM pets LIMIT -1",
+        "SELECT * FROM pets LIMIT 2.5",
+        "SELECT DISTINCT species FROM pets",
+        "SELECT * FROM pets JOIN owners ON owners.id = pets.owner_id",
+        "SELECT * FROM pets, owners",
+        "SELECT * FROM pets WHERE age > 1 OR age < 10",
+        "SELECT * FROM pets WHERE (age > 1)",
+        "SELECT lower(name) FROM pets",
+        "SELECT species, COUNT(*) FROM pets",
+        "SELECT species, COUNT(*) FROM pets GROUP BY species HAVING COUNT(*) > 1",
+        "SELECT COUNT(DISTINCT species) FROM pets",
+        "SELECT * FROM audit.pets",
+        "SELECT * FROM pets ORDER BY name DESC NULLS LAST",
+        "SELECT * FROM pets; SELECT * FROM owners",
+        "SELECT * FROM pets UNION SELECT * FROM owners",
+    ])
+    def test_untranslatable_query(self, query):
+        with pytest.raises(SQLTranslationError):
+            translate(query)
+
+
+class TestPlanWindow:
+    @pytest.mark.parametrize("limit, offset, expected", [
+        (None, None, [{'count': 7}]),
+        (1, 0, [{'count': 7}]),
+        (0, None, []),
+        (None, 1, []),
+        (5, 3, []),
+    ])
+    def test_single_row_aggregate(self, limit, offset, expected):
+        plan = {'limit': limit, 'offset': offset}
+        assert app['apply_plan_window']([{'count': 7}], plan) == expected
@@ -0,0 +1,153 @@
+"""Testes da execução de comandos de script como prepared statements reaproveitados"""
+
+import types
+from datetime import date
+
+from app_source import load_app_definitions
+
+
+class FakeDatabaseError(Exception):
+    pgcode = None
+
+
+app = load_app_definitions(
+    'SQL_LITERAL_PATTERN', 'normalize_sql', 'SQL_STATEMENT_TOKEN_PATTERN', 'SCRIPT_PARAMETER_PATTERN',
+    'SCRIPT_PARAMETER_TYPES', 'PREPARABLE_COMMANDS', 'PREPARED_STATEMENTS_PER_CONNECTION',
+    'STALE_PREPARED_PGCODE', '_rewrite_script_parameters', 'find_script_parameters',
+    'DatabaseManager._execute_statement',
+    psycopg2=types.SimpleNamespace(Error=FakeDatabaseError),
+)
+execute_statement = app['_execute_statement']
+
+
+class FakeCursor:
+    """Como no psycopg2: cada execute descarta o resultado anterior do cursor"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.log.append(sql)
+        self.conn.params.append(params)
+        command = sql.split()[0].upper()
+        if command == 'PREPARE':
+            name, _, body = sql.split(None, 1)[1].partition(' ')
+            self.conn.prepared[name] = body.split(' AS ', 1)[1]
+            sql = None
+        elif command == 'EXECUTE':
+            sql = self.conn.prepared[sql.split()[1]]
+        else:
+            sql = None if command in ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'DEALLOCATE') else sql
+
+        self.description, self.rowcount, self._rows = None, -1, []
+        if sql and sql.lstrip().upper().startswith('SELECT'):
+            self._rows = list(self.conn.rows)
+            self.description = [('id',), ('name',)]
+            self.rowcount = len(self._rows)
+        elif sql:
+            self.rowcount = self.conn.affected
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, rows=(), affected=0):
+        self.autocommit = False
+        self.rows = rows
+        self.affected = affected
+        self.prepared = {}
+        self.log = []
+        self.params = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakePool:
+    def __init__(self):
+        self.statements = {}
+        self.uses = []
+
+    def prepared_statements(self, conn):
+        return self.statements.setdefault(id(conn), set())
+
+    def record_prepared_use(self, reused):
+        self.uses.append(reused)
+
+
+def run(pool, conn, statement, parameters):
+    cursor = conn.cursor()
+    outcome = execute_statement(pool, conn, cursor, statement, parameters, True)
+    return outcome, cursor
+
+
+class TestPreparedReuse:
+    def test_second_run_in_transaction_returns_rows(self):
+        pool, conn = FakePool(), FakeConnection(rows=[(1, 'Rex'), (2, 'Mia')])
+        statement = "SELECT id, name FROM pets WHERE born >= :since"
+        parameters = {'since': ('date', date(2020, 1, 1))}
+
+        first, cursor = run(pool, conn, statement, parameters)
+        assert first == 'novo'
+        assert cursor.fetchall() == [(1, 'Rex'), (2, 'Mia')]
+
+        second, cursor = run(pool, conn, statement, parameters)
+        assert second == 'reutilizado'
+        assert cursor.description is not None
+        assert cursor.fetchall() == [(1, 'Rex'), (2, 'Mia')]
+        assert pool.uses == [False, True]
+        assert any(sql.startswith('RELEASE SAVEPOINT') for sql in conn.log)
+
+    def test_second_run_keeps_rowcount_of_write(self):
+        pool, conn = FakePool(), FakeConnection(affected=3)
+        statement = "UPDATE pets SET active = false WHERE owner_id = :owner"
+        parameters = {'owner': ('integer', 7)}
+
+        run(pool, conn, statement, parameters)
+        outcome, cursor = run(pool, conn, statement, parameters)
+
+        assert outcome == 'reutilizado'
+        assert cursor.rowcount == 3
+
+    def test_autocommit_skips_savepoint(self):
+        pool, conn = FakePool(), FakeConnection(rows=[(1, 'Rex')])
+        conn.autocommit = True
+        statement = "SELECT id, name FROM pets WHERE id = :id"
+
+        run(pool, conn, statement, {'id': ('integer', 1)})
+        _, cursor = run(pool, conn, statement, {'id': ('integer', 1)})
+
+        assert cursor.fetchall() == [(1, 'Rex')]
+        assert not any('SAVEPOINT' in sql for sql in conn.log)
+
+
+class TestUnpreparedExecution:
+    def test_pyformat_doubles_literal_percent(self):
+        pool, conn = FakePool(), FakeConnection(rows=[(1, 'Rex')])
+        statement = "SELECT id, name FROM pets WHERE name LIKE 'R%' AND id = :id"
+
+        outcome = execute_statement(pool, conn, conn.cursor(), statement, {'id': ('integer', 1)}, False)
+
+        assert outcome is None
+        assert conn.log == ["SELECT id, name FROM pets WHERE name LIKE 'R%%' AND id = %(id)s"]
+        assert conn.params == [{'id': 1}]
+
+    def test_statement_without_parameters_is_sent_verbatim(self):
+        pool, conn = FakePool(), FakeConnection()
+        statement = "UPDATE pets SET tag = 'a%b' WHERE tag IS NULL"
+
+        execute_statement(pool, conn, conn.cursor(), statement, {}, False)
+
+        assert conn.log == [statement]
+        assert conn.params == [None]
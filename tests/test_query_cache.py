@@ -0,0 +1,113 @@
+"""Testes do cache de resultados: normalização, consultas cacheáveis e tabelas lidas/escritas"""
+
+import pytest
+
+from app_source import load_app_definitions
+
+app = load_app_definitions(
+    'SQL_LITERAL_PATTERN', 'SQL_WRITE_TARGET_PATTERN', 'SQL_READ_TOKEN_PATTERN', 'SQL_CTE_NAME_PATTERN',
+    'SQL_FROM_LIST_END', 'SQL_FROM_FUNCTIONS', 'SQL_VOLATILE_PATTERN', 'SQL_CALL_PATTERN',
+    'SQL_PAREN_KEYWORDS', 'SQL_CACHEABLE_FUNCTIONS', 'normalize_sql', '_table_names',
+    'extract_written_tables', 'extract_read_tables', 'result_payload_size', 'QueryResultCache',
+)
+normalize_sql = app['normalize_sql']
+extract_read_tables = app['extract_read_tables']
+extract_written_tables = app['extract_written_tables']
+QueryResultCache = app['QueryResultCache']
+
+
+class TestNormalizeSql:
+    def test_comments_whitespace_and_case(self):
+        query = "SELECT  *\n FROM Pets -- todos\n WHERE /* filtro */ Name = 'Rex';"
+        assert normalize_sql(query) == "select * from pets where name = 'Rex'"
+
+    def test_literals_and_quoted_identifiers_are_preserved(self):
+        query = """SELECT "Nome"  FROM pets WHERE note = 'Olá  -- não é comentário'"""
+        assert normalize_sql(query) == """select "Nome" from pets where note = 'Olá  -- não é comentário'"""
+
+    def test_equivalent_queries_share_a_key(self):
+        assert normalize_sql("select * from pets") == normalize_sql("SELECT *\n\tFROM   PETS ;")
+
+
+class TestIsCacheable:
+    @pytest.mark.parametrize("query", [
+        "SELECT * FROM pets WHERE species = 'dog'",
+        "WITH t AS (SELECT owner_id, count(*) FROM pets GROUP BY 1) SELECT * FROM t",
+        "SELECT lower(name), round(weight::numeric(10, 2), 1) FROM pets",
+        "SELECT * FROM pets WHERE note = 'now() into pg_stat'",
+        "VALUES (1), (2)",
+        "TABLE pets",
+    ])
+    def test_deterministic_reads(self, query):
+        assert QueryResultCache.is_cacheable(query)
+
+    @pytest.mark.parametrize("query", [
+        "INSERT INTO pets (name) VALUES ('Rex')",
+        "UPDATE pets SET name = 'Rex'",
+        "WITH d AS (DELETE FROM pets RETURNING *) SELECT * FROM d",
+        "SELECT * INTO pets_copy FROM pets",
+        "SELECT * FROM pets FOR UPDATE",
+        "SELECT now()",
+        "SELECT current_timestamp",
+        "SELECT random() FROM pets",
+        "SELECT nextval('pets_id_seq')",
+        "SELECT my_report(1)",
+        "SELECT * FROM pg_stat_activity",
+        "EXPLAIN SELECT * FROM pets",
+    ])
+    def test_writes_and_volatile_reads(self, query):
+        assert not QueryResultCache.is_cacheable(query)
+
+
+class TestTableExtraction:
+    @pytest.mark.parametrize("query, expected", [
+        ("SELECT * FROM pets p, owners o WHERE p.owner_id = o.id", {'pets', 'owners'}),
+        ("SELECT * FROM public.pets JOIN owners ON owners.id = pets.owner_id, vets v", {'pets', 'owners', 'vets'}),
+        ("SELECT * FROM (pets p JOIN owners o ON true) LEFT JOIN vets ON true", {'pets', 'owners', 'vets'}),
+        ("WITH recent AS (SELECT * FROM visits) SELECT * FROM recent r JOIN pets USING (id)", {'visits', 'pets'}),
+        ("SELECT * FROM pets WHERE id IN (SELECT pet_id FROM visits) UNION SELECT * FROM archive",
+         {'pets', 'visits', 'archive'}),
+        ("SELECT * FROM pets, LATERAL (SELECT * FROM owners o WHERE o.id = pets.owner_id) x", {'pets', 'owners'}),
+        ("SELECT extract(year FROM born), substring(name FROM 2 FOR 3) FROM pets", {'pets'}),
+        ("SELECT * FROM generate_series(1, 3) g, pets", {'pets'}),
+        ("TABLE pets", {'pets'}),
+        ("SELECT 1", set()),
+    ])
+    def test_read_tables(self, query, expected):
+        assert extract_read_tables(query) == expected
+
+    @pytest.mark.parametrize("query", ["SELECT * FROM", "SELECT * FROM 'pets'", "SELECT * FROM (pets"])
+    def test_undeterminable_read_set(self, query):
+        assert extract_read_tables(query) is None
+
+    @pytest.mark.parametrize("query, expected", [
+        ("INSERT INTO public.pets (name) VALUES ('Rex')", {'pets'}),
+        ("UPDATE owners SET name = 'Ana'", {'owners'}),
+        ("DELETE FROM \"Visits\" WHERE id = 1", {'visits'}),
+        ("TRUNCATE TABLE pets, ONLY public.owners", {'pets', 'owners'}),
+        ("SELECT * FROM pets", set()),
+    ])
+    def test_written_tables(self, query, expected):
+        assert extract_written_tables(query) == expected
+
+
+class TestInvalidation:
+    def cache_with(self, query, known_tables=None):
+        cache = QueryResultCache(budget_mb=1)
+        cache.put(query, 1, {'success': True, 'data': [{'id': 1}]}, known_tables=known_tables)
+        return cache
+
+    def test_write_to_any_joined_table_invalidates(self):
+        cache = self.cache_with("SELECT * FROM pets p, owners o WHERE p.owner_id = o.id")
+        cache.invalidate_tables({'owners'})
+        assert cache.get("SELECT * FROM pets p, owners o WHERE p.owner_id = o.id", 1) is None
+
+    def test_unrelated_write_keeps_entry(self):
+        cache = self.cache_with("SELECT * FROM pets", known_tables={'pets', 'owners'})
+        cache.invalidate_tables({'owners'})
+        assert cache.get("SELECT * FROM pets", 1) is not None
+
+    def test_view_is_invalidated_by_any_write(self):
+        cache = self.cache_with("SELECT * FROM pet_summary", known_tables={'pets', 'owners'})
+        cache.invalidate_tables({'owners'})
+        assert cache.get("SELECT * FROM pet_summary", 1) is None
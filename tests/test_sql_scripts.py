@@ -0,0 +1,176 @@
+"""Testes dos scripts SQL: divisão em comandos, parâmetros e comandos fora de transação"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app_source import load_app_definitions
+
+SCRIPT_DEFINITIONS = (
+    'SQL_LITERAL_PATTERN', 'normalize_sql', 'AUTOCOMMIT_COMMAND_PATTERN', 'TRANSACTION_CONTROL_PATTERN',
+    'requires_autocommit', 'SQL_STATEMENT_TOKEN_PATTERN', 'split_sql_statements', 'SCRIPT_PARAMETER_PATTERN',
+    'SCRIPT_PARAMETER_TYPES', '_rewrite_script_parameters', 'find_script_parameters', '_infer_parameter_type',
+    'normalize_script_parameters', 'coerce_script_parameter', 'bind_script_parameters', 'sql_literal',
+)
+
+try:
+    import sqlparse
+except ImportError:
+    sqlparse = None
+
+app = load_app_definitions(*SCRIPT_DEFINITIONS, sqlparse=None, SQLPARSE_AVAILABLE=False)
+normalize_sql = app['normalize_sql']
+
+
+class TestTransactionCompatibility:
+    @pytest.mark.parametrize("statement", [
+        "VACUUM ANALYZE pets",
+        "REINDEX DATABASE petcare",
+        "REINDEX SYSTEM petcare",
+        "REINDEX TABLE CONCURRENTLY pets",
+        "REINDEX (VERBOSE, CONCURRENTLY) INDEX pets_pkey",
+        "CLUSTER",
+        "CLUSTER VERBOSE",
+        "CREATE INDEX CONCURRENTLY pets_name_idx ON pets (name)",
+        "CREATE UNIQUE INDEX CONCURRENTLY pets_code_idx ON pets (code)",
+        "DROP INDEX CONCURRENTLY pets_name_idx",
+        "CREATE DATABASE petcare_copy",
+        "DROP DATABASE petcare_copy",
+        "ALTER SYSTEM SET work_mem = '64MB'",
+        "ALTER TABLE visits DETACH PARTITION visits_2020 CONCURRENTLY",
+    ])
+    def test_requires_autocommit(self, statement):
+        assert app['requires_autocommit'](statement)
+
+    @pytest.mark.parametrize("statement", [
+        "REINDEX TABLE pets",
+        "REINDEX INDEX pets_pkey",
+        "CLUSTER pets USING pets_pkey",
+        "CLUSTER VERBOSE pets",
+        "CREATE INDEX pets_name_idx ON pets (name)",
+        "ANALYZE pets",
+        "CHECKPOINT",
+        "SELECT 'vacuum'",
+    ])
+    def test_runs_inside_transaction(self, statement):
+        assert not app['requires_autocommit'](statement)
+
+    @pytest.mark.parametrize("statement, expected", [
+        ("BEGIN", True),
+        ("START TRANSACTION ISOLATION LEVEL SERIALIZABLE", True),
+        ("COMMIT", True),
+        ("END", True),
+        ("ROLLBACK TO SAVEPOINT antes", True),
+        ("SAVEPOINT antes", True),
+        ("RELEASE SAVEPOINT antes", True),
+        ("PREPARE TRANSACTION 'tx1'", True),
+        ("PREPARE busca AS SELECT 1", False),
+        ("SELECT * FROM commits", False),
+        ("UPDATE pets SET status = 'begin'", False),
+    ])
+    def test_transaction_control(self, statement, expected):
+        assert (app['TRANSACTION_CONTROL_PATTERN'].match(normalize_sql(statement)) is not None) == expected
+
+
+SCRIPT = """-- cabeçalho; com ponto e vírgula
+CREATE FUNCTION touch() RETURNS trigger AS $body$
+BEGIN
+  NEW.updated_at := now(); RETURN NEW;
+END;
+$body$ LANGUAGE plpgsql;
+/* bloco; comentado */
+INSERT INTO logs (msg) VALUES ('a;b');
+-- só comentário;
+SELECT 1"""
+
+
+class TestSplitStatements:
+    @pytest.fixture(params=['regex', 'sqlparse'])
+    def split(self, request):
+        if request.param == 'regex':
+            return app['split_sql_statements']
+        if sqlparse is None:
+            pytest.skip("sqlparse não instalado")
+        return load_app_definitions(*SCRIPT_DEFINITIONS, sqlparse=sqlparse,
+                                    SQLPARSE_AVAILABLE=True)['split_sql_statements']
+
+    def test_dollar_quoted_bodies_literals_and_comments(self, split):
+        statements = split(SCRIPT)
+
+        assert len(statements) == 3
+        assert statements[0].endswith("$body$ LANGUAGE plpgsql;")
+        assert "RETURN NEW;" in statements[0]
+        assert "VALUES ('a;b');" in statements[1]
+        assert normalize_sql(statements[2]) == "select 1"
+
+    def test_comment_only_chunks_are_dropped(self, split):
+        statements = split("SELECT 1; -- fim\n/* nada */;")
+        assert len(statements) == 1
+        assert statements[0].startswith("SELECT 1;")
+
+
+class TestScriptParameters:
+    def test_parameters_outside_slices_casts_literals_and_comments(self):
+        sql = ("SELECT a[:n], a[1:n], ARRAY[:ids], b[:lim] FROM t "
+               "WHERE x = :x::int AND s = ':nao' AND y = :x -- :comentario")
+        assert app['find_script_parameters'](sql) == ['ids', 'x']
+
+    def test_slices_survive_literal_rewrite(self):
+        sql = "SELECT tags[:2], tags[1:n] FROM pets WHERE id = ANY(ARRAY[:ids]) AND peso > :peso"
+        rewritten = app['_rewrite_script_parameters'](sql, lambda m: app['sql_literal'](Decimal('1.5')))
+        assert rewritten == "SELECT tags[:2], tags[1:n] FROM pets WHERE id = ANY(ARRAY[1.5]) AND peso > 1.5"
+
+    def test_bind_uses_defaults_and_declared_types(self):
+        bound = app['bind_script_parameters'](
+            "SELECT * FROM visits WHERE day >= :desde AND total > :minimo",
+            {'desde': {'type': 'date', 'default': '2024-01-01'}, 'minimo': '10.25'},
+            {'minimo': '0.000000000000000001'},
+        )
+        assert bound == {'desde': ('date', date(2024, 1, 1)), 'minimo': ('text', '0.000000000000000001')}
+
+    def test_bind_rejects_undeclared_and_invalid_values(self):
+        with pytest.raises(ValueError, match=":outro"):
+            app['bind_script_parameters']("SELECT :outro", {})
+        with pytest.raises(ValueError, match=r":n \(integer\)"):
+            app['bind_script_parameters']("SELECT :n", {'n': {'type': 'integer'}}, {'n': '2.5'})
+
+
+class TestCoerceParameter:
+    def test_numeric_keeps_every_digit(self):
+        value = app['coerce_script_parameter']('12345678901234567890.123456789', 'numeric')
+        assert value == Decimal('12345678901234567890.123456789')
+        assert isinstance(value, Decimal)
+
+    @pytest.mark.parametrize("value, expected", [('10', 10), ('10.0', 10), (Decimal('7E+2'), 700),
+                                                 ('98765432109876543210', 98765432109876543210)])
+    def test_whole_integers(self, value, expected):
+        assert app['coerce_script_parameter'](value, 'integer') == expected
+
+    @pytest.mark.parametrize("value, param_type", [('10.5', 'integer'), ('Infinity', 'integer'),
+                                                   ('NaN', 'integer'), ('sNaN', 'numeric'), ('abc', 'numeric')])
+    def test_invalid_numbers(self, value, param_type):
+        with pytest.raises(ValueError):
+            app['coerce_script_parameter'](value, param_type)
+
+    def test_numeric_nan_and_infinity_are_accepted(self):
+        assert app['coerce_script_parameter']('NaN', 'numeric').is_nan()
+        assert app['coerce_script_parameter']('-Infinity', 'numeric') == Decimal('-Infinity')
+
+
+class TestSqlLiteral:
+    @pytest.mark.parametrize("value, expected", [
+        (Decimal('12345678901234567890.123456789'), '12345678901234567890.123456789'),
+        (Decimal('NaN'), "'NaN'::numeric"),
+        (Decimal('Infinity'), "'Infinity'::numeric"),
+        (Decimal('-Infinity'), "'-Infinity'::numeric"),
+        (float('nan'), "'NaN'::float8"),
+        (float('-inf'), "'-Infinity'::float8"),
+        (1.5, '1.5'),
+        (True, 'TRUE'),
+        (None, 'NULL'),
+        (date(2024, 2, 29), "'2024-02-29'"),
+        ("O'Brien", "'O''Brien'"),
+    ])
+    def test_literals(self, value, expected):
+        assert app['sql_literal'](value) == expected